@@ -0,0 +1,104 @@
+import threading
+from datetime import timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+from goals.views import GoalViewSet
+from tracking.models import JournalEntry
+from users.models import User
+from . import views
+from .views import SECTIONS
+
+
+class DashboardSetupMixin:
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='dashboard', email='dashboard@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        today = timezone.now().date()
+        for day, mood in enumerate((4, 6, 8)):
+            JournalEntry.objects.create(
+                user=self.user, date=today - timedelta(days=day), substance='none',
+                amount='1', mood=mood, sleep_quality=5
+            )
+
+
+class DashboardTests(DashboardSetupMixin, TestCase):
+
+    def test_every_section_by_default(self):
+        response = self.client.get('/api/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), set(SECTIONS))
+        self.assertEqual(len(response.data['journal']['results']), 3)
+
+    def test_fields_selects_sections_and_keys(self):
+        response = self.client.get('/api/dashboard/', {'fields': 'journal,insights.avg_mood,insights.nope'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'journal', 'insights'})
+        self.assertEqual(set(response.data['insights']), {'avg_mood'})
+        self.assertAlmostEqual(response.data['insights']['avg_mood'], 6)
+
+        response = self.client.get('/api/dashboard/', {'fields': 'journal,bogus'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_failed_sections_are_reported_and_the_rest_returned(self):
+        unavailable = Response({'error': 'Goals are down'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        with mock.patch.object(GoalViewSet, 'active', lambda view, request: unavailable), \
+                mock.patch.object(GoalViewSet, 'progress_stats', side_effect=RuntimeError('boom')):
+            response = self.client.get('/api/dashboard/', {'fields': 'journal,active_goals,progress_stats'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['journal']['results']), 3)
+        self.assertIsNone(response.data['active_goals'])
+        self.assertIsNone(response.data['progress_stats'])
+        self.assertEqual(response.data['errors'], {
+            'active_goals': {'status': 503, 'detail': {'error': 'Goals are down'}},
+            'progress_stats': 'unavailable',
+        })
+
+    def test_sections_check_their_own_permissions(self):
+        with mock.patch.object(GoalViewSet, 'permission_classes', [permissions.IsAdminUser]):
+            response = self.client.get('/api/dashboard/', {'fields': 'journal,active_goals'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['journal']['results']), 3)
+        self.assertIsNone(response.data['active_goals'])
+        self.assertEqual(response.data['errors']['active_goals']['status'], 403)
+
+
+class DashboardThreadPoolTests(DashboardSetupMixin, TransactionTestCase):
+    """
+    Outside a transaction the sections run on the shared thread pool
+    """
+
+    def test_sections_run_on_pool_threads_that_release_their_connections(self):
+        rendered_on, cleaned_on = [], []
+        render_section = views._render_section
+
+        def render(name, request):
+            rendered_on.append(threading.current_thread().name)
+            return render_section(name, request)
+
+        def close_connections():
+            cleaned_on.append(threading.current_thread().name)
+            close_old_connections()
+
+        with mock.patch.object(views, '_render_section', render), \
+                mock.patch.object(views, 'close_old_connections', close_connections):
+            response = self.client.get('/api/dashboard/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('errors', response.data)
+        self.assertEqual(len(response.data['journal']['results']), 3)
+        self.assertAlmostEqual(response.data['insights']['avg_mood'], 6)
+        self.assertEqual(len(rendered_on), len(SECTIONS))
+        self.assertTrue(all(name.startswith('dashboard') for name in rendered_on), rendered_on)
+        # Before and after every section, on the thread that ran it
+        self.assertEqual(sorted(cleaned_on), sorted(rendered_on * 2))
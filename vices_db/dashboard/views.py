@@ -0,0 +1,166 @@
+"""
+Home screen payload in one request.
+
+Every section is produced by the same viewset action the app would otherwise
+call on its own (so caching, filtering and response shapes stay identical),
+invoked in-process with the already authenticated request. Independent
+sections run concurrently on a thread pool shared by all requests and sized
+by settings.DASHBOARD_WORKERS, each thread on its own database connection.
+A section that fails or answers with an error status is reported in `errors`
+while the others are still returned.
+"""
+import copy
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.http import QueryDict
+from django.urls import reverse
+from rest_framework import permissions
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from goals.views import GoalViewSet, AIInsightViewSet
+from sync.versioning import conditional_on_data_version, request_data_version
+from tracking.views import JournalEntryViewSet, StatsViewSet
+
+logger = logging.getLogger(__name__)
+
+# section: (viewset, action, URL name of the standalone endpoint, fixed query params)
+SECTIONS = {
+    'journal': (JournalEntryViewSet, 'list', 'journal-list-create', {'page_size': '10'}),
+    'stats': (StatsViewSet, 'retrieve_stats', 'consumption-stats', {}),
+    'insights': (JournalEntryViewSet, 'get_insights', 'journal-insights', {}),
+    'active_goals': (GoalViewSet, 'active', 'goal-active', {}),
+    'progress_stats': (GoalViewSet, 'progress_stats', 'goal-progress-stats', {}),
+    'ai_insights': (AIInsightViewSet, 'list', 'insight-list', {}),
+}
+# Dashboard query params handed through to every section
+PASSTHROUGH_PARAMS = ('timeframe',)
+
+_executor = ThreadPoolExecutor(max_workers=settings.DASHBOARD_WORKERS, thread_name_prefix='dashboard')
+
+
+def parse_fields(value):
+    """
+    ?fields=stats,insights.avg_mood,insights.total_entries ->
+    {'stats': None, 'insights': {'avg_mood', 'total_entries'}}; None keeps
+    the whole section
+    """
+    if not value:
+        return {name: None for name in SECTIONS}
+
+    selected = {}
+    for item in value.split(','):
+        section, _, key = item.strip().partition('.')
+        if section not in SECTIONS:
+            raise ValidationError({'fields': f'Unknown section {section!r}, expected one of {", ".join(SECTIONS)}'})
+        if not key:
+            selected[section] = None
+        elif section not in selected or selected[section] is not None:
+            selected.setdefault(section, set()).add(key)
+    return selected
+
+
+def _section_request(request, name, params):
+    """
+    A copy of the authenticated request addressed to the section's own
+    endpoint (so pagination links point there), with its own query params
+    and no conditional headers. It carries over the user and data version
+    instead of authenticating again.
+    """
+    http_request = copy.copy(request._request)
+    http_request.path = http_request.path_info = reverse(SECTIONS[name][2])
+    http_request.GET = QueryDict(mutable=True)
+    http_request.GET.update(params)
+    # copy() drops environ (it is excluded from pickling); META is the same dict
+    http_request.environ = http_request.META = {
+        key: value for key, value in request.META.items() if key != 'HTTP_IF_NONE_MATCH'
+    }
+    http_request.META['QUERY_STRING'] = http_request.GET.urlencode()
+
+    section_request = Request(http_request, parsers=request.parsers, negotiator=request.negotiator)
+    section_request.user = request.user
+    section_request.auth = request.auth
+    section_request._data_version = request_data_version(request)
+    return section_request
+
+
+def _render_section(name, request):
+    """
+    (status code, data) of the section's response
+    """
+    viewset_class, action, _, _ = SECTIONS[name]
+    view = viewset_class(
+        action=action, action_map={'get': action}, request=request,
+        args=(), kwargs={}, format_kwarg=None, headers={},
+    )
+    try:
+        # The section's own permission and throttle checks
+        view.initial(request)
+        response = getattr(view, action)(request)
+    except APIException as exc:
+        # As the standalone endpoint would answer it
+        response = view.handle_exception(exc)
+    # Render here so lazy querysets are evaluated on this thread's connection
+    return response.status_code, json.loads(JSONRenderer().render(response.data))
+
+
+def _render_section_in_thread(name, request):
+    close_old_connections()
+    try:
+        return _render_section(name, request)
+    finally:
+        close_old_connections()
+
+
+def _pick(data, keys):
+    if keys is None or not isinstance(data, dict):
+        return data
+    return {key: data[key] for key in keys if key in data}
+
+
+class DashboardView(APIView):
+    """
+    GET /api/dashboard/?fields=journal,stats,insights.avg_mood&timeframe=30
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    @conditional_on_data_version
+    def get(self, request):
+        selected = parse_fields(request.query_params.get('fields'))
+        passthrough = {key: request.query_params[key] for key in PASSTHROUGH_PARAMS if key in request.query_params}
+        requests = {
+            name: _section_request(request, name, {**passthrough, **SECTIONS[name][3]})
+            for name in selected
+        }
+
+        # Threads cannot see rows written by an open transaction (e.g. under
+        # ATOMIC_REQUESTS or in tests), so the sections then run in order
+        if connection.in_atomic_block or len(requests) == 1:
+            futures = None
+        else:
+            futures = {name: _executor.submit(_render_section_in_thread, name, section_request)
+                       for name, section_request in requests.items()}
+
+        payload = {}
+        errors = {}
+        for name, section_request in requests.items():
+            try:
+                status_code, data = futures[name].result() if futures else _render_section(name, section_request)
+            except Exception:
+                logger.exception('Dashboard section %s failed', name)
+                status_code, data = None, None
+                errors[name] = 'unavailable'
+            if status_code is not None and status_code >= 400:
+                logger.warning('Dashboard section %s answered %s', name, status_code)
+                errors[name] = {'status': status_code, 'detail': data}
+                data = None
+            payload[name] = _pick(data, selected[name])
+
+        if errors:
+            payload['errors'] = errors
+        return Response(payload)
@@ -35,4 +35,4 @@ python manage.py clearsessions --settings=vices_db.settings.production
 
 echo "✅ Production deployment completed!"
 echo "🌐 To start the server, run:"
-echo "gunicorn --bind 0.0.0.0:8000 vices_db.wsgi:application"
+echo "gunicorn --bind 0.0.0.0:8000 -k uvicorn_worker.UvicornWorker vices_db.asgi:application"
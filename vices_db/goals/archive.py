@@ -0,0 +1,67 @@
+"""
+Moves expired AI insights out of the hot table.
+
+Every insight read filters on expires_at > now, so expired rows, and rows
+without an expiry, are dead weight in goals_aiinsight.
+archive_expired_insights() copies them to ArchivedAIInsight and deletes them
+in batches, each in its own short transaction. Clients already hide expired
+insights, so no tombstones or data version bumps are needed, and the delete
+skips the per-row post_delete handlers. Copies keep the original id, so a
+batch interrupted between the copy and the delete is simply redone.
+"""
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import AIInsight, ArchivedAIInsight
+
+ARCHIVED_FIELDS = [
+    'id', 'user_id', 'related_goal_id', 'type', 'severity', 'title', 'message', 'dedup_key',
+    'created_at',
+]
+
+
+def _delete_insights(ids):
+    # QuerySet.delete() would fetch every row to send post_delete
+    qn = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {qn(AIInsight._meta.db_table)} WHERE id IN ({placeholders})', ids)
+
+
+def archive_batch(before, batch_size):
+    """
+    Archive up to batch_size insights that expired before `before`, or never
+    had an expiry; returns how many were moved
+    """
+    with transaction.atomic():
+        rows = list(
+            AIInsight.objects.filter(Q(expires_at__lte=before) | Q(expires_at__isnull=True))
+            .order_by('expires_at', 'id')
+            # No expiry: archived as expired when created
+            .values(*ARCHIVED_FIELDS, archived_expires_at=Coalesce('expires_at', 'created_at'))[:batch_size]
+        )
+        if not rows:
+            return 0
+        ArchivedAIInsight.objects.bulk_create(
+            [ArchivedAIInsight(expires_at=row.pop('archived_expires_at'), **row) for row in rows],
+            ignore_conflicts=True
+        )
+        _delete_insights([row['id'] for row in rows])
+    return len(rows)
+
+
+def archive_expired_insights(batch_size=1000, max_batches=None, before=None):
+    """
+    Archive expired insights batch by batch; returns the total moved
+    """
+    before = before or timezone.now()
+    moved = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        count = archive_batch(before, batch_size)
+        moved += count
+        batches += 1
+        if count < batch_size:
+            break
+    return moved
@@ -0,0 +1,189 @@
+"""
+Rule-based AI insights, generated offline for every user.
+
+generate_insights_chunk() evaluates deterministic rules over a chunk of users
+with a fixed number of queries per chunk, however many users it holds:
+
+    sleep_after_alcohol  sleep quality the day after drinking is clearly lower
+                         than after other logged days (last 4 weeks of the
+                         journal rollups)
+    spending_spike       spending in the last 7 days well above the weekly
+                         average of the 4 weeks before (consumption events)
+    goal_milestone       a goal updated in the last 7 days has reached 25, 50,
+                         75 or 100% progress
+
+Every insight has a dedup_key naming its rule and the ISO week or goal
+milestone it is about; (user, dedup_key) is unique, so running the job again
+the same week adds nothing. Weekly insights expire after 7 days, in a later
+week, while milestone keys are also looked up in the archive so a milestone is
+only announced once.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+from tracking.models import ConsumptionEvent, JournalDailyRollup
+from .models import Goal, AIInsight, ArchivedAIInsight
+from .signals import insights_bulk_created
+
+DRINKING_SUBSTANCES = ('alcohol', 'both')
+SLEEP_WINDOW_DAYS = 28
+SLEEP_MIN_DAYS = 3
+SLEEP_MIN_DROP = 1.0
+SPENDING_BASELINE_WEEKS = 4
+SPENDING_SPIKE_RATIO = 1.5
+SPENDING_MIN_INCREASE = 20
+MILESTONES = (25, 50, 75, 100)
+MILESTONE_WINDOW_DAYS = 7
+
+WEEKLY_TTL = timedelta(days=7)
+MILESTONE_TTL = timedelta(days=14)
+
+
+def _week_key(rule, today):
+    year, week, _ = today.isocalendar()
+    return f'{rule}:{year}-W{week:02d}'
+
+
+def sleep_after_alcohol(user_ids, today):
+    """
+    (user_id, insight fields) for users sleeping worse after drinking days
+    """
+    rows = JournalDailyRollup.objects.filter(
+        user_id__in=user_ids, date__gt=today - timedelta(days=SLEEP_WINDOW_DAYS + 1)
+    ).values_list('user_id', 'date', 'substance', 'entry_count', 'sleep_quality_sum')
+
+    # user: {day: [drank, sleep quality sum, entries]}
+    days = defaultdict(dict)
+    for user_id, day, substance, entry_count, sleep_quality_sum in rows.iterator(chunk_size=2000):
+        totals = days[user_id].setdefault(day, [False, 0, 0])
+        totals[0] = totals[0] or substance in DRINKING_SUBSTANCES
+        totals[1] += sleep_quality_sum
+        totals[2] += entry_count
+
+    for user_id, logged in days.items():
+        after, other = [], []
+        for day, (_, sleep_quality_sum, entry_count) in logged.items():
+            previous = logged.get(day - timedelta(days=1))
+            # Only days following a logged day say anything about it
+            if previous and entry_count:
+                (after if previous[0] else other).append(sleep_quality_sum / entry_count)
+        if len(after) < SLEEP_MIN_DAYS or len(other) < SLEEP_MIN_DAYS:
+            continue
+        after_avg = sum(after) / len(after)
+        other_avg = sum(other) / len(other)
+        if other_avg - after_avg < SLEEP_MIN_DROP:
+            continue
+        yield user_id, {
+            'dedup_key': _week_key('sleep_after_alcohol', today),
+            'type': 'pattern',
+            'severity': 'warning',
+            'actionable': True,
+            'title': 'Sleep drops after drinking days',
+            'message': (
+                f'Over the last 4 weeks your sleep quality averaged {after_avg:.1f}/10 the day after '
+                f'drinking, against {other_avg:.1f}/10 after other days.'
+            ),
+            'ttl': WEEKLY_TTL,
+        }
+
+
+def spending_spike(user_ids, today):
+    """
+    (user_id, insight fields) for users who spent well above their usual week
+    """
+    week_start = today - timedelta(days=6)
+    baseline_start = week_start - timedelta(weeks=SPENDING_BASELINE_WEEKS)
+    rows = ConsumptionEvent.objects.filter(
+        user_id__in=user_ids, date__gte=baseline_start, date__lte=today
+    ).values('user_id').annotate(
+        recent=Sum('spending', filter=Q(date__gte=week_start)),
+        previous=Sum('spending', filter=Q(date__lt=week_start)),
+    ).order_by()
+
+    for row in rows:
+        recent = row['recent'] or 0
+        weekly = (row['previous'] or 0) / SPENDING_BASELINE_WEEKS
+        # No baseline yet for new users
+        if not weekly:
+            continue
+        if recent < weekly * SPENDING_SPIKE_RATIO or recent - weekly < SPENDING_MIN_INCREASE:
+            continue
+        yield row['user_id'], {
+            'dedup_key': _week_key('spending_spike', today),
+            'type': 'trend',
+            'severity': 'warning',
+            'actionable': True,
+            'title': 'Spending spike this week',
+            'message': (
+                f'You spent ${recent:.2f} in the last 7 days, {recent / weekly:.1f}x your weekly '
+                f'average of ${weekly:.2f}.'
+            ),
+            'ttl': WEEKLY_TTL,
+        }
+
+
+def goal_milestones(user_ids, today):
+    """
+    (user_id, insight fields) for the highest milestone each recently updated
+    goal has reached
+    """
+    # Long-finished goals are history, not news
+    updated_since = timezone.now() - timedelta(days=MILESTONE_WINDOW_DAYS)
+    goals = Goal.objects.filter(
+        user_id__in=user_ids, status__in=['active', 'completed'], progress__gte=MILESTONES[0],
+        last_updated__gte=updated_since,
+    ).values_list('id', 'user_id', 'title', 'progress', 'status')
+
+    for goal_id, user_id, title, progress, status in goals:
+        milestone = max(m for m in MILESTONES if progress >= m)
+        completed = milestone == 100 or status == 'completed'
+        yield user_id, {
+            'dedup_key': f'goal_milestone:{goal_id}:{100 if completed else milestone}',
+            'related_goal_id': goal_id,
+            'type': 'achievement',
+            'severity': 'success',
+            'actionable': False,
+            'title': f'Goal completed: {title}' if completed else f'{milestone}% of the way: {title}',
+            'message': (
+                f'You completed your goal "{title}".' if completed
+                else f'You are {milestone}% of the way to your goal "{title}". Keep going!'
+            ),
+            'ttl': MILESTONE_TTL,
+        }
+
+
+RULES = [sleep_after_alcohol, spending_spike, goal_milestones]
+
+
+def generate_insights_chunk(user_ids):
+    """
+    Evaluate RULES for a chunk of users and insert the insights they do not
+    have yet; returns how many were created
+    """
+    today = timezone.now().date()
+    now = timezone.now()
+    candidates = {}
+    for rule in RULES:
+        for user_id, fields in rule(user_ids, today):
+            candidates[user_id, fields['dedup_key']] = fields
+    if not candidates:
+        return 0
+
+    keys = {key for _, key in candidates}
+    for model in (AIInsight, ArchivedAIInsight):
+        seen = model.objects.filter(user_id__in=user_ids, dedup_key__in=keys).values_list('user_id', 'dedup_key')
+        for user_key in seen:
+            candidates.pop(user_key, None)
+
+    insights = [
+        AIInsight(user_id=user_id, expires_at=now + fields.pop('ttl'), **fields)
+        for (user_id, _), fields in candidates.items()
+    ]
+    with transaction.atomic():
+        # Ignores rows a concurrent run inserted since the lookup above
+        AIInsight.objects.bulk_create(insights, batch_size=1000, ignore_conflicts=True)
+        for user_id in sorted({insight.user_id for insight in insights}):
+            insights_bulk_created.send(sender=AIInsight, user_id=user_id)
+    return len(insights)
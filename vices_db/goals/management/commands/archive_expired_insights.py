@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from goals.archive import archive_expired_insights
+
+
+class Command(BaseCommand):
+    help = 'Move expired AI insights to the archive table (run periodically)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help='Stop after this many batches (default: until none are left)')
+
+    def handle(self, *args, **options):
+        moved = archive_expired_insights(
+            batch_size=options['batch_size'], max_batches=options['max_batches']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} expired insights'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from tracking.batch import default_workers, run_chunked
+from goals.models import Goal
+from goals.progress import EVALUATED_METRICS, evaluate_goals_chunk
+
+
+class Command(BaseCommand):
+    help = 'Re-score active journal-driven goals as of today (run daily)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Only evaluate goals of this user id (can be repeated)')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=default_workers())
+
+    def handle(self, *args, **options):
+        goals = Goal.objects.filter(status='active', metric__in=EVALUATED_METRICS)
+        if options['users']:
+            goals = goals.filter(user_id__in=options['users'])
+        goal_ids = list(goals.order_by('id').values_list('id', flat=True))
+
+        completed = 0
+        for count in run_chunked(evaluate_goals_chunk, goal_ids,
+                                 chunk_size=options['chunk_size'],
+                                 workers=options['workers']):
+            completed += count
+        self.stdout.write(self.style.SUCCESS(
+            f'Evaluated {len(goal_ids)} goals, {completed} completed'
+        ))
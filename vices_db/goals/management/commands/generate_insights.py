@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from tracking.batch import default_workers, run_chunked
+from goals.insight_rules import generate_insights_chunk
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Generate rule-based AI insights for every active user (run daily)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Only generate insights for this user id (can be repeated)')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=default_workers())
+
+    def handle(self, *args, **options):
+        user_ids = options['users'] or list(
+            User.objects.filter(is_active=True).order_by('id').values_list('id', flat=True)
+        )
+        created = 0
+        for count in run_chunked(generate_insights_chunk, user_ids,
+                                 chunk_size=options['chunk_size'],
+                                 workers=options['workers']):
+            created += count
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {created} insights for {len(user_ids)} users'
+        ))
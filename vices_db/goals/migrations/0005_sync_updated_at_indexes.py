@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-17 07:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goals', '0004_alter_goal_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aiinsight',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='aiinsight',
+            index=models.Index(fields=['user', 'updated_at'], name='goals_aiins_user_id_b3dcaa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goal',
+            index=models.Index(fields=['user', 'last_updated'], name='goals_goal_user_id_2921ba_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-17 07:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goals', '0005_sync_updated_at_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='goal',
+            name='metric',
+            field=models.CharField(choices=[('manual', 'Manual'), ('abstain_days', 'Abstain for N days'), ('avg_sleep', 'Average sleep quality'), ('weekly_limit', 'Weekly limit')], default='manual', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='goal',
+            name='metric_state',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
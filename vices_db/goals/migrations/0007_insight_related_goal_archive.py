@@ -0,0 +1,86 @@
+# Generated by Django 4.2 on 2026-10-17 08:09
+
+import re
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+GOAL_MENTION = re.compile(r'goal (\d+)', re.IGNORECASE)
+
+
+def link_related_goals(apps, schema_editor):
+    """
+    by_goal used to match 'goal <id>' in the message; link those insights to
+    the goal (when it belongs to the same user) so it can use the foreign key
+    """
+    AIInsight = apps.get_model('goals', 'AIInsight')
+    Goal = apps.get_model('goals', 'Goal')
+
+    mentions = []
+    for insight_id, user_id, message in (
+        AIInsight.objects.filter(message__icontains='goal ').values_list('id', 'user_id', 'message').iterator()
+    ):
+        match = GOAL_MENTION.search(message)
+        if match:
+            mentions.append((insight_id, user_id, int(match.group(1))))
+
+    for start in range(0, len(mentions), 1000):
+        chunk = mentions[start:start + 1000]
+        owners = dict(Goal.objects.filter(id__in=[goal_id for _, _, goal_id in chunk]).values_list('id', 'user_id'))
+        AIInsight.objects.bulk_update(
+            [AIInsight(id=insight_id, related_goal_id=goal_id)
+             for insight_id, user_id, goal_id in chunk if owners.get(goal_id) == user_id],
+            ['related_goal']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('goals', '0006_goal_metric'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedAIInsight',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('related_goal_id', models.BigIntegerField(null=True)),
+                ('type', models.CharField(choices=[('pattern', 'Pattern'), ('health', 'Health'), ('achievement', 'Achievement'), ('optimization', 'Optimization'), ('trend', 'Trend')], max_length=20)),
+                ('severity', models.CharField(choices=[('info', 'Info'), ('warning', 'Warning'), ('success', 'Success'), ('tip', 'Tip')], max_length=20)),
+                ('title', models.CharField(max_length=100)),
+                ('message', models.TextField()),
+                ('created_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='aiinsight',
+            name='related_goal',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='insights', to='goals.goal'),
+        ),
+        migrations.AddIndex(
+            model_name='aiinsight',
+            index=models.Index(fields=['user', 'expires_at'], name='goals_insight_user_expires'),
+        ),
+        migrations.AddIndex(
+            model_name='aiinsight',
+            index=models.Index(fields=['related_goal', 'expires_at'], name='goals_insight_goal_expires'),
+        ),
+        migrations.AddIndex(
+            model_name='aiinsight',
+            index=models.Index(fields=['expires_at'], name='goals_insight_expires'),
+        ),
+        migrations.AddField(
+            model_name='archivedaiinsight',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_insights', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedaiinsight',
+            index=models.Index(fields=['user', 'created_at'], name='goals_archived_user_created'),
+        ),
+        migrations.RunPython(link_related_goals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2 on 2026-10-17 08:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('goals', '0007_insight_related_goal_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aiinsight',
+            name='dedup_key',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedaiinsight',
+            name='dedup_key',
+            field=models.CharField(max_length=100, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='archivedaiinsight',
+            index=models.Index(fields=['user', 'dedup_key'], name='goals_archived_user_dedup_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='aiinsight',
+            constraint=models.UniqueConstraint(condition=models.Q(('dedup_key__isnull', False)), fields=('user', 'dedup_key'), name='goals_insight_user_dedup_key'),
+        ),
+    ]
@@ -42,9 +42,27 @@ class Goal(models.Model):
     target_unit = models.CharField(max_length=20, default='%')
     current_value = models.FloatField(default=0)
     end_date = models.DateField(null=True, blank=True)
+
+    # How current_value/progress are kept up to date (see goals.progress)
+    metric = models.CharField(
+        max_length=20,
+        choices=[
+            ('manual', 'Manual'),
+            ('abstain_days', 'Abstain for N days'),
+            ('avg_sleep', 'Average sleep quality'),
+            ('weekly_limit', 'Weekly limit'),
+        ],
+        default='manual'
+    )
+    metric_state = models.JSONField(default=dict, blank=True)
     
     last_updated = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'last_updated']),
+        ]
+
 class AIInsight(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ai_insights')
     type = models.CharField(
@@ -69,5 +87,56 @@ class AIInsight(models.Model):
         ]
     )
     actionable = models.BooleanField(default=False)
+    # Indexed together with expires_at below
+    related_goal = models.ForeignKey(
+        Goal, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='insights', db_index=False
+    )
+    # Set by generated insights: the rule and the period or goal it is about
+    dedup_key = models.CharField(max_length=100, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    expires_at = models.DateTimeField(null=True)
\ No newline at end of file
+    updated_at = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'updated_at']),
+            # Every read filters on expires_at > now; expired rows are moved
+            # to ArchivedAIInsight by the archive_expired_insights command
+            models.Index(fields=['user', 'expires_at'], name='goals_insight_user_expires'),
+            models.Index(fields=['related_goal', 'expires_at'], name='goals_insight_goal_expires'),
+            models.Index(fields=['expires_at'], name='goals_insight_expires'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'dedup_key'],
+                condition=models.Q(dedup_key__isnull=False),
+                name='goals_insight_user_dedup_key'
+            ),
+        ]
+
+
+class ArchivedAIInsight(models.Model):
+    """
+    Expired AIInsight rows, kept for history out of the hot table. Keeps the
+    original id and only what is needed to show past insights; user-facing
+    reads never touch it.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_insights', db_index=False)
+    # Plain column: the goal may be deleted long after the insight expired
+    related_goal_id = models.BigIntegerField(null=True)
+    type = models.CharField(max_length=20, choices=AIInsight._meta.get_field('type').choices)
+    severity = models.CharField(max_length=20, choices=AIInsight._meta.get_field('severity').choices)
+    title = models.CharField(max_length=100)
+    message = models.TextField()
+    dedup_key = models.CharField(max_length=100, null=True)
+    created_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='goals_archived_user_created'),
+            models.Index(fields=['user', 'dedup_key'], name='goals_archived_user_dedup_key'),
+        ]
\ No newline at end of file
@@ -0,0 +1,295 @@
+"""
+Journal-driven goal progress.
+
+Goals with a metric other than 'manual' have current_value and progress
+derived from the user's journal, counting only entries whose substance
+matches the goal's substance_type (GOAL_SUBSTANCES), dated from start_date to
+the end of the goal period:
+
+    abstain_days  target_value days in a row without a matching entry
+    avg_sleep     average sleep_quality of matching entries >= target_value
+                  over the whole period
+    weekly_limit  at most target_value matching entries in any week of the
+                  period
+
+Each goal keeps what it needs in metric_state, so a new entry is folded in
+O(1) inside the journal write's transaction (record_goal_entries). Edits,
+deletes and entries the state cannot absorb recompute the goal from the
+journal instead. Progress only reaches 100 when the goal completes, which
+flips its status to 'completed'. Time passing alone also moves progress, so
+the evaluate_goals command re-scores active goals daily.
+"""
+import math
+import re
+from datetime import date, timedelta
+from django.db import connection, transaction
+from django.db.models import DateField
+from django.utils import timezone
+from sync.versioning import bump_data_version
+from tracking.models import JournalEntry
+from .models import Goal
+
+# goal substance_type: journal substances that count towards it
+GOAL_SUBSTANCES = {
+    'cannabis': ('cannabis', 'both'),
+    'alcohol': ('alcohol', 'both'),
+    'both': ('cannabis', 'alcohol', 'both'),
+    'wellness': ('none', 'wellness'),
+    'none': ('none', 'wellness'),
+}
+EVALUATED_METRICS = ('abstain_days', 'avg_sleep', 'weekly_limit')
+GOAL_FIELDS = ['metric_state', 'current_value', 'progress', 'status', 'last_updated']
+
+DURATION_UNITS = {'day': 1, 'week': 7, 'month': 30}
+DURATION_RE = re.compile(r'\s*(\d+)\s*(day|week|month)', re.IGNORECASE)
+
+
+def goal_types_for(substance):
+    """
+    Goal substance_types a journal entry of this substance counts towards
+    """
+    return [goal_type for goal_type, substances in GOAL_SUBSTANCES.items() if substance in substances]
+
+
+def goal_end(goal):
+    """
+    Last day of the goal period: end_date, else start_date + duration
+    ('30 days', '2 weeks'...); None when open-ended
+    """
+    if goal.end_date:
+        return goal.end_date
+    match = DURATION_RE.match(goal.duration or '')
+    if not match:
+        return None
+    days = int(match.group(1)) * DURATION_UNITS[match.group(2).lower()]
+    return goal.start_date + timedelta(days=max(days, 1) - 1)
+
+
+def _in_period(goal, day):
+    end = goal_end(goal)
+    return day >= goal.start_date and (end is None or day <= end)
+
+
+def _week(day):
+    return day - timedelta(days=day.weekday())
+
+
+def initial_state(goal):
+    if goal.metric == 'abstain_days':
+        return {'since': goal.start_date.isoformat()}
+    if goal.metric == 'avg_sleep':
+        return {'sum': 0, 'count': 0}
+    return {'week': None, 'count': 0, 'over': 0}
+
+
+def compute_states(goals):
+    """
+    {goal id: metric_state} from scratch for goals of one user, folding the
+    journal in date order with a single query
+    """
+    if not goals:
+        return {}
+    substances = {substance for goal in goals for substance in GOAL_SUBSTANCES[goal.substance_type]}
+    entries = JournalEntry.objects.filter(
+        user_id=goals[0].user_id,
+        substance__in=substances,
+        date__gte=min(goal.start_date for goal in goals),
+    ).order_by('date').values_list('date', 'substance', 'sleep_quality')
+
+    states = {goal.id: initial_state(goal) for goal in goals}
+    periods = [
+        (goal, states[goal.id], GOAL_SUBSTANCES[goal.substance_type], goal.start_date, goal_end(goal) or date.max)
+        for goal in goals
+    ]
+    for day, substance, sleep_quality in entries.iterator(chunk_size=2000):
+        for goal, state, substances, start, end in periods:
+            if substance in substances and start <= day <= end:
+                fold_entry(goal, state, day, sleep_quality)
+    return states
+
+
+def compute_state(goal):
+    """
+    metric_state of a goal from scratch, from the journal
+    """
+    return compute_states([goal])[goal.id]
+
+
+def fold_entry(goal, state, day, sleep_quality):
+    """
+    State after one new entry in the goal's period, or None when the entry
+    cannot be folded in (an earlier week of a weekly limit)
+    """
+    if goal.metric == 'abstain_days':
+        if day >= date.fromisoformat(state['since']):
+            state['since'] = (day + timedelta(days=1)).isoformat()
+        return state
+
+    if goal.metric == 'avg_sleep':
+        state['sum'] += float(sleep_quality)
+        state['count'] += 1
+        return state
+
+    week = _week(day)
+    current = date.fromisoformat(state['week']) if state['week'] else None
+    if current and week < current:
+        return None
+    if week != current:
+        state['week'] = week.isoformat()
+        state['count'] = 0
+    state['count'] += 1
+    # Counted once, when the week first goes over
+    if state['count'] == math.floor(goal.target_value) + 1:
+        state['over'] += 1
+    return state
+
+
+def score(goal, state, today):
+    """
+    (current_value, progress, completed) of a goal as of today
+    """
+    end = goal_end(goal)
+    as_of = min(today, end) if end else today
+    elapsed_days = max((as_of - goal.start_date).days + 1, 0)
+    # Share of the goal period behind us; None for open-ended goals
+    elapsed = min(elapsed_days / ((end - goal.start_date).days + 1), 1) if end else None
+    target = goal.target_value
+
+    if goal.metric == 'abstain_days':
+        current = max((as_of - date.fromisoformat(state['since'])).days + 1, 0)
+        ratio = min(current / target, 1) if target > 0 else 1
+        completed = current >= target
+    elif goal.metric == 'avg_sleep':
+        current = round(state['sum'] / state['count'], 2) if state['count'] else 0
+        ratio = (min(current / target, 1) if target > 0 else 1) * (1 if elapsed is None else elapsed)
+        completed = state['count'] > 0 and current >= target and elapsed == 1
+    else:
+        current = state['count'] if state['week'] == _week(today).isoformat() else 0
+        weeks = max(math.ceil(elapsed_days / 7), 1)
+        ratio = max(weeks - state['over'], 0) / weeks * (1 if elapsed is None else elapsed)
+        completed = state['over'] == 0 and elapsed == 1
+
+    progress = 100 if completed else min(round(ratio * 100), 99)
+    return current, progress, completed
+
+
+def apply_state(goal, state, today, now):
+    goal.metric_state = state
+    goal.current_value, goal.progress, completed = score(goal, state, today)
+    if completed:
+        goal.status = 'completed'
+    goal.last_updated = now
+
+
+def evaluate_goal(goal, recompute=True):
+    """
+    Re-score one goal (from a fresh state when recompute) and save it
+    """
+    if goal.metric not in EVALUATED_METRICS:
+        return goal
+    state = compute_state(goal) if recompute or not goal.metric_state else goal.metric_state
+    apply_state(goal, state, timezone.now().date(), timezone.now())
+    goal.save(update_fields=GOAL_FIELDS)
+    return goal
+
+
+def save_goals(goals):
+    """
+    Write GOAL_FIELDS of many goals in one executemany() round trip.
+    bulk_update() builds a CASE per field and row, which costs more than the
+    evaluation itself; like it, this skips auto_now (apply_state sets it).
+    """
+    if not goals:
+        return
+    qn = connection.ops.quote_name
+    fields = [Goal._meta.get_field(name) for name in GOAL_FIELDS]
+    assignments = ', '.join(f'{qn(field.column)} = %s' for field in fields)
+    sql = f'UPDATE {qn(Goal._meta.db_table)} SET {assignments} WHERE {qn(Goal._meta.pk.column)} = %s'
+    rows = [
+        [field.get_db_prep_save(getattr(goal, field.attname), connection) for field in fields] + [goal.pk]
+        for goal in goals
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def _affected_goals(user_id, substances):
+    goal_types = {goal_type for substance in substances for goal_type in goal_types_for(substance)}
+    return Goal.objects.select_for_update().filter(
+        user_id=user_id, status='active', metric__in=EVALUATED_METRICS, substance_type__in=goal_types
+    )
+
+
+def record_goal_entries(user_id, entries):
+    """
+    Fold newly created journal entries into the user's active goals whose
+    substance_type they count towards. Call inside the write's transaction.
+    """
+    if not entries:
+        return []
+    to_date = DateField().to_python
+    entries = sorted((to_date(e.date), e.substance, e.sleep_quality) for e in entries)
+    today = timezone.now().date()
+    now = timezone.now()
+
+    with transaction.atomic():
+        goals = list(_affected_goals(user_id, {substance for _, substance, _ in entries}))
+        states = {}
+        for goal in goals:
+            if not goal.metric_state:
+                continue
+            state = dict(goal.metric_state)
+            substances = GOAL_SUBSTANCES[goal.substance_type]
+            for day, substance, sleep_quality in entries:
+                if substance in substances and _in_period(goal, day):
+                    state = fold_entry(goal, state, day, sleep_quality)
+                    if state is None:
+                        break
+            if state is not None:
+                states[goal.id] = state
+        # Goals the new entries could not be folded into start over
+        states.update(compute_states([goal for goal in goals if goal.id not in states]))
+        for goal in goals:
+            apply_state(goal, states[goal.id], today, now)
+        save_goals(goals)
+        return goals
+
+
+def reevaluate_goals(user_id, substances):
+    """
+    Recompute the active goals affected by edited or deleted entries of the
+    given substances
+    """
+    today = timezone.now().date()
+    now = timezone.now()
+    with transaction.atomic():
+        goals = list(_affected_goals(user_id, substances))
+        states = compute_states(goals)
+        for goal in goals:
+            apply_state(goal, states[goal.id], today, now)
+        save_goals(goals)
+        return goals
+
+
+def evaluate_goals_chunk(goal_ids):
+    """
+    Re-score a chunk of goals as of today; returns how many completed.
+    save_goals() sends no signals, so the data version of every user whose
+    goals changed is bumped here, for ETags and cached analytics.
+    """
+    today = timezone.now().date()
+    now = timezone.now()
+    with transaction.atomic():
+        goals = list(Goal.objects.select_for_update().filter(
+            id__in=goal_ids, status='active', metric__in=EVALUATED_METRICS
+        ))
+        changed_users = set()
+        for goal in goals:
+            before = (goal.current_value, goal.progress, goal.status)
+            apply_state(goal, goal.metric_state or compute_state(goal), today, now)
+            if (goal.current_value, goal.progress, goal.status) != before:
+                changed_users.add(goal.user_id)
+        save_goals(goals)
+        for user_id in sorted(changed_users):
+            bump_data_version(user_id)
+    return sum(1 for goal in goals if goal.status == 'completed')
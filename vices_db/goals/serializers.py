@@ -8,7 +8,7 @@ class GoalSerializer(serializers.ModelSerializer):
             'id', 'user', 'title', 'description', 'substance_type', 'duration',
             'progress', 'status', 'benefits', 'challenge', 'start_date',
             'target_value', 'target_unit', 'current_value', 'end_date',  # Add missing fields
-            'last_updated'
+            'metric', 'last_updated'
         ]
         read_only_fields = ['id', 'user', 'start_date', 'last_updated']
 class AIInsightSerializer(serializers.ModelSerializer):
@@ -16,6 +16,6 @@ class AIInsightSerializer(serializers.ModelSerializer):
         model = AIInsight
         fields = [
             'id', 'user', 'type', 'title', 'message', 'severity',
-            'actionable', 'created_at', 'expires_at'
+            'actionable', 'related_goal', 'created_at', 'expires_at'
         ]
         read_only_fields = ['id', 'user', 'created_at']
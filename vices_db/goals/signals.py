@@ -0,0 +1,35 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+from tracking.models import JournalEntry
+from tracking.signals import journal_entries_bulk_created
+from .progress import record_goal_entries, reevaluate_goals
+
+# bulk_update() skips post_save, so batch writers send this instead.
+# Sent with sender=Goal, user_id and the ids of the updated goals.
+goals_bulk_updated = Signal()
+# Sent by the insight generator with sender=AIInsight and user_id, once per
+# user that got new insights
+insights_bulk_created = Signal()
+
+
+@receiver(post_save, sender=JournalEntry)
+def update_goals_on_save(sender, instance, created, **kwargs):
+    if created:
+        record_goal_entries(instance.user_id, [instance])
+        return
+    substances = {instance.substance}
+    # Stashed by tracking's pre_save handler
+    previous = getattr(instance, '_previous_rollup_key', None)
+    if previous:
+        substances.add(previous[1])
+    reevaluate_goals(instance.user_id, substances)
+
+
+@receiver(post_delete, sender=JournalEntry)
+def update_goals_on_delete(sender, instance, **kwargs):
+    reevaluate_goals(instance.user_id, {instance.substance})
+
+
+@receiver(journal_entries_bulk_created, sender=JournalEntry)
+def update_goals_on_bulk_create(sender, user_id, entries, **kwargs):
+    record_goal_entries(user_id, entries)
@@ -1,3 +1,267 @@
+from datetime import timedelta
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from sync.models import Tombstone
+from sync.versioning import get_data_version
+from tracking.models import ConsumptionEvent, JournalEntry
+from users.models import User
+from .archive import archive_expired_insights
+from .insight_rules import generate_insights_chunk
+from .models import Goal, AIInsight, ArchivedAIInsight
+from .progress import compute_state, evaluate_goal, evaluate_goals_chunk
 
-# Create your tests here.
+
+class JournalDrivenProgressTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='goals', email='goals@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.today = timezone.now().date()
+
+    def goal(self, metric, substance_type, target, days_ago, **extra):
+        response = self.client.post('/api/goals/', {
+            'title': metric, 'description': metric, 'substance_type': substance_type,
+            'duration': extra.pop('duration', 'open'), 'challenge': metric, 'benefits': [],
+            'metric': metric, 'target_value': target, **extra,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        goal = Goal.objects.get(pk=response.data['id'])
+        # start_date is auto_now_add; backdate it and start from the journal
+        Goal.objects.filter(pk=goal.pk).update(start_date=self.today - timedelta(days=days_ago))
+        goal.refresh_from_db()
+        return evaluate_goal(goal)
+
+    def log(self, days_ago, substance, sleep_quality=5):
+        response = self.client.post('/api/tracking/journal/', {
+            'date': (self.today - timedelta(days=days_ago)).isoformat(), 'substance': substance,
+            'amount': '1', 'mood': 5, 'sleep_quality': sleep_quality,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['id']
+
+    def test_abstain_days_resets_on_use_and_completes(self):
+        self.log(3, 'alcohol')
+        goal = self.goal('abstain_days', 'alcohol', 4, days_ago=6)
+        self.assertEqual((goal.current_value, goal.progress, goal.status), (3, 75, 'active'))
+
+        done = self.goal('abstain_days', 'cannabis', 7, days_ago=6)
+        self.assertEqual((done.current_value, done.progress, done.status), (7, 100, 'completed'))
+
+        self.log(1, 'both')
+        goal.refresh_from_db()
+        done.refresh_from_db()
+        self.assertEqual((goal.current_value, goal.progress, goal.status), (1, 25, 'active'))
+        self.assertEqual(done.status, 'completed')
+
+    def test_avg_sleep_counts_matching_entries_until_the_period_ends(self):
+        goal = self.goal('avg_sleep', 'wellness', 7, days_ago=6, end_date=self.today.isoformat())
+        self.log(3, 'wellness', sleep_quality=6)
+        goal.refresh_from_db()
+        self.assertEqual(goal.status, 'active')
+        self.log(2, 'cannabis', sleep_quality=1)
+        self.log(1, 'none', sleep_quality=8)
+        goal.refresh_from_db()
+        self.assertEqual(goal.current_value, 7)
+        self.assertEqual(goal.status, 'completed')
+
+        open_ended = self.goal('avg_sleep', 'none', 7, days_ago=6)
+        open_ended.refresh_from_db()
+        self.assertEqual(open_ended.current_value, 7)
+        self.assertEqual((open_ended.progress, open_ended.status), (99, 'active'))
+
+    def test_weekly_limit_folds_and_recomputes_backfilled_weeks(self):
+        goal = self.goal('weekly_limit', 'alcohol', 1, days_ago=20, duration='4 weeks')
+        self.log(0, 'alcohol')
+        self.log(0, 'both')
+        # An earlier week cannot be folded in, so the goal is recomputed
+        self.log(14, 'alcohol')
+        goal.refresh_from_db()
+        self.assertEqual(goal.metric_state, compute_state(goal))
+        self.assertEqual(goal.metric_state['over'], 1)
+        self.assertEqual(goal.current_value, 2)
+        self.assertEqual(goal.status, 'active')
+
+    def test_only_matching_goals_are_touched(self):
+        goal = self.goal('abstain_days', 'alcohol', 30, days_ago=3)
+        before = Goal.objects.get(pk=goal.pk).last_updated
+        self.log(0, 'wellness')
+        self.log(0, 'cannabis')
+        self.assertEqual(Goal.objects.get(pk=goal.pk).last_updated, before)
+
+    def test_edits_and_deletes_recompute(self):
+        goal = self.goal('abstain_days', 'alcohol', 30, days_ago=10)
+        entry_id = self.log(2, 'alcohol')
+        goal.refresh_from_db()
+        self.assertEqual(goal.current_value, 2)
+
+        self.client.patch(f'/api/tracking/journal/{entry_id}/', {'substance': 'none'}, format='json')
+        goal.refresh_from_db()
+        self.assertEqual(goal.current_value, 11)
+
+        self.client.patch(f'/api/tracking/journal/{entry_id}/', {'substance': 'alcohol'}, format='json')
+        JournalEntry.objects.get(pk=entry_id).delete()
+        goal.refresh_from_db()
+        self.assertEqual(goal.current_value, 11)
+
+    def test_nightly_evaluation_skips_manual_goals_and_bumps_the_data_version(self):
+        goal = self.goal('abstain_days', 'alcohol', 30, days_ago=3)
+        manual = Goal.objects.create(user=self.user, title='Manual', description='', substance_type='alcohol',
+                                     duration='30 days', challenge='', benefits=[], progress=40)
+        manual_updated = manual.last_updated
+        version = get_data_version(self.user.id)
+
+        self.assertEqual(evaluate_goals_chunk([goal.id, manual.id]), 0)
+        self.assertEqual(get_data_version(self.user.id), version)
+
+        # A day later the abstain streak is one day longer
+        Goal.objects.filter(pk=goal.pk).update(start_date=self.today - timedelta(days=4),
+                                               metric_state={'since': (self.today - timedelta(days=4)).isoformat()})
+        evaluate_goals_chunk([goal.id, manual.id])
+        goal.refresh_from_db()
+        manual.refresh_from_db()
+        self.assertEqual(goal.current_value, 5)
+        self.assertEqual(get_data_version(self.user.id), version + 1)
+        self.assertEqual((manual.progress, manual.last_updated), (40, manual_updated))
+
+
+class GoalBatchTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='batch', email='batch@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.goals = [
+            Goal.objects.create(user=self.user, title=f'Goal {i}', description='', substance_type='alcohol',
+                                duration='30 days', challenge='', benefits=[])
+            for i in range(3)
+        ]
+
+    def test_batch_applies_valid_operations_in_one_transaction(self):
+        other = Goal.objects.create(
+            user=User.objects.create(username='other', email='other@example.com'),
+            title='Theirs', description='', substance_type='alcohol', duration='', challenge='', benefits=[]
+        )
+        first, second, third = self.goals
+        with self.assertNumQueries(6):
+            response = self.client.post('/api/goals/batch/', {'operations': [
+                {'id': first.id, 'action': 'pause'},
+                {'id': second.id, 'action': 'update_progress', 'progress': 40},
+                {'id': second.id, 'action': 'update_progress', 'progress': 100},
+                {'id': third.id, 'action': 'resume'},
+                {'id': third.id, 'action': 'update_progress', 'progress': 101},
+                {'id': other.id, 'action': 'complete'},
+                {'id': first.id, 'action': 'archive'},
+            ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['updated'], response.data['invalid']), (2, 3))
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['updated', 'updated', 'updated', 'unchanged', 'invalid', 'invalid', 'invalid']
+        )
+        self.assertIn('progress', response.data['results'][4]['errors'])
+        self.assertIn('id', response.data['results'][5]['errors'])
+        self.assertIn('action', response.data['results'][6]['errors'])
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        third.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(first.status, 'paused')
+        self.assertEqual((second.progress, second.status), (100, 'completed'))
+        self.assertEqual(third.status, 'active')
+        self.assertEqual(other.status, 'active')
+        self.assertGreater(first.last_updated, third.last_updated)
+
+    def test_batch_rejects_non_list(self):
+        response = self.client.post('/api/goals/batch/', {'operations': 'pause'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class InsightArchiveTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='insights', email='insights@example.com')
+        self.goal = Goal.objects.create(user=self.user, title='Goal', description='', substance_type='alcohol',
+                                        duration='30 days', challenge='', benefits=[])
+        now = timezone.now()
+        self.insights = [
+            AIInsight.objects.create(
+                user=self.user, type='trend', title=f'Insight {days}', message='', severity='info',
+                related_goal=self.goal if days % 2 else None, expires_at=now + timedelta(days=days)
+            )
+            for days in range(-5, 3)
+        ]
+
+    def test_expired_insights_move_to_the_archive_in_batches(self):
+        with self.assertNumQueries(18):
+            self.assertEqual(archive_expired_insights(batch_size=2), 6)
+
+        self.assertEqual(AIInsight.objects.count(), 2)
+        archived = ArchivedAIInsight.objects.order_by('expires_at')
+        self.assertEqual([a.id for a in archived], [i.id for i in self.insights[:6]])
+        self.assertEqual(archived[0].related_goal_id, self.goal.id)
+        self.assertFalse(Tombstone.objects.exists())
+        self.assertEqual(archive_expired_insights(), 0)
+
+    def test_insights_without_an_expiry_are_archived(self):
+        never = AIInsight.objects.create(
+            user=self.user, type='tip', title='No expiry', message='', severity='info', expires_at=None
+        )
+        archive_expired_insights()
+        self.assertFalse(AIInsight.objects.filter(pk=never.pk).exists())
+        self.assertEqual(ArchivedAIInsight.objects.get(pk=never.pk).expires_at, never.created_at)
+
+    def test_by_goal_uses_the_related_goal(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/goals/insights/by_goal/', {'goal_id': self.goal.id})
+        self.assertEqual([row['title'] for row in response.data], ['Insight 1'])
+        self.assertEqual(client.get('/api/goals/insights/by_goal/', {'goal_id': 'x'}).status_code, 400)
+
+
+class InsightGenerationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='rules', email='rules@example.com')
+        today = timezone.now().date()
+        # Drinking every third day, with poor sleep the day after
+        for days_ago in range(12, 0, -1):
+            drank = days_ago % 3 == 0
+            sleep_quality = 6 if drank else 3 if (days_ago + 1) % 3 == 0 else 8
+            JournalEntry.objects.create(
+                user=self.user, date=today - timedelta(days=days_ago), substance='alcohol' if drank else 'none',
+                amount='1', mood=5, sleep_quality=sleep_quality,
+            )
+        for days_ago, spending in [(10, 10), (17, 10), (24, 10), (31, 10), (1, 50)]:
+            ConsumptionEvent.objects.create(
+                user=self.user, date=today - timedelta(days=days_ago), vice_type='alcohol',
+                quantity=1, spending=spending,
+            )
+        self.goal = Goal.objects.create(user=self.user, title='Dry month', description='', substance_type='alcohol',
+                                        duration='30 days', challenge='', benefits=[], progress=60)
+
+    def test_long_finished_goals_get_no_milestone(self):
+        Goal.objects.filter(pk=self.goal.pk).update(status='completed', progress=100,
+                                                    last_updated=timezone.now() - timedelta(days=60))
+        generate_insights_chunk([self.user.id])
+        self.assertFalse(AIInsight.objects.filter(dedup_key__startswith='goal_milestone').exists())
+
+    def test_rules_create_each_insight_once(self):
+        version = get_data_version(self.user.id)
+        with self.assertNumQueries(9):
+            self.assertEqual(generate_insights_chunk([self.user.id]), 3)
+
+        insights = {i.dedup_key.split(':')[0]: i for i in AIInsight.objects.filter(user=self.user)}
+        self.assertEqual(set(insights), {'sleep_after_alcohol', 'spending_spike', 'goal_milestone'})
+        self.assertEqual(insights['goal_milestone'].dedup_key, f'goal_milestone:{self.goal.id}:50')
+        self.assertEqual(insights['goal_milestone'].related_goal, self.goal)
+        self.assertTrue(all(i.expires_at > timezone.now() for i in insights.values()))
+        self.assertEqual(get_data_version(self.user.id), version + 1)
+
+        self.assertEqual(generate_insights_chunk([self.user.id]), 0)
+        # Archived milestones are not announced again
+        AIInsight.objects.update(expires_at=timezone.now())
+        archive_expired_insights()
+        self.assertEqual(generate_insights_chunk([self.user.id]), 0)
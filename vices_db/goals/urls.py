@@ -3,8 +3,9 @@ from rest_framework.routers import DefaultRouter
 from . import views
 
 router = DefaultRouter()
-router.register(r'', views.GoalViewSet, basename='goal')
+# Registered before the goals so insights/ is not taken for a goal pk
 router.register(r'insights', views.AIInsightViewSet, basename='insight')
+router.register(r'', views.GoalViewSet, basename='goal')
 
 urlpatterns = [
     path('', include(router.urls)),
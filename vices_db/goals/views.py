@@ -1,11 +1,61 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.db import transaction
 from django.utils import timezone
 from django.db.models import Avg, Count, Q
 from datetime import datetime, timedelta
 from .models import Goal, AIInsight
+from .progress import evaluate_goal
 from .serializers import GoalSerializer, AIInsightSerializer
+from .signals import goals_bulk_updated
+from sync.versioning import conditional_on_data_version
+from tracking.cache import cached_analytics
+
+BATCH_MAX_OPERATIONS = 500
+
+# action: fields it sets
+GOAL_TRANSITIONS = {
+    'pause': {'status': 'paused'},
+    'resume': {'status': 'active'},
+    'complete': {'status': 'completed', 'progress': 100},
+    'update_progress': {},
+}
+
+
+def validate_operation(item, goals):
+    """
+    Errors of one batch operation against the user's goals ({id: Goal})
+    """
+    if not isinstance(item, dict):
+        return {'non_field_errors': ['Expected an object']}
+    errors = {}
+    if item.get('id') not in goals:
+        errors['id'] = ['Goal not found']
+    if item.get('action') not in GOAL_TRANSITIONS:
+        errors['action'] = [f'Expected one of {", ".join(GOAL_TRANSITIONS)}']
+    elif item['action'] == 'update_progress':
+        progress = item.get('progress')
+        if not isinstance(progress, int) or isinstance(progress, bool) or not 0 <= progress <= 100:
+            errors['progress'] = ['Progress must be an integer between 0 and 100']
+    return errors
+
+
+def apply_operation(goal, item):
+    """
+    Apply a validated operation to goal; returns the fields that changed
+    """
+    values = dict(GOAL_TRANSITIONS[item['action']])
+    if item['action'] == 'update_progress':
+        values['progress'] = item['progress']
+        # Same as update_progress: reaching 100% completes the goal
+        if item['progress'] == 100:
+            values['status'] = 'completed'
+    changed = {field for field, value in values.items() if getattr(goal, field) != value}
+    for field in changed:
+        setattr(goal, field, values[field])
+    return changed
+
 
 class GoalViewSet(viewsets.ModelViewSet):
     serializer_class = GoalSerializer
@@ -23,8 +73,19 @@ class GoalViewSet(viewsets.ModelViewSet):
             
         return queryset.order_by('-start_date')
 
+    @conditional_on_data_version
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        evaluate_goal(serializer.save(user=self.request.user))
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        goal = serializer.save()
+        if goal.status == 'active':
+            evaluate_goal(goal)
 
     @action(detail=True, methods=['post'])
     def update_progress(self, request, pk=None):
@@ -73,17 +134,88 @@ class GoalViewSet(viewsets.ModelViewSet):
         goal.save()
         return Response(self.serializer_class(goal).data)
 
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Apply many pause/resume/complete/update_progress operations in one
+        transaction, e.g. [{"id": 3, "action": "pause"}, {"id": 4, "action":
+        "update_progress", "progress": 60}] (or {"operations": [...]}).
+
+        Invalid operations are reported per item and the valid ones still
+        applied; operations on the same goal apply in order. Goals are written
+        with bulk_update() on only the fields that changed, and untouched when
+        nothing did.
+        """
+        items = request.data.get('operations') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list):
+            return Response(
+                {'error': 'Expected a list of operations'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > BATCH_MAX_OPERATIONS:
+            return Response(
+                {'error': f'At most {BATCH_MAX_OPERATIONS} operations per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = []
+        changed = {}
+        with transaction.atomic():
+            ids = [item.get('id') for item in items if isinstance(item, dict)]
+            goals = Goal.objects.select_for_update().filter(user=request.user).in_bulk(
+                [goal_id for goal_id in ids if isinstance(goal_id, int)]
+            )
+            now = timezone.now()
+            for index, item in enumerate(items):
+                goal_id = item.get('id') if isinstance(item, dict) else None
+                errors = validate_operation(item, goals)
+                if errors:
+                    results.append({'index': index, 'id': goal_id, 'status': 'invalid', 'errors': errors})
+                    continue
+                goal = goals[goal_id]
+                fields = apply_operation(goal, item)
+                if fields:
+                    goal.last_updated = now
+                    changed.setdefault(goal_id, set()).update(fields)
+                results.append({'index': index, 'id': goal_id, 'status': 'updated' if fields else 'unchanged'})
+
+            # bulk_update() takes one field list, so group goals by what changed
+            # (it also skips auto_now, hence last_updated above)
+            by_fields = {}
+            for goal_id, fields in changed.items():
+                by_fields.setdefault(tuple(sorted(fields | {'last_updated'})), []).append(goals[goal_id])
+            for fields, batch in by_fields.items():
+                Goal.objects.bulk_update(batch, fields)
+            if changed:
+                goals_bulk_updated.send(sender=Goal, user_id=request.user.id, goals=list(changed))
+
+        touched = list(dict.fromkeys(result['id'] for result in results if result['status'] != 'invalid'))
+        goal_data = dict(zip(touched, self.serializer_class([goals[i] for i in touched], many=True).data))
+        for result in results:
+            if result['status'] != 'invalid':
+                result['goal'] = goal_data[result['id']]
+
+        return Response({
+            'updated': len(changed),
+            'invalid': sum(1 for result in results if result['status'] == 'invalid'),
+            'results': results
+        })
+
     @action(detail=False, methods=['get'])
+    @conditional_on_data_version
     def active(self, request):
         goals = self.get_queryset().filter(status__in=['active', 'in_progress'])
         return Response(self.serializer_class(goals, many=True).data)
 
     @action(detail=False, methods=['get'])
+    @conditional_on_data_version
     def completed(self, request):
         goals = self.get_queryset().filter(status='completed')
         return Response(self.serializer_class(goals, many=True).data)
 
     @action(detail=False, methods=['get'])
+    @conditional_on_data_version
+    @cached_analytics('progress_stats')
     def progress_stats(self, request):
         timeframe = int(request.query_params.get('timeframe', '30'))
         start_date = timezone.now() - timedelta(days=timeframe)
@@ -131,16 +263,13 @@ class AIInsightViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def by_goal(self, request):
         goal_id = request.query_params.get('goal_id')
-        if not goal_id:
+        if not goal_id or not goal_id.isdigit():
             return Response(
                 {'error': 'goal_id parameter is required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-            
-        insights = self.get_queryset().filter(
-            Q(related_goal_id=goal_id) | 
-            Q(message__icontains=f'goal {goal_id}')
-        )
+
+        insights = self.get_queryset().filter(related_goal_id=goal_id)
         return Response(self.serializer_class(insights, many=True).data)
 
     @action(detail=False, methods=['get'])
@@ -0,0 +1,140 @@
+"""
+Deterministic synthetic users for the perf suite.
+
+Rows are written with bulk_create and the derived tables (rollups, tag
+index, stats, streaks, goal progress) rebuilt afterwards, the same way the
+rebuild_* and evaluate_goals management commands do after an import.
+"""
+import os
+import random
+from datetime import timedelta
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from goals.models import Goal, AIInsight
+from goals.progress import evaluate_goals_chunk
+from sync.versioning import bump_data_version
+from tracking.models import JournalEntry, ConsumptionEvent
+from tracking.partitions import ensure_month_partitions
+from tracking.rollups import rebuild_user_rollups
+from tracking.stats_engine import rebuild_user_stats
+from tracking.tags import rebuild_user_tags
+from users.models import User
+
+SUBSTANCES = ['cannabis', 'alcohol', 'both', 'none', 'wellness']
+TAGS = ['calm', 'social', 'anxious', 'focused', 'tired', 'creative', 'work', 'weekend']
+LOCATIONS = ['home', 'bar', 'friends', 'outdoors']
+TIMES_OF_DAY = ['morning', 'afternoon', 'evening', 'night']
+GOAL_STATUSES = ['active', 'active', 'paused', 'completed', 'abandoned']
+GOAL_METRICS = ['manual', 'manual', 'abstain_days', 'avg_sleep', 'weekly_limit']
+INSIGHT_TYPES = ['pattern', 'health', 'achievement', 'optimization', 'trend']
+INSIGHT_SEVERITIES = ['info', 'warning', 'success', 'tip']
+
+# Rows per synthetic user
+VOLUME = {
+    'entries': int(os.getenv('PERF_ENTRIES', 3000)),
+    'events': int(os.getenv('PERF_EVENTS', 2000)),
+    'goals': int(os.getenv('PERF_GOALS', 300)),
+    'insights': int(os.getenv('PERF_INSIGHTS', 1000)),
+}
+PASSWORD = 'perf-password'
+
+
+def _entries(user, rng, count, today):
+    # A few entries a day, going back as far as the count requires
+    days = max(count // 3, 1)
+    for index in range(count):
+        yield JournalEntry(
+            user=user,
+            date=today - timedelta(days=rng.randrange(days)),
+            substance=rng.choice(SUBSTANCES),
+            amount=str(rng.randint(1, 4)),
+            mood=rng.randint(1, 10),
+            sleep_quality=rng.randint(1, 10),
+            sleep=rng.randint(4, 10),
+            effects=rng.choice(['relaxed', 'energised', 'sleepy', '']),
+            notes=f'Synthetic entry {index} {rng.choice(TAGS)}',
+            tags=rng.sample(TAGS, rng.randint(0, 3)),
+        )
+
+
+def _events(user, rng, count, today):
+    days = max(count // 2, 1)
+    for _ in range(count):
+        mood_before = rng.randint(1, 10)
+        yield ConsumptionEvent(
+            user=user,
+            date=today - timedelta(days=rng.randrange(days)),
+            vice_type=rng.choice(SUBSTANCES[:2]),
+            quantity=rng.randint(1, 5),
+            spending=round(rng.uniform(0, 60), 2),
+            location=rng.choice(LOCATIONS),
+            time_of_day=rng.choice(TIMES_OF_DAY),
+            mood_before=mood_before,
+            mood_after=max(1, min(10, mood_before + rng.randint(-2, 2))),
+        )
+
+
+def _goals(user, rng, count):
+    for index in range(count):
+        metric = rng.choice(GOAL_METRICS)
+        yield Goal(
+            user=user,
+            title=f'Goal {index}',
+            description='Synthetic goal',
+            substance_type=rng.choice(SUBSTANCES),
+            duration=rng.choice(['7 days', '30 days', '90 days']),
+            progress=rng.randint(0, 100),
+            status=rng.choice(GOAL_STATUSES),
+            benefits=['sleep', 'money'],
+            challenge='Take a break',
+            metric=metric,
+            target_value={'abstain_days': 30, 'avg_sleep': 7, 'weekly_limit': 3}.get(metric, 100),
+        )
+
+
+def _insights(user, rng, count, now, goal_ids):
+    for index in range(count):
+        yield AIInsight(
+            user=user,
+            # Half are about one of the user's goals
+            related_goal_id=rng.choice(goal_ids) if goal_ids and rng.random() < 0.5 else None,
+            type=rng.choice(INSIGHT_TYPES),
+            title=f'Insight {index}',
+            message=f'Synthetic insight {index}',
+            severity=rng.choice(INSIGHT_SEVERITIES),
+            actionable=rng.random() < 0.5,
+            # A quarter has expired already
+            expires_at=now + timedelta(days=rng.randint(-10, 30)),
+        )
+
+
+def seed_user(username, seed=0, **volume):
+    """
+    Create a user with VOLUME rows of everything (override per kind with
+    e.g. entries=100); returns (user, token key)
+    """
+    volume = {**VOLUME, **volume}
+    rng = random.Random(seed)
+    now = timezone.now()
+    today = now.date()
+
+    user = User.objects.create_user(
+        username=username, email=f'{username}@example.com', password=PASSWORD,
+        first_name='Perf', last_name=username, province='ON',
+    )
+    JournalEntry.objects.bulk_create(_entries(user, rng, volume['entries'], today), batch_size=1000)
+    events = list(_events(user, rng, volume['events'], today))
+    if events:
+        ensure_month_partitions(min(e.date for e in events), today)
+    ConsumptionEvent.objects.bulk_create(events, batch_size=1000)
+    goals = Goal.objects.bulk_create(_goals(user, rng, volume['goals']), batch_size=1000)
+    AIInsight.objects.bulk_create(
+        _insights(user, rng, volume['insights'], now, [goal.id for goal in goals]), batch_size=1000
+    )
+
+    rebuild_user_rollups(user.id)
+    rebuild_user_tags(user.id)
+    rebuild_user_stats(user.id)
+    evaluate_goals_chunk(list(Goal.objects.filter(user=user).values_list('id', flat=True)))
+    bump_data_version(user.id)
+    return user, Token.objects.create(user=user).key
@@ -0,0 +1,258 @@
+import json
+import os
+import statistics
+import time
+from collections import namedtuple
+from datetime import date
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from goals.models import Goal, AIInsight
+from tracking.models import JournalEntry, ConsumptionEvent
+from .fixtures import PASSWORD, seed_user
+
+BASELINE_PATH = Path(__file__).with_name('baseline.json')
+
+# budget: the most queries the endpoint may issue, whatever the data volume
+# (counted with token authentication, so most include the token lookup).
+# path and data are formatted with the seeded ids ({entry}, {event}, {goal},
+# {insight}, {related_goal}, {user}) and the request number ({n}).
+Endpoint = namedtuple('Endpoint', ['method', 'path', 'budget', 'data', 'status', 'anonymous'],
+                      defaults=(None, 200, False))
+
+JOURNAL_ENTRY = {'date': '{today}', 'substance': 'none', 'amount': '0', 'mood': 7,
+                 'sleep_quality': 7, 'tags': ['calm'], 'notes': 'Perf entry'}
+CONSUMPTION_EVENT = {'date': '{today}', 'vice_type': 'alcohol', 'quantity': 2, 'spending': 12.5,
+                     'location': 'bar', 'time_of_day': 'evening', 'mood_before': 5, 'mood_after': 6}
+STRIPE_SUBSCRIPTION = SimpleNamespace(id='sub_perf', status='active', cancel_at_period_end=True,
+                                      current_period_end=0)
+STRIPE_CUSTOMER = SimpleNamespace(id='cus_perf', metadata={})
+
+ENDPOINTS = {
+    # tracking: journal
+    'journal-list': Endpoint('get', '/api/tracking/journal/', 3),
+    'journal-create': Endpoint('post', '/api/tracking/journal/', 26, JOURNAL_ENTRY, 201),
+    'journal-detail': Endpoint('get', '/api/tracking/journal/{entry}/', 2),
+    'journal-update': Endpoint('patch', '/api/tracking/journal/{entry}/', 26, {'mood': 3}),
+    'journal-delete': Endpoint('delete', '/api/tracking/journal/{entry}/', 25, status=204),
+    'journal-bulk': Endpoint('post', '/api/tracking/journal/bulk/', 27,
+                             {'entries': [dict(JOURNAL_ENTRY, client_id='perf-{n}-a'),
+                                          dict(JOURNAL_ENTRY, client_id='perf-{n}-b')]}),
+    'journal-by-user': Endpoint('get', '/api/tracking/journal/by-user/', 2),
+    'journal-debug-all': Endpoint('get', '/api/tracking/journal/debug-all/', 1, status=403),
+    'journal-search': Endpoint('get', '/api/tracking/journal/search/?q=calm', 3),
+    'journal-export': Endpoint('get', '/api/tracking/journal/export/csv/', 2),
+    'journal-mood-trends': Endpoint('get', '/api/tracking/journal/mood_trends/', 3),
+    'journal-series': Endpoint('get', '/api/tracking/journal/series/', 3),
+    'journal-tags': Endpoint('get', '/api/tracking/journal/tags/', 2),
+    'insights': Endpoint('get', '/api/tracking/insights/', 4),
+    'correlations': Endpoint('get', '/api/tracking/insights/correlations/', 3),
+    # tracking: consumption ledger and stats
+    'events-list': Endpoint('get', '/api/tracking/consumption/events/', 2),
+    'events-create': Endpoint('post', '/api/tracking/consumption/events/', 3, CONSUMPTION_EVENT, 201),
+    'events-detail': Endpoint('get', '/api/tracking/consumption/events/{event}/', 2),
+    'events-bulk': Endpoint('post', '/api/tracking/consumption/events/bulk/', 5,
+                            {'events': [CONSUMPTION_EVENT, CONSUMPTION_EVENT]}, 201),
+    'events-export': Endpoint('get', '/api/tracking/consumption/export/csv/', 2),
+    'consumption-analysis': Endpoint('get', '/api/tracking/consumption/analysis/', 3),
+    'consumption-series': Endpoint('get', '/api/tracking/consumption/series/', 3),
+    'stats-list': Endpoint('get', '/api/tracking/consumption/', 3),
+    'stats': Endpoint('get', '/api/tracking/stats/', 2),
+    'streaks': Endpoint('get', '/api/tracking/stats/streaks/', 3),
+    'benchmarks': Endpoint('get', '/api/tracking/stats/benchmarks/', 5),
+    'cache-stats': Endpoint('get', '/api/tracking/cache-stats/', 1, status=403),
+    'openai-cache-stats': Endpoint('get', '/api/openai/cache-stats/', 1, status=403),
+    # goals
+    'goals-list': Endpoint('get', '/api/goals/', 4),
+    'goals-create': Endpoint('post', '/api/goals/', 5,
+                             {'title': 'Perf goal', 'description': 'Perf', 'substance_type': 'alcohol',
+                              'duration': '30 days', 'challenge': 'Dry month', 'benefits': ['sleep']}, 201),
+    'goals-detail': Endpoint('get', '/api/goals/{goal}/', 2),
+    'goals-update-progress': Endpoint('post', '/api/goals/{goal}/update_progress/', 4, {'progress': 50}),
+    'goals-complete': Endpoint('post', '/api/goals/{goal}/complete/', 4),
+    'goals-pause': Endpoint('post', '/api/goals/{goal}/pause/', 4),
+    'goals-resume': Endpoint('post', '/api/goals/{goal}/resume/', 4),
+    'goals-batch': Endpoint('post', '/api/goals/batch/', 6,
+                            {'operations': [{'id': '{goal}', 'action': 'pause'},
+                                            {'id': '{goal}', 'action': 'update_progress', 'progress': 40}]}),
+    'goals-active': Endpoint('get', '/api/goals/active/', 3),
+    'goals-completed': Endpoint('get', '/api/goals/completed/', 3),
+    'goals-progress-stats': Endpoint('get', '/api/goals/progress_stats/', 9),
+    'insights-list': Endpoint('get', '/api/goals/insights/', 3),
+    'insights-detail': Endpoint('get', '/api/goals/insights/{insight}/', 2),
+    'insights-active': Endpoint('get', '/api/goals/insights/active_insights/', 2),
+    'insights-recent': Endpoint('get', '/api/goals/insights/recent_insights/', 2),
+    'insights-by-goal': Endpoint('get', '/api/goals/insights/by_goal/?goal_id={related_goal}', 2),
+    # sync and dashboard
+    'sync': Endpoint('get', '/api/sync/', 4),
+    'dashboard': Endpoint('get', '/api/dashboard/', 16),
+    # users
+    'register': Endpoint('post', '/api/users/register/', 8,
+                         {'firstName': 'New', 'lastName': 'User', 'email': 'new{n}@example.com',
+                          'phone': '+15555550100', 'password': PASSWORD, 'location': 'ON'},
+                         201, True),
+    'login': Endpoint('post', '/api/users/login/', 2,
+                      {'email': '{email}', 'password': PASSWORD}, 200, True),
+    'profile': Endpoint('get', '/api/users/profile/', 1),
+    'profile-update': Endpoint('put', '/api/users/profile/', 2, {'first_name': 'Renamed'}),
+    'request-password-change': Endpoint('post', '/api/users/request-password-change/', 3),
+    'confirm-password-change': Endpoint('post', '/api/users/confirm-password-change/', 2,
+                                        {'code': '000000', 'new_password': PASSWORD}, 400),
+    'public-password-reset': Endpoint('post', '/api/users/public-request-password-reset/', 3,
+                                      {'email': '{email}'}, 200, True),
+    'upgrade-to-premium': Endpoint('post', '/api/users/upgrade-to-premium/', 2, {'user_id': '{user}'}),
+    # payments (Stripe is patched out, see stripe_patches())
+    'create-subscription': Endpoint('post', '/api/payments/create-subscription/', 1,
+                                    {'price_id': 'price_perf', 'user_id': '{user}', 'email': '{email}',
+                                     'payment_method_id': 'pm_perf'}),
+    'subscription-status': Endpoint('get', '/api/payments/subscription-status/{user}/', 1),
+    'cancel-subscription': Endpoint('post', '/api/payments/cancel-subscription/', 1,
+                                    {'subscription_id': 'sub_perf'}),
+    'reactivate-subscription': Endpoint('post', '/api/payments/reactivate-subscription/', 1,
+                                        {'subscription_id': 'sub_perf'}),
+    # Rejected by the default IsAuthenticated permission before Stripe's
+    # signature is checked
+    'stripe-webhook': Endpoint('post', '/api/payments/stripe-webhook/', 0, {}, 401, True),
+}
+
+
+def _fill(value, ids):
+    if isinstance(value, str):
+        # A lone placeholder keeps the id's type ({"id": "{goal}"} -> int)
+        if value.startswith('{') and value.endswith('}') and value[1:-1] in ids:
+            return ids[value[1:-1]]
+        return value.format(**ids)
+    if isinstance(value, list):
+        return [_fill(item, ids) for item in value]
+    if isinstance(value, dict):
+        return {key: _fill(item, ids) for key, item in value.items()}
+    return value
+
+
+def stripe_patches():
+    """
+    Stripe API calls answered locally, so payments endpoints only measure
+    our own work
+    """
+    event = {'type': 'customer.subscription.updated', 'data': {'object': {'id': 'sub_perf', 'status': 'active'}}}
+    return [
+        mock.patch('stripe.Customer.list', return_value=SimpleNamespace(data=[])),
+        mock.patch('stripe.Customer.create', return_value=STRIPE_CUSTOMER),
+        mock.patch('stripe.Customer.modify', return_value=STRIPE_CUSTOMER),
+        mock.patch('stripe.PaymentMethod.attach'),
+        mock.patch('stripe.Subscription.create', return_value=STRIPE_SUBSCRIPTION),
+        mock.patch('stripe.Subscription.modify', return_value=STRIPE_SUBSCRIPTION),
+        mock.patch('stripe.Webhook.construct_event', return_value=event),
+    ]
+
+
+# Fast hashing keeps register/login about the view, not PBKDF2
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class EndpointTestCase(TestCase):
+    """
+    One large synthetic user (plus a neighbour whose rows every query has to
+    filter out) and a way to call any ENDPOINTS entry as that user
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.token = seed_user('perf', seed=1)
+        seed_user('neighbour', seed=2)
+        cls.ids = {
+            'user': cls.user.id,
+            'email': cls.user.email,
+            'today': date.today().isoformat(),
+            'entry': JournalEntry.objects.filter(user=cls.user).order_by('date', 'id').values_list('id', flat=True).first(),
+            'event': ConsumptionEvent.objects.filter(user=cls.user).values_list('id', flat=True).first(),
+            'goal': Goal.objects.filter(user=cls.user).values_list('id', flat=True).first(),
+            'insight': AIInsight.objects.filter(user=cls.user, expires_at__gt=timezone.now())
+                                        .values_list('id', flat=True).first(),
+            'related_goal': AIInsight.objects.filter(user=cls.user, related_goal__isnull=False)
+                                             .values_list('related_goal_id', flat=True).first(),
+        }
+
+    def setUp(self):
+        self.request_number = 0
+        for patcher in stripe_patches():
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def call(self, endpoint):
+        """
+        Issue the request inside a rolled back transaction, with a cold
+        analytics cache; returns (response, queries, seconds)
+        """
+        self.request_number += 1
+        ids = {**self.ids, 'n': self.request_number}
+        client = APIClient()
+        if not endpoint.anonymous:
+            client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+        cache.clear()
+
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = getattr(client, endpoint.method)(
+                    _fill(endpoint.path, ids), _fill(endpoint.data, ids), format='json'
+                )
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        return response, len(queries), elapsed
+
+
+class QueryBudgetTests(EndpointTestCase):
+
+    def test_endpoints_stay_within_query_budget(self):
+        for name, endpoint in ENDPOINTS.items():
+            with self.subTest(endpoint=name):
+                response, queries, _ = self.call(endpoint)
+                self.assertEqual(response.status_code, endpoint.status, getattr(response, 'data', None))
+                self.assertLessEqual(queries, endpoint.budget, f'{name} issued {queries} queries')
+
+
+@skipUnless(os.getenv('PERF_BENCHMARK'), 'set PERF_BENCHMARK=1 to run latency benchmarks')
+class LatencyBenchmarkTests(EndpointTestCase):
+    iterations = int(os.getenv('PERF_ITERATIONS', 30))
+    tolerance = float(os.getenv('PERF_TOLERANCE', 0.5))
+    # Differences below this are timer noise, whatever the ratio
+    noise_ms = 5.0
+
+    def measure(self, endpoint):
+        self.call(endpoint)  # warm up
+        timings = sorted(self.call(endpoint)[2] * 1000 for _ in range(self.iterations))
+        cuts = statistics.quantiles(timings, n=100, method='inclusive')
+        return {'p50_ms': round(cuts[49], 2), 'p95_ms': round(cuts[94], 2)}
+
+    def test_latency_against_baseline(self):
+        vendor = connection.vendor
+        baselines = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+        baseline = baselines.get(vendor, {})
+
+        results = {name: self.measure(endpoint) for name, endpoint in ENDPOINTS.items()}
+
+        print(f'\n{"endpoint":<28}{"p50 ms":>10}{"p95 ms":>10}{"base p95":>10}')
+        for name, result in results.items():
+            previous = baseline.get(name, {}).get('p95_ms')
+            print(f'{name:<28}{result["p50_ms"]:>10.2f}{result["p95_ms"]:>10.2f}{previous or "-":>10}')
+
+        if os.getenv('PERF_UPDATE_BASELINE'):
+            baselines[vendor] = results
+            BASELINE_PATH.write_text(json.dumps(baselines, indent=2, sort_keys=True) + '\n')
+            return
+
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            with self.subTest(endpoint=name):
+                allowed = max(baseline[name]['p95_ms'] * (1 + self.tolerance),
+                              baseline[name]['p95_ms'] + self.noise_ms)
+                self.assertLessEqual(result['p95_ms'], allowed,
+                                     f'{name} p95 {result["p95_ms"]}ms over baseline {baseline[name]["p95_ms"]}ms')
@@ -0,0 +1,123 @@
+"""
+Content-addressed cache for OpenAI recommendations.
+
+Entries are keyed by the requesting user and a sha256 of the prompt with
+collapsed whitespace, the context it is asked about (products.llm_context)
+and the model parameters, so the same question about the same data is only
+paid for once. Each entry is stamped with the user's data version
+(sync.DataVersion): journal or goal writes bump it, which invalidates every
+cached recommendation of that user at once. Anonymous requests are cached by
+content alone.
+
+Entries live in the 'llm' cache alias: a locmem cache capped at
+LLM_CACHE_MAX_ENTRIES with LRU culling, or Redis when REDIS_URL is set (point
+LLM_CACHE_REDIS_URL at an instance with maxmemory and allkeys-lru to cap it
+there). Results over LLM_CACHE_MAX_ENTRY_BYTES are not cached. Hit/miss
+counters go to the default cache, out of reach of the LRU.
+"""
+import hashlib
+import json
+import re
+from django.core.cache import cache, caches
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from sync.versioning import get_data_version
+
+LLM_CACHE_TIMEOUT = 60 * 60 * 24
+LLM_CACHE_MAX_ENTRY_BYTES = 64 * 1024
+LLM_CACHE_OUTCOMES = ('hit', 'miss', 'invalidated')
+# Change with the payload format so old entries stop matching
+LLM_CACHE_KEY_VERSION = '2'
+
+# Fields that change without changing what the recommendation is about
+VOLATILE_FIELDS = {'timestamp', 'created_at', 'updated_at', 'last_updated', 'client_id'}
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def llm_cache():
+    return caches['llm']
+
+
+def normalize_payload(value):
+    """
+    value with whitespace collapsed and VOLATILE_FIELDS dropped, recursively
+    """
+    if isinstance(value, dict):
+        return {key: normalize_payload(item) for key, item in value.items() if key not in VOLATILE_FIELDS}
+    if isinstance(value, list):
+        return [normalize_payload(item) for item in value]
+    if isinstance(value, str):
+        return WHITESPACE_RE.sub(' ', value).strip()
+    return value
+
+
+def llm_cache_key(user_id, prompt, context, params):
+    """
+    Cache key of a recommendation request; params are the model parameters
+    """
+    payload = {
+        'prompt': normalize_payload(prompt),
+        'context': context,
+        'params': params,
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    digest = hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    return f'llm:{LLM_CACHE_KEY_VERSION}:{user_id or "anon"}:{digest}'
+
+
+def request_cache_scope(request):
+    """
+    (user id, data version) of the request, authenticated with the API's
+    authentication classes; (None, 0) when anonymous. Sync: wrap it in
+    sync_to_async from async views.
+    """
+    api_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user_id = api_request.user.id
+    except APIException:
+        # Bad token, or a session without a CSRF token
+        user_id = None
+    return user_id, get_data_version(user_id) if user_id else 0
+
+
+def _metric_key(outcome):
+    return f'llm:metrics:{outcome}'
+
+
+async def _record(outcome):
+    key = _metric_key(outcome)
+    await cache.aadd(key, 0, timeout=None)
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        await cache.aset(key, 1, timeout=None)
+
+
+async def get_cached_result(key, version):
+    """
+    The cached recommendation for key if it is still current, else None
+    """
+    entry = await llm_cache().aget(key)
+    if entry and entry['version'] == version:
+        await _record('hit')
+        return entry['result']
+    await _record('invalidated' if entry else 'miss')
+    return None
+
+
+async def store_result(key, version, result):
+    if len(result.encode('utf-8')) > LLM_CACHE_MAX_ENTRY_BYTES:
+        return
+    await llm_cache().aset(key, {'version': version, 'result': result}, timeout=LLM_CACHE_TIMEOUT)
+
+
+def llm_cache_metrics():
+    """
+    Hit/miss/invalidated counters and the hit rate of the recommendation cache
+    """
+    counts = {outcome: cache.get(_metric_key(outcome), 0) for outcome in LLM_CACHE_OUTCOMES}
+    served = sum(counts.values())
+    counts['hit_rate'] = counts['hit'] / served if served else None
+    return counts
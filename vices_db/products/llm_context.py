@@ -0,0 +1,186 @@
+"""
+Compact, server-side context for OpenAI recommendations.
+
+Instead of pasting the journal and goals the client uploads, the prompt gets
+a short plain-text summary built from the database: overall stats, the last
+30 days per substance against the 30 before, consumption and spending, active
+goals and a few notable recent entries. Sections are added in that order of
+priority until CONTEXT_TOKEN_BUDGET (estimated at 4 characters a token) is
+used up, so the summary stays a few hundred tokens however long the history.
+
+Building it costs a handful of aggregate queries over the rollups and
+indexes. The text is cached per user and stamped with the user's data version
+and today's date, so it is rebuilt once after each write, not per request.
+"""
+import json
+import math
+from collections import defaultdict
+from datetime import timedelta
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from goals.models import Goal
+from tracking.models import ConsumptionEvent, JournalDailyRollup, JournalEntry, Stats
+from .llm_cache import normalize_payload, request_cache_scope
+
+CONTEXT_TOKEN_BUDGET = 300
+CONTEXT_CACHE_TIMEOUT = 60 * 60 * 24
+WINDOW_DAYS = 30
+NOTABLE_DAYS = 14
+NOTABLE_ENTRIES = 5
+NOTE_CHARS = 80
+MAX_GOALS = 8
+
+
+def approx_tokens(text):
+    return math.ceil(len(text) / 4)
+
+
+def _overview(user_id, today):
+    stats = Stats.objects.filter(user_id=user_id).first()
+    if not stats or not stats.entry_count:
+        return ['No journal entries yet.']
+    return [
+        f'Journal: {stats.entry_count} entries, mood avg {stats.mood_average:.1f}/10 ({stats.mood_trend}), '
+        f'sleep quality {stats.sleep_quality:.1f}/10 ({stats.sleep_improvement:+.1f} vs baseline), '
+        f'mindful streak {stats.current_streak} days (best {stats.longest_streak}).'
+    ]
+
+
+def _goals(user_id, today):
+    goals = Goal.objects.filter(user_id=user_id, status='active').order_by('-last_updated').values_list(
+        'title', 'substance_type', 'metric', 'progress', 'current_value', 'target_value', 'target_unit'
+    )[:MAX_GOALS]
+    lines = [
+        f'- {title} ({substance_type}, {metric}): {progress}%, {current:g}/{target:g} {unit}'
+        for title, substance_type, metric, progress, current, target, unit in goals
+    ]
+    return ['Active goals:'] + lines if lines else []
+
+
+def _journal_windows(user_id, today):
+    start = today - timedelta(days=WINDOW_DAYS - 1)
+    rows = JournalDailyRollup.objects.filter(
+        user_id=user_id, date__gte=start - timedelta(days=WINDOW_DAYS)
+    ).values_list('date', 'substance', 'entry_count', 'mood_sum', 'sleep_quality_sum')
+
+    # (window, substance): [days, entries, mood sum, sleep quality sum]
+    totals = defaultdict(lambda: [0, 0, 0, 0])
+    for day, substance, entry_count, mood_sum, sleep_quality_sum in rows:
+        window = 'recent' if day >= start else 'previous'
+        for key in ((window, substance), (window, None)):
+            total = totals[key]
+            total[0] += 1
+            total[1] += entry_count
+            total[2] += mood_sum
+            total[3] += sleep_quality_sum
+    if not totals:
+        return []
+
+    lines = []
+    recent, previous = totals.get(('recent', None)), totals.get(('previous', None))
+    if recent and previous:
+        lines.append(
+            f'Last {WINDOW_DAYS} days vs the {WINDOW_DAYS} before: mood {recent[2] / recent[1]:.1f} vs '
+            f'{previous[2] / previous[1]:.1f}, sleep quality {recent[3] / recent[1]:.1f} vs '
+            f'{previous[3] / previous[1]:.1f}.'
+        )
+    by_substance = sorted(
+        ((substance, total) for (window, substance), total in totals.items() if window == 'recent' and substance),
+        key=lambda item: -item[1][1]
+    )
+    lines += [
+        f'- {substance}: {days} days, mood {mood / entries:.1f}, sleep quality {sleep / entries:.1f}'
+        for substance, (days, entries, mood, sleep) in by_substance
+    ]
+    return lines
+
+
+def _consumption(user_id, today):
+    rows = ConsumptionEvent.objects.filter(
+        user_id=user_id, date__gt=today - timedelta(days=WINDOW_DAYS), date__lte=today
+    ).values('vice_type').annotate(
+        events=Count('id'), quantity=Sum('quantity'), spending=Sum('spending')
+    ).order_by('-spending')
+    lines = [
+        f'- {row["vice_type"]}: {row["events"]} times, quantity {row["quantity"]:g}, ${row["spending"]:.2f}'
+        for row in rows
+    ]
+    return [f'Consumption, last {WINDOW_DAYS} days:'] + lines if lines else []
+
+
+def _notable_entries(user_id, today):
+    entries = JournalEntry.objects.filter(
+        Q(mood__lte=3) | Q(mood__gte=8),
+        user_id=user_id, date__gt=today - timedelta(days=NOTABLE_DAYS),
+    ).exclude(notes='').order_by('-date', '-timestamp').values_list(
+        'date', 'substance', 'mood', 'sleep_quality', 'notes'
+    )[:NOTABLE_ENTRIES]
+    lines = [
+        f'- {day.isoformat()} {substance}, mood {mood}, sleep {sleep_quality:g}: '
+        f'{" ".join(notes.split())[:NOTE_CHARS]}'
+        for day, substance, mood, sleep_quality, notes in entries
+    ]
+    return ['Notable recent entries:'] + lines if lines else []
+
+
+# In order of priority
+SECTIONS = [_overview, _goals, _journal_windows, _consumption, _notable_entries]
+
+
+def build_user_context(user_id, budget=CONTEXT_TOKEN_BUDGET):
+    """
+    The compact summary of a user's data, at most budget tokens (estimated)
+    """
+    today = timezone.now().date()
+    lines = []
+    used = 0
+    for section in SECTIONS:
+        for line in section(user_id, today):
+            cost = approx_tokens(line) + 1
+            if used + cost > budget:
+                return '\n'.join(lines)
+            lines.append(line)
+            used += cost
+    return '\n'.join(lines)
+
+
+def get_user_context(user_id, version):
+    """
+    build_user_context() through the cache, rebuilt when the user's data
+    version or the date changes
+    """
+    key = f'llm:context:{user_id}'
+    today = timezone.now().date().isoformat()
+    entry = cache.get(key)
+    if entry and entry['version'] == version and entry['date'] == today:
+        return entry['text']
+    text = build_user_context(user_id)
+    cache.set(key, {'version': version, 'date': today, 'text': text}, timeout=CONTEXT_CACHE_TIMEOUT)
+    return text
+
+
+def uploaded_context(goals, journal):
+    """
+    Context for anonymous requests, from the uploaded goals and journal as
+    compact JSON
+    """
+    compact = {'separators': (',', ':'), 'default': str}
+    parts = []
+    if goals:
+        parts.append(f'User Goals: {json.dumps(normalize_payload(goals), **compact)}')
+    if journal:
+        parts.append(f'User Journal Entries: {json.dumps(normalize_payload(journal), **compact)}')
+    return '\n\n'.join(parts)
+
+
+def request_context(request, goals, journal):
+    """
+    (user id, data version, context) of a recommendation request: the
+    server-side summary for signed-in users, the uploaded data otherwise.
+    Sync: wrap it in sync_to_async from async views.
+    """
+    user_id, version = request_cache_scope(request)
+    if user_id:
+        return user_id, version, get_user_context(user_id, version)
+    return user_id, version, uploaded_context(goals, journal)
@@ -1,62 +1,123 @@
 # vices_db/products/openai_views.py
+"""
+OpenAI recommendations, as an async view.
+
+Served under ASGI (see Procfile), the completion is awaited on the event loop
+instead of holding a worker for the whole LLM latency, so slow completions do
+not starve journal or goals requests. AsyncOpenAI keeps an httpx connection
+pool bound to the event loop it is first used on: under ASGI the worker's
+loop outlives every request and its client is shared, otherwise (WSGI,
+runserver) each request gets a client that is closed before its loop ends.
+
+Signed-in users get a compact summary of their data built on the server
+(products.llm_context) and no longer need to upload goals and journal; the
+uploaded data is only used for anonymous requests. Answers are cached by
+content (products.llm_cache).
+"""
+import asyncio
 import json
 import os
-from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
-from openai import OpenAI
+import weakref
+from contextlib import asynccontextmanager
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseNotAllowed, JsonResponse
+from openai import APITimeoutError, AsyncOpenAI
+from .llm_cache import get_cached_result, llm_cache_key, store_result
+from .llm_context import request_context
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client
 openai_api_key = os.getenv('OPENAI_API_KEY')
-client = None
-if openai_api_key:
-    client = OpenAI(api_key=openai_api_key)
+OPENAI_MODEL = 'gpt-3.5-turbo'
+OPENAI_PARAMS = {'model': OPENAI_MODEL, 'temperature': 0.7, 'max_tokens': 1000}
+# Seconds before a completion is abandoned. There is no retry: a second
+# attempt would double the worst-case wait, the client can ask again.
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', 20))
+OPENAI_MAX_RETRIES = 0
+
+# ASGI worker event loop: shared AsyncOpenAI client
+_clients = weakref.WeakKeyDictionary()
+
+
+def new_client():
+    return AsyncOpenAI(api_key=openai_api_key, timeout=OPENAI_TIMEOUT, max_retries=OPENAI_MAX_RETRIES)
+
+
+@asynccontextmanager
+async def openai_client(request):
+    """
+    The AsyncOpenAI client to serve request with
+    """
+    if isinstance(request, ASGIRequest):
+        loop = asyncio.get_running_loop()
+        client = _clients.get(loop)
+        if client is None:
+            client = _clients[loop] = new_client()
+        yield client
+        return
+
+    # The request's own loop ends with it; close the pool while it runs
+    client = new_client()
+    try:
+        yield client
+    finally:
+        await client.close()
+
 
-@csrf_exempt
-@require_http_methods(["POST"])
-def generate_recommendations(request):
+async def generate_recommendations(request):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    if not openai_api_key:
+        return JsonResponse({'error': 'OpenAI API key not configured'}, status=500)
     try:
-        if not client:
-            return JsonResponse({'error': 'OpenAI API key not configured'}, status=500)
-            
         # Parse request body
         data = json.loads(request.body)
         prompt = data.get('prompt')
         goals = data.get('goals', [])
         journal = data.get('journal', [])
-        
+
         if not prompt:
             return JsonResponse({'error': 'Prompt is required'}, status=400)
-        
-        # Format goals and journal as a summary string
-        goals_summary = f"User Goals: {json.dumps(goals, indent=2)}" if goals else ""
-        journal_summary = f"User Journal Entries: {json.dumps(journal, indent=2)}" if journal else ""
-        
-        # Append the summaries to the prompt
-        full_prompt = f"{prompt}\n\n{goals_summary}\n\n{journal_summary}"
-        
-        # Call OpenAI API
-        completion = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "user",
-                    "content": full_prompt
-                }
-            ],
-            temperature=0.7,
-            max_tokens=1000,
-        )
-        
+
+        user_id, version, context = await sync_to_async(request_context)(request, goals, journal)
+        cache_key = llm_cache_key(user_id, prompt, context, OPENAI_PARAMS)
+        cached = await get_cached_result(cache_key, version)
+        if cached is not None:
+            return JsonResponse({'result': cached}, headers={'X-Cache': 'HIT'})
+
+        # Append the summary of the user's data to the prompt
+        full_prompt = f"{prompt}\n\n{context}" if context else prompt
+
+        # Call OpenAI API; the worker serves other requests meanwhile
+        async with openai_client(request) as client:
+            completion = await client.chat.completions.create(
+                messages=[
+                    {
+                        "role": "user",
+                        "content": full_prompt
+                    }
+                ],
+                **OPENAI_PARAMS,
+            )
+
         result = completion.choices[0].message.content
-        
-        return JsonResponse({'result': result})
-        
+        if result:
+            await store_result(cache_key, version, result)
+
+        return JsonResponse({'result': result}, headers={'X-Cache': 'MISS'})
+
     except json.JSONDecodeError:
         return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    except APITimeoutError:
+        logger.warning(f'OpenAI API timed out after {OPENAI_TIMEOUT}s')
+        return JsonResponse({'error': 'Recommendations timed out, please try again'}, status=504)
     except Exception as e:
         logger.error(f'OpenAI API error: {str(e)}')
-        return JsonResponse({'error': 'Failed to generate recommendations'}, status=500)
\ No newline at end of file
+        return JsonResponse({'error': 'Failed to generate recommendations'}, status=500)
+
+
+# Django 4.2's csrf_exempt and require_http_methods wrap views in sync
+# functions, which would make Django run this view in a thread
+generate_recommendations.csrf_exempt = True
@@ -1,3 +1,116 @@
+import asyncio
+from unittest import mock
+from django.core.cache import cache, caches
+from django.core.handlers.asgi import ASGIRequest
 from django.test import TestCase
+from django.utils import timezone
+from openai import APITimeoutError
+from rest_framework.authtoken.models import Token
+from sync.versioning import bump_data_version
+from tracking.models import JournalEntry
+from users.models import User
+from . import llm_context, openai_views
+from .llm_cache import llm_cache_metrics
 
-# Create your tests here.
+
+def completion(content):
+    return mock.Mock(choices=[mock.Mock(message=mock.Mock(content=content))])
+
+
+class AsyncRecommendationsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        caches['llm'].clear()
+        self.create = mock.AsyncMock(return_value=completion('Drink less coffee'))
+        self.openai = mock.Mock(close=mock.AsyncMock())
+        self.openai.chat.completions.create = self.create
+        for patcher in (mock.patch.object(openai_views, 'new_client', return_value=self.openai),
+                        mock.patch.object(openai_views, 'openai_api_key', 'test-key')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post(self, payload, **extra):
+        return self.client.post('/api/openai/', payload, content_type='application/json', **extra)
+
+    def test_completion_is_awaited(self):
+        async def complete(**kwargs):
+            await asyncio.sleep(0)
+            return completion('Drink less coffee')
+        self.create.side_effect = complete
+
+        response = self.post({'prompt': 'Help me sleep'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'result': 'Drink less coffee'})
+
+    def test_client_is_closed_with_its_request_loop_and_shared_under_asgi(self):
+        self.post({'prompt': 'Help me sleep'})
+        self.assertEqual(self.openai.close.await_count, 1)
+
+        async def serve_twice():
+            request = mock.Mock(spec=ASGIRequest)
+            async with openai_views.openai_client(request) as first:
+                pass
+            async with openai_views.openai_client(request) as second:
+                pass
+            return first, second
+
+        first, second = asyncio.run(serve_twice())
+        self.assertIs(first, second)
+        self.assertEqual(self.openai.close.await_count, 1)
+
+    def test_timeout_and_method(self):
+        self.create.side_effect = APITimeoutError(request=mock.Mock())
+        self.assertEqual(self.post({'prompt': 'Help me sleep'}).status_code, 504)
+        self.assertEqual(self.client.get('/api/openai/').status_code, 405)
+        self.assertTrue(asyncio.iscoroutinefunction(openai_views.generate_recommendations))
+
+    def test_cache_by_normalized_content(self):
+        # Anonymous: the uploaded journal is the context
+        journal = [{'date': '2026-10-01', 'mood': 4, 'timestamp': '2026-10-01T08:00:00Z'}]
+        self.assertEqual(self.post({'prompt': 'Help me sleep', 'journal': journal})['X-Cache'], 'MISS')
+
+        # Whitespace and bookkeeping fields do not count
+        journal[0]['timestamp'] = '2026-10-02T09:00:00Z'
+        response = self.post({'prompt': ' Help  me sleep\n', 'journal': journal})
+        self.assertEqual((response['X-Cache'], response.json()['result']), ('HIT', 'Drink less coffee'))
+
+        # The data does
+        journal[0]['mood'] = 8
+        self.assertEqual(self.post({'prompt': 'Help me sleep', 'journal': journal})['X-Cache'], 'MISS')
+        self.assertEqual(self.create.await_count, 2)
+
+    def test_cache_is_per_user_until_their_data_changes(self):
+        auth = {}
+        for name in ('first', 'second'):
+            # Neither has journal entries, so both get the same context
+            user = User.objects.create(username=name, email=f'{name}@example.com')
+            auth[name] = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=user).key}'}
+
+        self.assertEqual(self.post({'prompt': 'Help me sleep'}, **auth['first'])['X-Cache'], 'MISS')
+        self.assertEqual(self.post({'prompt': 'Help me sleep'}, **auth['second'])['X-Cache'], 'MISS')
+        self.assertEqual(self.post({'prompt': 'Help me sleep'}, **auth['first'])['X-Cache'], 'HIT')
+
+        bump_data_version(User.objects.get(username='first').id)
+        self.assertEqual(self.post({'prompt': 'Help me sleep'}, **auth['first'])['X-Cache'], 'MISS')
+        self.assertEqual(self.post({'prompt': 'Help me sleep'}, **auth['second'])['X-Cache'], 'HIT')
+        self.assertEqual(self.create.await_count, 3)
+        self.assertEqual(llm_cache_metrics(), {'hit': 2, 'miss': 2, 'invalidated': 1, 'hit_rate': 0.4})
+
+    def test_signed_in_users_get_the_cached_server_side_summary(self):
+        user = User.objects.create(username='context', email='context@example.com')
+        auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=user).key}'}
+        JournalEntry.objects.create(user=user, date=timezone.now().date(), substance='alcohol', amount='2',
+                                    mood=2, sleep_quality=3, notes='Rough   night out')
+
+        with mock.patch.object(llm_context, 'build_user_context', wraps=llm_context.build_user_context) as build:
+            self.post({'prompt': 'Help me sleep', 'journal': [{'notes': 'uploaded'}]}, **auth)
+            self.post({'prompt': 'Help me cut down'}, **auth)
+        self.assertEqual(build.call_count, 1)
+
+        prompt = self.create.await_args.kwargs['messages'][0]['content']
+        self.assertTrue(prompt.startswith('Help me cut down\n\nJournal: 1 entries'))
+        self.assertIn('- alcohol: 1 days, mood 2.0, sleep quality 3.0', prompt)
+        self.assertIn('mood 2, sleep 3: Rough night out', prompt)
+        self.assertNotIn('uploaded', prompt)
+        self.assertLessEqual(llm_context.approx_tokens(prompt), llm_context.CONTEXT_TOKEN_BUDGET)
@@ -1,3 +1,13 @@
-from django.shortcuts import render
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from .llm_cache import llm_cache_metrics
 
-# Create your views here.
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def llm_cache_stats(request):
+    """
+    Hit/miss counters of the OpenAI recommendation cache, for sizing it
+    """
+    return Response(llm_cache_metrics())
@@ -0,0 +1,34 @@
+from django.db import models
+
+
+class Tombstone(models.Model):
+    """
+    Record of a deleted synced row so clients can drop it on their next sync.
+    user_id is a plain column rather than a foreign key: tombstones are written
+    while a user's rows are being cascade-deleted and must not block it.
+    """
+    user_id = models.BigIntegerField()
+    model = models.CharField(
+        max_length=20,
+        choices=[
+            ('journal', 'Journal entry'),
+            ('goal', 'Goal'),
+            ('insight', 'AI insight')
+        ]
+    )
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    class Meta:
+        indexes = [
+            models.Index(fields=['user_id', 'deleted_at']),
+            models.Index(fields=['deleted_at']),
+        ]
+
+
+class DataVersion(models.Model):
+    """
+    Per-user counter bumped on every write to tracking or goals data.
+    Conditional GETs compare against it instead of re-running their queries.
+    """
+    user_id = models.BigIntegerField(primary_key=True)
+    version = models.BigIntegerField(default=0)
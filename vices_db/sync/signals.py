@@ -0,0 +1,48 @@
+from django.db.models.signals import post_save, post_delete
+from goals.models import Goal, AIInsight
+from goals.signals import goals_bulk_updated, insights_bulk_created
+from tracking.models import JournalEntry, ConsumptionStats, ConsumptionEvent
+from tracking.signals import journal_entries_bulk_created, consumption_events_bulk_created
+from .models import Tombstone
+from .versioning import bump_data_version
+
+TOMBSTONE_MODELS = {
+    JournalEntry: 'journal',
+    Goal: 'goal',
+    AIInsight: 'insight',
+}
+
+# tracking.Stats is left out: it is only written for journal writes, which
+# bump the version themselves (rebuild_stats bumps its own)
+VERSIONED_MODELS = [JournalEntry, ConsumptionStats, ConsumptionEvent, Goal, AIInsight]
+
+
+def record_tombstone(sender, instance, **kwargs):
+    Tombstone.objects.create(
+        user_id=instance.user_id, model=TOMBSTONE_MODELS[sender], object_id=instance.pk
+    )
+
+
+def bump_version_on_write(sender, instance, **kwargs):
+    bump_data_version(instance.user_id)
+
+
+def bump_version_on_bulk_write(sender, user_id, **kwargs):
+    bump_data_version(user_id)
+
+
+for model in TOMBSTONE_MODELS:
+    post_delete.connect(record_tombstone, sender=model, dispatch_uid=f'sync_tombstone_{model.__name__}')
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_version_on_write, sender=model, dispatch_uid=f'sync_version_save_{model.__name__}')
+    post_delete.connect(bump_version_on_write, sender=model, dispatch_uid=f'sync_version_delete_{model.__name__}')
+
+journal_entries_bulk_created.connect(bump_version_on_bulk_write, sender=JournalEntry,
+                                     dispatch_uid='sync_version_journal_bulk')
+consumption_events_bulk_created.connect(bump_version_on_bulk_write, sender=ConsumptionEvent,
+                                       dispatch_uid='sync_version_consumption_bulk')
+goals_bulk_updated.connect(bump_version_on_bulk_write, sender=Goal,
+                           dispatch_uid='sync_version_goals_bulk')
+insights_bulk_created.connect(bump_version_on_bulk_write, sender=AIInsight,
+                              dispatch_uid='sync_version_insights_bulk')
@@ -0,0 +1,117 @@
+import base64
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from goals.models import Goal
+from tracking.models import JournalEntry
+from users.models import User
+from .versioning import get_data_version
+from .views import TOMBSTONE_RETENTION, encode_token
+
+
+class SyncTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='sync', email='sync@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        today = timezone.now().date()
+        self.entries = [
+            JournalEntry.objects.create(
+                user=self.user, date=today - timedelta(days=day), substance='none',
+                amount='1', mood=5, sleep_quality=5
+            )
+            for day in range(3)
+        ]
+        self.goal = Goal.objects.create(
+            user=self.user, title='Dry month', description='', substance_type='alcohol',
+            duration='30 days', challenge='', benefits=[], target_value=30
+        )
+        # Written well before any token, outside the overlap window
+        hour_ago = timezone.now() - timedelta(hours=1)
+        JournalEntry.objects.filter(user=self.user).update(updated_at=hour_ago)
+        Goal.objects.filter(user=self.user).update(last_updated=hour_ago)
+
+    def sync(self, token=None):
+        response = self.client.get('/api/sync/', {'since': token} if token else {})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def ids(self, data, section):
+        return sorted(row['id'] for row in data[section]['updated'])
+
+    def test_snapshot_then_delta(self):
+        snapshot = self.sync()
+        self.assertTrue(snapshot['reset'])
+        self.assertFalse(snapshot['more'])
+        self.assertEqual(self.ids(snapshot, 'journal'), sorted(entry.id for entry in self.entries))
+        self.assertEqual(self.ids(snapshot, 'goals'), [self.goal.id])
+
+        self.assertEqual(self.ids(self.sync(snapshot['token']), 'journal'), [])
+
+        edited = self.entries[1]
+        edited.mood = 8
+        edited.save()
+        delta = self.sync(snapshot['token'])
+        self.assertFalse(delta['reset'])
+        self.assertEqual(self.ids(delta, 'journal'), [edited.id])
+        self.assertEqual(self.ids(delta, 'goals'), [])
+
+    def test_deletions_come_back_as_tombstones(self):
+        token = self.sync()['token']
+        entry_id, goal_id = self.entries[0].id, self.goal.id
+        self.entries[0].delete()
+        self.goal.delete()
+
+        delta = self.sync(token)
+        self.assertEqual(delta['journal']['deleted'], [entry_id])
+        self.assertEqual(delta['goals']['deleted'], [goal_id])
+        self.assertEqual(self.ids(delta, 'journal'), [])
+
+    def test_invalid_token_is_rejected(self):
+        for token in ('not-a-token', encode_token(timezone.now())[:-4], 'eyJzaW5jZSI6MX0='):
+            response = self.client.get('/api/sync/', {'since': token})
+            self.assertEqual(response.status_code, 400, token)
+
+    def test_expired_token_gets_a_snapshot(self):
+        expired = encode_token(timezone.now() - TOMBSTONE_RETENTION - timedelta(days=1))
+        data = self.sync(expired)
+        self.assertTrue(data['reset'])
+        self.assertEqual(self.ids(data, 'journal'), sorted(entry.id for entry in self.entries))
+
+    def test_timestamp_tokens_still_work(self):
+        moment = timezone.now().isoformat()
+        token = base64.urlsafe_b64encode(moment.encode('ascii')).decode('ascii')
+        data = self.sync(token)
+        self.assertFalse(data['reset'])
+        self.assertEqual(self.ids(data, 'journal'), [])
+
+    @mock.patch('sync.views.SYNC_PAGE_SIZE', 2)
+    def test_snapshot_is_paged_until_done(self):
+        pages = [self.sync()]
+        while pages[-1]['more']:
+            self.assertLess(len(pages), 5)
+            pages.append(self.sync(pages[-1]['token']))
+
+        self.assertEqual(len(pages), 2)
+        self.assertEqual([page['reset'] for page in pages], [True, False])
+        journal = [row['id'] for page in pages for row in page['journal']['updated']]
+        self.assertEqual(sorted(journal), sorted(entry.id for entry in self.entries))
+        self.assertEqual([row['id'] for page in pages for row in page['goals']['updated']], [self.goal.id])
+
+        # The last token continues with a delta from when the snapshot began
+        delta = self.sync(pages[-1]['token'])
+        self.assertFalse(delta['reset'])
+        self.assertEqual(self.ids(delta, 'journal') + self.ids(delta, 'goals'), [])
+
+    def test_journal_writes_bump_the_version_once(self):
+        version = get_data_version(self.user.id)
+        entry = JournalEntry.objects.create(
+            user=self.user, date=timezone.now().date(), substance='none', amount='1', mood=6, sleep_quality=6
+        )
+        self.assertEqual(get_data_version(self.user.id), version + 1)
+        entry.mood = 7
+        entry.save()
+        self.assertEqual(get_data_version(self.user.id), version + 2)
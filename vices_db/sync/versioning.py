@@ -0,0 +1,74 @@
+import hashlib
+from functools import wraps
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from .models import DataVersion
+
+# Bump when a response format changes so clients drop their cached bodies
+ETAG_FORMAT_VERSION = '1'
+
+
+def get_data_version(user_id):
+    return DataVersion.objects.filter(user_id=user_id).values_list('version', flat=True).first() or 0
+
+
+def request_data_version(request):
+    """
+    The authenticated user's data version, looked up once per request
+    """
+    if not hasattr(request, '_data_version'):
+        request._data_version = get_data_version(request.user.id)
+    return request._data_version
+
+
+def bump_data_version(user_id):
+    if DataVersion.objects.filter(user_id=user_id).update(version=F('version') + 1):
+        return
+    try:
+        with transaction.atomic():
+            DataVersion.objects.create(user_id=user_id, version=1)
+    except IntegrityError:
+        # Created concurrently by another writer
+        DataVersion.objects.filter(user_id=user_id).update(version=F('version') + 1)
+
+
+def compute_etag(request, version):
+    """
+    Strong ETag over the user's data version and everything else the response
+    depends on: the URL with its query string, the negotiated media type and
+    the current date (timeframe windows are relative to today).
+    """
+    key = '|'.join([
+        ETAG_FORMAT_VERSION,
+        str(request.user.id),
+        str(version),
+        request.get_full_path(),
+        request.META.get('HTTP_ACCEPT', ''),
+        timezone.now().date().isoformat(),
+    ])
+    return '"%s"' % hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def conditional_on_data_version(view_method):
+    """
+    Decorator for viewset actions that only read the user's tracking/goals
+    data. Answers If-None-Match with 304 after a single version lookup and
+    tags 200 responses with the ETag, unless the view already set one.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        etag = compute_etag(request, request_data_version(request))
+        client_etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in client_etags or '*' in client_etags:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        response = view_method(self, request, *args, **kwargs)
+        # Stale cached results come tagged with their own version's ETag
+        if response.status_code == status.HTTP_200_OK and not response.has_header('ETag'):
+            response['ETag'] = etag
+        return response
+    return wrapper
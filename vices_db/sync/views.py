@@ -0,0 +1,154 @@
+import base64
+import json
+from datetime import datetime, timedelta
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from goals.models import Goal, AIInsight
+from goals.serializers import GoalSerializer, AIInsightSerializer
+from tracking.models import JournalEntry
+from tracking.serializers import JournalEntrySerializer
+from .models import Tombstone
+
+# Rows committed by transactions that started before a token was issued can
+# carry a slightly older timestamp; re-send that window (clients upsert by id).
+SYNC_OVERLAP = timedelta(seconds=5)
+# Tombstones are pruned after this long; older tokens get a full snapshot.
+TOMBSTONE_RETENTION = timedelta(days=90)
+# Changed rows per response, over all sections
+SYNC_PAGE_SIZE = 500
+
+
+def _sections(user, now):
+    """
+    (name, queryset, updated field, serializer class, tombstone model) of
+    every synced section, in paging order
+    """
+    return [
+        ('journal', JournalEntry.objects.filter(user=user), 'updated_at', JournalEntrySerializer, 'journal'),
+        ('goals', Goal.objects.filter(user=user), 'last_updated', GoalSerializer, 'goal'),
+        ('insights', AIInsight.objects.filter(user=user, expires_at__gt=now), 'updated_at',
+         AIInsightSerializer, 'insight'),
+    ]
+
+
+def encode_token(since, started=None, section=0, after=None):
+    """
+    Sync token: changes after `since` (None for a full snapshot). Tokens in
+    the middle of a pass also carry when the pass started, the section it is
+    in and the (updated, id) position reached in it.
+    """
+    payload = json.dumps({
+        'since': since and since.isoformat(),
+        'started': started and started.isoformat(),
+        'section': section,
+        'after': after and [after[0].isoformat(), after[1]],
+    }, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+
+
+def _aware(value):
+    moment = datetime.fromisoformat(value)
+    if not timezone.is_aware(moment):
+        raise ValueError('Naive datetime')
+    return moment
+
+
+def decode_token(token):
+    """
+    (since, started, section, after) of a token, or None when it is invalid
+    """
+    try:
+        payload = base64.urlsafe_b64decode(token.encode('ascii')).decode('ascii')
+        if not payload.startswith('{'):
+            # Tokens issued before paging were the bare timestamp
+            return _aware(payload), None, 0, None
+        payload = json.loads(payload)
+        since = payload['since'] and _aware(payload['since'])
+        started = payload['started'] and _aware(payload['started'])
+        after = payload['after'] and (_aware(payload['after'][0]), int(payload['after'][1]))
+        return since, started, int(payload['section']), after
+    except (KeyError, IndexError, TypeError, ValueError, UnicodeError):
+        return None
+
+
+def _page(queryset, updated_field, after, limit):
+    """
+    Up to limit rows after the (updated, id) position, and whether there are more
+    """
+    if after is not None:
+        updated, last_id = after
+        queryset = queryset.filter(
+            Q(**{f'{updated_field}__gt': updated}) | Q(**{updated_field: updated, 'id__gt': last_id})
+        )
+    rows = list(queryset.order_by(updated_field, 'id')[:limit + 1])
+    return rows[:limit], len(rows) > limit
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync(request):
+    """
+    Return journal entries, goals and insights changed since the `since`
+    token, plus the ids of rows deleted since then. Without a token (or with
+    one older than the tombstone retention) a full snapshot is sent instead,
+    with `reset: true` on its first page.
+
+    Rows are paged by (updated, id), SYNC_PAGE_SIZE per response: while
+    `more` is true, call again with the returned token for the next page.
+    The token of the last page starts the next delta from when the pass began.
+    """
+    now = timezone.now()
+    user = request.user
+    token = request.query_params.get('since')
+
+    since, started, section, after = None, None, 0, None
+    if token:
+        decoded = decode_token(token)
+        if decoded is None:
+            return Response({'error': 'Invalid sync token'}, status=status.HTTP_400_BAD_REQUEST)
+        since, started, section, after = decoded
+        # Deletions older than the retention may be gone: start over
+        if (started or since or now) < now - TOMBSTONE_RETENTION:
+            since, started, section, after = None, None, 0, None
+
+    first_page = started is None
+    started = started or now
+    deleted = {'journal': [], 'goal': [], 'insight': []}
+    if since is not None and first_page:
+        tombstones = Tombstone.objects.filter(user_id=user.id, deleted_at__gte=since - SYNC_OVERLAP)
+        for model, object_id in tombstones.values_list('model', 'object_id'):
+            deleted[model].append(object_id)
+
+    changes = {}
+    remaining = SYNC_PAGE_SIZE
+    resume = None
+    for index, (name, queryset, updated_field, serializer_class, model) in enumerate(_sections(user, now)):
+        rows = []
+        if index >= section and resume is None:
+            if since is not None:
+                queryset = queryset.filter(**{f'{updated_field}__gte': since - SYNC_OVERLAP})
+            rows, has_more = _page(queryset, updated_field, after if index == section else None, remaining)
+            remaining -= len(rows)
+            if has_more:
+                # An empty page means the section was reached with no room left
+                position = (getattr(rows[-1], updated_field), rows[-1].id) if rows else None
+                resume = (index, position)
+        changes[name] = {
+            'updated': serializer_class(rows, many=True).data,
+            'deleted': deleted[model],
+        }
+
+    if resume is None:
+        token = encode_token(started)
+    else:
+        token = encode_token(since, started, *resume)
+    return Response({
+        'token': token,
+        'reset': since is None and first_page,
+        'more': resume is not None,
+        **changes,
+    })
@@ -0,0 +1,110 @@
+"""
+Single-statement analytics over a filtered queryset.
+
+windowed_analytics() returns the metrics of a whole window together with the
+same metrics broken down by one or more columns, in one database round trip:
+GROUP BY GROUPING SETS on Postgres, a UNION ALL of one GROUP BY per breakdown
+over a shared CTE elsewhere.
+
+Metrics are SQL aggregate templates over the queryset's columns, built with
+the helpers below, e.g. {'total_spending': sum_of('spending')}.
+"""
+from decimal import Decimal
+from django.db import connection
+
+
+def aggregate(template, *columns):
+    """
+    A raw aggregate: template uses {0}, {1}... for the (quoted) columns
+    """
+    return template, list(columns)
+
+
+def count_rows():
+    return aggregate('COUNT(*)')
+
+
+def sum_of(column):
+    return aggregate('SUM({0})', column)
+
+
+def avg_of(column):
+    return aggregate('AVG({0})', column)
+
+
+def ratio_of(numerator, denominator):
+    """
+    SUM(numerator) / SUM(denominator), e.g. an average read off rollup sums
+    """
+    return aggregate('CAST(SUM({0}) AS FLOAT) / NULLIF(SUM({1}), 0)', numerator, denominator)
+
+
+def _value(value):
+    # Postgres returns numeric (Decimal) for AVG and SUM over bigint
+    return float(value) if isinstance(value, Decimal) else value
+
+
+def _statement(base_sql, metrics, breakdowns):
+    qn = connection.ops.quote_name
+    aggregates = ', '.join(
+        f'{template.format(*map(qn, columns))} AS {qn(name)}'
+        for name, (template, columns) in metrics.items()
+    )
+    keys = ', '.join(qn(column) for column in breakdowns)
+    cte = f'WITH base AS ({base_sql}) '
+
+    if not breakdowns:
+        return cte + f'SELECT 0, {aggregates} FROM base'
+
+    if connection.vendor == 'postgresql':
+        sets = ', '.join(['()'] + [f'({qn(column)})' for column in breakdowns])
+        return cte + (
+            f'SELECT GROUPING({keys}), {keys}, {aggregates} FROM base '
+            f'GROUP BY GROUPING SETS ({sets})'
+        )
+
+    selects = []
+    for index, grouped in enumerate([None] + breakdowns):
+        # Same bitmask GROUPING() gives: a set bit for every column not grouped
+        grouping = sum(1 << (len(breakdowns) - 1 - i) for i, column in enumerate(breakdowns) if column != grouped)
+        columns = ', '.join(qn(column) if column == grouped else f'NULL AS {qn(column)}' for column in breakdowns)
+        group_by = f' GROUP BY {qn(grouped)}' if grouped else ''
+        selects.append(f'SELECT {grouping}, {columns}, {aggregates} FROM base{group_by}')
+    return cte + ' UNION ALL '.join(selects)
+
+
+def windowed_analytics(queryset, metrics, breakdowns=None):
+    """
+    metrics: {name: aggregate}; breakdowns: {column: [metric names] or None
+    for all}. Returns {'total': {name: value}, column: [{column: key, name:
+    value, ...}, ...]} with breakdown rows sorted by key.
+    """
+    breakdowns = breakdowns or {}
+    columns = list(breakdowns)
+    needed = set(columns)
+    for _, metric_columns in metrics.values():
+        needed.update(metric_columns)
+
+    base_sql, params = queryset.order_by().values(*sorted(needed)).query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(_statement(base_sql, metrics, columns), params)
+        rows = cursor.fetchall()
+
+    names = list(metrics)
+    all_grouped = (1 << len(columns)) - 1
+    result = {'total': {name: None for name in names}}
+    result.update({column: [] for column in columns})
+    for row in rows:
+        grouping, keys, values = row[0], row[1:1 + len(columns)], row[1 + len(columns):]
+        values = dict(zip(names, map(_value, values)))
+        if grouping == all_grouped:
+            result['total'] = values
+            continue
+        index = next(i for i in range(len(columns)) if not grouping & (1 << (len(columns) - 1 - i)))
+        column = columns[index]
+        wanted = breakdowns[column] or names
+        result[column].append({column: keys[index], **{name: values[name] for name in wanted}})
+
+    for column in columns:
+        result[column].sort(key=lambda item: (item[column] is None, item[column]))
+    return result
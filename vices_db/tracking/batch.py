@@ -0,0 +1,42 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from django.db import connection, connections
+
+
+def default_workers():
+    return min(4, os.cpu_count() or 1)
+
+
+def chunked(ids, chunk_size):
+    chunk = []
+    for value in ids:
+        chunk.append(value)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_chunked(func, ids, chunk_size=500, workers=1):
+    """
+    Call func(chunk) for every chunk of ids and yield the results as they
+    complete. With workers > 1 the chunks are spread over a forked process
+    pool; func must be a module-level function so it can be pickled.
+    SQLite only allows one writer at a time, so there the chunks always run
+    in-process.
+    """
+    chunks = chunked(ids, chunk_size)
+    if workers <= 1 or connection.vendor == 'sqlite':
+        for chunk in chunks:
+            yield func(chunk)
+        return
+
+    # Forked children must not share the parent's database sockets
+    connections.close_all()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('fork'),
+    ) as pool:
+        yield from pool.map(func, chunks)
@@ -0,0 +1,219 @@
+"""
+Population benchmarks: how a user's mood, sleep and spending compare to
+similar users.
+
+build_benchmarks() scans every user in chunks (over a process pool, see
+tracking.batch), reduces each user to one value per metric over the last
+BENCHMARK_WINDOW_DAYS and adds it to fixed-bin histograms keyed by cohort
+(primary substance, account tier, province) and by coarser cohorts with '*'
+wildcards. The workers only return histogram counts, which merge by addition.
+Cohorts with fewer than MIN_COHORT_SIZE users are never stored.
+
+A histogram is stored as cumulative counts, so a user's percentile is one
+bin lookup: user_percentiles() is O(1) per metric once the sketch row is read.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from users.models import User
+from .batch import run_chunked
+from .models import CohortBenchmark, ConsumptionEvent, JournalDailyRollup
+from .rollups import average
+
+BENCHMARK_WINDOW_DAYS = 90
+MIN_COHORT_SIZE = 20
+ANY = '*'
+QUANTILES = (10, 25, 50, 75, 90)
+
+# metric: (low, high, bin width). Values outside the range fall in the end bins.
+BENCHMARK_METRICS = {
+    'mood': (1, 10, 0.1),
+    'sleep_quality': (1, 10, 0.1),
+    'spending': (0, 2000, 10),
+}
+
+# Cohort columns kept at each level, finest first; dropped columns become ANY
+COHORT_LEVELS = (
+    ('substance', 'tier', 'province'),
+    ('substance', 'tier'),
+    ('substance',),
+    (),
+)
+
+
+def _bin_count(metric):
+    low, high, width = BENCHMARK_METRICS[metric]
+    return int(round((high - low) / width)) + 1
+
+
+def _bin(metric, value):
+    low, _, width = BENCHMARK_METRICS[metric]
+    # The epsilon keeps e.g. 5.3 out of the 5.2 bin despite float rounding
+    return min(max(int((value - low) / width + 1e-9), 0), _bin_count(metric) - 1)
+
+
+def _cohort_keys(substance, tier, province):
+    """
+    The user's cohort at every level, finest first. Levels that coincide
+    (e.g. no province given) appear once so no user is counted twice.
+    """
+    values = {'substance': substance, 'tier': tier or ANY, 'province': province or ANY}
+    keys = (
+        tuple(values[column] if column in level else ANY for column in ('substance', 'tier', 'province'))
+        for level in COHORT_LEVELS
+    )
+    return list(dict.fromkeys(keys))
+
+
+def window_start():
+    return timezone.now().date() - timedelta(days=BENCHMARK_WINDOW_DAYS)
+
+
+def user_metrics(user_ids, start_date):
+    """
+    {user_id: {'substance': ..., metric: value, ...}} for users with any data
+    in the window
+    """
+    rollups = JournalDailyRollup.objects.filter(user_id__in=user_ids, date__gte=start_date)
+    metrics = defaultdict(dict)
+
+    for row in rollups.values('user_id').annotate(
+        mood=average('mood_sum'), sleep_quality=average('sleep_quality_sum')
+    ).order_by():
+        metrics[row['user_id']].update(mood=row['mood'], sleep_quality=row['sleep_quality'])
+
+    substance_counts = defaultdict(Counter)
+    for user_id, substance, count in rollups.values_list('user_id', 'substance').annotate(
+        count=Sum('entry_count')
+    ).order_by():
+        substance_counts[user_id][substance] += count
+
+    for user_id, spending in ConsumptionEvent.objects.filter(
+        user_id__in=user_ids, date__gte=start_date
+    ).values_list('user_id').annotate(spending=Sum('spending')).order_by():
+        metrics[user_id]['spending'] = spending
+
+    for user_id, values in metrics.items():
+        counts = substance_counts.get(user_id)
+        # Ties go to the alphabetically first substance so reruns agree
+        values['substance'] = min(counts, key=lambda s: (-counts[s], s)) if counts else 'unknown'
+    return metrics
+
+
+def benchmark_chunk(user_ids):
+    """
+    Process pool worker: partial histograms {(metric, substance, tier, province): counts}
+    """
+    metrics = user_metrics(user_ids, window_start())
+    histograms = {}
+    for user_id, tier, province in User.objects.filter(
+        id__in=list(metrics)
+    ).values_list('id', 'account_tier', 'province'):
+        values = metrics[user_id]
+        for metric in BENCHMARK_METRICS:
+            if values.get(metric) is None:
+                continue
+            index = _bin(metric, values[metric])
+            for cohort in _cohort_keys(values['substance'], tier, province.strip().lower()):
+                counts = histograms.setdefault((metric,) + cohort, [0] * _bin_count(metric))
+                counts[index] += 1
+    return histograms
+
+
+def _quantiles(metric, cumulative):
+    """
+    Quantiles read off the histogram, interpolating linearly inside a bin
+    """
+    low, _, width = BENCHMARK_METRICS[metric]
+    total = cumulative[-1]
+    result = {}
+    index = 0
+    for q in QUANTILES:
+        rank = total * q / 100
+        while index < len(cumulative) - 2 and cumulative[index + 1] < rank:
+            index += 1
+        in_bin = cumulative[index + 1] - cumulative[index]
+        fraction = (rank - cumulative[index]) / in_bin if in_bin else 0
+        result[f'p{q}'] = round(low + (index + fraction) * width, 2)
+    return result
+
+
+def build_benchmarks(chunk_size=500, workers=1):
+    """
+    Rebuild every CohortBenchmark row. Returns the number of cohorts stored.
+    """
+    user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+    histograms = {}
+    for partial in run_chunked(benchmark_chunk, user_ids, chunk_size=chunk_size, workers=workers):
+        for key, counts in partial.items():
+            merged = histograms.setdefault(key, [0] * len(counts))
+            for i, count in enumerate(counts):
+                merged[i] += count
+
+    benchmarks = []
+    for (metric, substance, tier, province), counts in histograms.items():
+        user_count = sum(counts)
+        if user_count < MIN_COHORT_SIZE:
+            continue
+        cumulative = [0]
+        for count in counts:
+            cumulative.append(cumulative[-1] + count)
+        benchmarks.append(CohortBenchmark(
+            metric=metric, substance=substance, tier=tier, province=province,
+            user_count=user_count, cumulative=cumulative,
+            quantiles=_quantiles(metric, cumulative),
+        ))
+
+    with transaction.atomic():
+        CohortBenchmark.objects.all().delete()
+        CohortBenchmark.objects.bulk_create(benchmarks, batch_size=1000)
+    return len(benchmarks)
+
+
+def percentile(benchmark, value):
+    """
+    Share of the cohort below value, counting half of value's own bin
+    """
+    index = _bin(benchmark.metric, value)
+    below = benchmark.cumulative[index]
+    within = benchmark.cumulative[index + 1] - below
+    return round(100 * (below + within / 2) / benchmark.user_count, 1)
+
+
+def user_percentiles(user):
+    """
+    The user's current values and where they sit in the finest stored cohort
+    """
+    values = user_metrics([user.id], window_start()).get(user.id, {})
+    cohorts = _cohort_keys(values.get('substance', 'unknown'), user.account_tier,
+                           user.province.strip().lower())
+    benchmarks = defaultdict(dict)
+    for benchmark in CohortBenchmark.objects.filter(
+        metric__in=[m for m in BENCHMARK_METRICS if values.get(m) is not None],
+        substance__in={c[0] for c in cohorts},
+        tier__in={c[1] for c in cohorts},
+        province__in={c[2] for c in cohorts},
+    ):
+        benchmarks[benchmark.metric][(benchmark.substance, benchmark.tier, benchmark.province)] = benchmark
+
+    result = {}
+    for metric in BENCHMARK_METRICS:
+        value = values.get(metric)
+        benchmark = next((benchmarks[metric][c] for c in cohorts if c in benchmarks[metric]), None)
+        if value is None or benchmark is None:
+            result[metric] = {'value': value, 'percentile': None, 'cohort': None}
+            continue
+        result[metric] = {
+            'value': round(value, 2),
+            'percentile': percentile(benchmark, value),
+            'cohort': {
+                'substance': benchmark.substance,
+                'tier': benchmark.tier,
+                'province': benchmark.province,
+                'users': benchmark.user_count,
+            },
+            'quantiles': benchmark.quantiles,
+        }
+    return result
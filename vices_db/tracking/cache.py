@@ -0,0 +1,109 @@
+"""
+Per-user cache for analytics actions.
+
+Entries are keyed by (user, action, normalized query params, today) and stamped with
+the user's data version (sync.DataVersion). Writes to tracking or goals
+models bump that version through signals, which invalidates every cached
+result of the user at once.
+
+When an entry is out of date, one request takes a short refresh lock and
+recomputes it. Concurrent requests keep getting the previous result while the
+refresh is in flight instead of piling onto a slow database
+(stale-while-revalidate), so staleness is bounded by the lock timeout. Stale
+responses carry the ETag of the version they were computed for, so a client
+revalidating them gets the fresh result once it is in.
+"""
+import hashlib
+import json
+from functools import wraps
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from sync.versioning import compute_etag, request_data_version
+
+ANALYTICS_CACHE_TIMEOUT = 60 * 60 * 24
+ANALYTICS_REFRESH_LOCK_TIMEOUT = 30
+CACHE_OUTCOMES = ('hit', 'miss', 'stale')
+
+CACHED_ACTIONS = []
+
+
+def analytics_cache_key(user_id, action, query_params):
+    params = sorted((key, sorted(query_params.getlist(key))) for key in query_params)
+    # Timeframe windows are relative to today
+    params.append(('today', timezone.now().date().isoformat()))
+    digest = hashlib.sha1(json.dumps(params).encode('utf-8')).hexdigest()
+    return f'analytics:{user_id}:{action}:{digest}'
+
+
+def _metric_key(action, outcome):
+    return f'analytics:metrics:{action}:{outcome}'
+
+
+def _record(action, outcome):
+    key = _metric_key(action, outcome)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, 1, timeout=None)
+
+
+def cache_metrics():
+    """
+    Hit/miss/stale counters per cached action
+    """
+    metrics = {}
+    for action in CACHED_ACTIONS:
+        counts = {outcome: cache.get(_metric_key(action, outcome), 0) for outcome in CACHE_OUTCOMES}
+        served = sum(counts.values())
+        counts['hit_rate'] = (counts['hit'] + counts['stale']) / served if served else None
+        metrics[action] = counts
+    return metrics
+
+
+def cached_analytics(action):
+    """
+    Decorator for read-only analytics actions on a viewset
+    """
+    CACHED_ACTIONS.append(action)
+
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            version = request_data_version(request)
+            key = analytics_cache_key(request.user.id, action, request.query_params)
+            entry = cache.get(key)
+
+            if entry and entry['version'] == version:
+                _record(action, 'hit')
+                return Response(entry['data'], headers={'X-Cache': 'HIT'})
+
+            lock_key = f'{key}:refresh'
+            refreshing = not cache.add(lock_key, 1, timeout=ANALYTICS_REFRESH_LOCK_TIMEOUT)
+            if entry and refreshing:
+                _record(action, 'stale')
+                # Not the current version's ETag: that would make the client
+                # revalidate stale data with 304s until the next write
+                return Response(entry['data'], headers={
+                    'X-Cache': 'STALE', 'ETag': compute_etag(request, entry['version'])
+                })
+
+            try:
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code == status.HTTP_200_OK:
+                    # Store plain JSON types, not querysets
+                    data = json.loads(JSONRenderer().render(response.data))
+                    cache.set(key, {'version': version, 'data': data}, timeout=ANALYTICS_CACHE_TIMEOUT)
+                    response['X-Cache'] = 'MISS'
+            finally:
+                if not refreshing:
+                    cache.delete(lock_key)
+
+            _record(action, 'miss')
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,150 @@
+"""
+Vectorized "what affects my mood" analytics.
+
+A user's journal is loaded in one query into column arrays, collapsed to one
+row per calendar day, and every correlation (same-day and next-day) is
+computed from a handful of matrix products over that day matrix.
+"""
+from collections import Counter
+import numpy as np
+from .tags import normalize_tags
+
+TARGETS = ['mood', 'sleep_quality', 'sleep']
+SUBSTANCES = ['cannabis', 'alcohol']
+MINDFUL_SUBSTANCES = ('none', 'wellness')
+TOP_TAGS = 5
+# Correlations over fewer paired days than this are reported as null
+MIN_PAIRED_DAYS = 7
+
+
+def _pairwise_pearson(a, b):
+    """
+    Pearson r (and paired sample sizes) between every column of a and every
+    column of b, using only the rows where both values are present (not NaN)
+    """
+    mask_a, mask_b = ~np.isnan(a), ~np.isnan(b)
+    a0, b0 = np.where(mask_a, a, 0.0), np.where(mask_b, b, 0.0)
+    ma, mb = mask_a.astype(float), mask_b.astype(float)
+
+    n = ma.T @ mb
+    sum_a = a0.T @ mb
+    sum_b = ma.T @ b0
+    sum_aa = (a0 ** 2).T @ mb
+    sum_bb = ma.T @ (b0 ** 2)
+    sum_ab = a0.T @ b0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sum_ab - sum_a * sum_b / n
+        var_a = sum_aa - sum_a ** 2 / n
+        var_b = sum_bb - sum_b ** 2 / n
+        r = cov / np.sqrt(var_a * var_b)
+    r[(n < MIN_PAIRED_DAYS) | ~np.isfinite(r)] = np.nan
+    return r, n
+
+
+def _mean_delta(values, flags):
+    """
+    Mean of values on flagged days minus mean on unflagged days, per column
+    """
+    present = ~np.isnan(values) & ~np.isnan(flags)[:, None]
+    on = present & (flags == 1)[:, None]
+    off = present & (flags == 0)[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_on = np.where(on, values, 0).sum(axis=0) / on.sum(axis=0)
+        mean_off = np.where(off, values, 0).sum(axis=0) / off.sum(axis=0)
+    return mean_on - mean_off, on.sum(axis=0)
+
+
+def _clean(value):
+    return None if value is None or not np.isfinite(value) else round(float(value), 3)
+
+
+def _day_means(day, weights, n_days):
+    present = ~np.isnan(weights)
+    totals = np.bincount(day[present], weights=weights[present], minlength=n_days)
+    counts = np.bincount(day[present], minlength=n_days)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, totals / counts, np.nan)
+
+
+def _days_with(day, hits, n_days):
+    return np.bincount(day, weights=hits.astype(float), minlength=n_days) > 0
+
+
+def journal_correlations(entries):
+    """
+    entries: JournalEntry queryset already filtered to one user
+    """
+    rows = list(entries.order_by().values_list('date', 'substance', 'mood', 'sleep_quality', 'sleep', 'tags'))
+    if not rows:
+        return {'days_logged': 0, 'entries': 0, 'correlations': {}, 'lagged': {}, 'substance_effects': {}}
+
+    dates, substances, moods, sleep_qualities, sleeps, tags = zip(*rows)
+    ordinals = np.fromiter((d.toordinal() for d in dates), dtype=np.int64, count=len(rows))
+    first_day = ordinals.min()
+    day = ordinals - first_day
+    n_days = int(day.max()) + 1
+    logged = np.bincount(day, minlength=n_days) > 0
+
+    substances = np.array(substances)
+    targets = np.column_stack([
+        _day_means(day, np.array(moods, dtype=float), n_days),
+        _day_means(day, np.array(sleep_qualities, dtype=float), n_days),
+        _day_means(day, np.array([np.nan if s is None else s for s in sleeps], dtype=float), n_days),
+    ])
+
+    # Day-level factors: 1 if the substance (or tag) appears that day, 0 if
+    # the day was logged without it, NaN for days with no entries
+    factor_names = list(SUBSTANCES)
+    day_flags = [
+        _days_with(day, np.isin(substances, [substance, 'both']), n_days)
+        for substance in SUBSTANCES
+    ]
+    factor_names.append('mindful')
+    day_flags.append(~_days_with(day, ~np.isin(substances, MINDFUL_SUBSTANCES), n_days))
+
+    entry_tags = [normalize_tags(t) for t in tags]
+    tag_counts = Counter(tag for t in entry_tags for tag in t)
+    for tag, _ in tag_counts.most_common(TOP_TAGS):
+        factor_names.append(f'tag:{tag}')
+        day_flags.append(_days_with(day, np.array([tag in t for t in entry_tags]), n_days))
+
+    factors = np.column_stack(day_flags).astype(float)
+    factors[~logged] = np.nan
+
+    same_day_r, same_day_n = _pairwise_pearson(targets, np.column_stack([targets, factors]))
+    next_day_r, next_day_n = _pairwise_pearson(factors[:-1], targets[1:])
+
+    columns = TARGETS + factor_names
+    correlations = {
+        target: {
+            column: {'r': _clean(same_day_r[i, j]), 'days': int(same_day_n[i, j])}
+            for j, column in enumerate(columns) if column != target
+        }
+        for i, target in enumerate(TARGETS)
+    }
+    lagged = {
+        factor: {
+            f'next_day_{target}': {'r': _clean(next_day_r[i, j]), 'days': int(next_day_n[i, j])}
+            for j, target in enumerate(TARGETS)
+        }
+        for i, factor in enumerate(factor_names)
+    }
+
+    substance_effects = {}
+    for i, factor in enumerate(factor_names):
+        same_delta, days_on = _mean_delta(targets, factors[:, i])
+        next_delta, _ = _mean_delta(targets[1:], factors[:-1, i])
+        substance_effects[factor] = {
+            'days': int(days_on[0]),
+            **{f'{target}_delta': _clean(same_delta[j]) for j, target in enumerate(TARGETS)},
+            **{f'next_day_{target}_delta': _clean(next_delta[j]) for j, target in enumerate(TARGETS)},
+        }
+
+    return {
+        'days_logged': int(logged.sum()),
+        'entries': len(rows),
+        'correlations': correlations,
+        'lagged': lagged,
+        'substance_effects': substance_effects,
+    }
@@ -0,0 +1,102 @@
+import csv
+import json
+from datetime import date, datetime
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import NotFound
+
+JOURNAL_EXPORT_FIELDS = [
+    'id', 'date', 'timestamp', 'substance', 'amount', 'mood',
+    'sleep_quality', 'sleep', 'effects', 'notes', 'tags',
+]
+
+CONSUMPTION_EXPORT_FIELDS = [
+    'id', 'date', 'vice_type', 'quantity', 'spending', 'location',
+    'time_of_day', 'mood_before', 'mood_after', 'notes', 'created_at',
+]
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Rows fetched per database round trip (a server-side cursor on Postgres)
+EXPORT_CHUNK_SIZE = 2000
+# Rows joined into each chunk handed to the server
+LINES_PER_WRITE = 500
+
+
+class _Echo:
+    """
+    File-like object for csv.writer that hands back the formatted line
+    """
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+
+def _batched(lines):
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) == LINES_PER_WRITE:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+async def _async_batches(batches):
+    """
+    Async view of the batches for ASGI servers, which would otherwise read a
+    sync iterator into a list before sending anything. Batches are pulled in
+    the request's thread, which owns the database cursor.
+    """
+    next_batch = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (batch := await next_batch(batches, None)) is not None:
+            yield batch
+    finally:
+        await sync_to_async(batches.close, thread_sensitive=True)()
+
+
+def _csv_lines(rows, fields):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def _ndjson_lines(rows, fields):
+    for row in rows:
+        yield json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def export_response(request, queryset, fields, export_format, filename):
+    """
+    Stream queryset rows as CSV or NDJSON without materialising the result set
+    """
+    if export_format not in EXPORT_CONTENT_TYPES:
+        raise NotFound(f'Unknown export format: {export_format}')
+
+    rows = queryset.values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    lines = _csv_lines(rows, fields) if export_format == 'csv' else _ndjson_lines(rows, fields)
+
+    batches = _batched(lines)
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        batches = _async_batches(batches)
+    response = StreamingHttpResponse(
+        batches,
+        content_type=EXPORT_CONTENT_TYPES[export_format]
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from tracking.batch import default_workers
+from tracking.benchmarks import build_benchmarks, MIN_COHORT_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the anonymized per-cohort benchmark sketches from every user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=default_workers())
+
+    def handle(self, *args, **options):
+        stored = build_benchmarks(chunk_size=options['chunk_size'], workers=options['workers'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {stored} cohort benchmarks (cohorts under {MIN_COHORT_SIZE} users skipped)'
+        ))
@@ -0,0 +1,28 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from tracking.partitions import ensure_month_partitions, month_start, partitioned
+
+
+class Command(BaseCommand):
+    help = 'Create the monthly partitions of the consumption event ledger (run monthly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3)
+        parser.add_argument('--since', help='Also cover months back to this YYYY-MM-DD date')
+
+    def handle(self, *args, **options):
+        if not partitioned():
+            self.stdout.write('Consumption ledger is not partitioned on this database, nothing to do')
+            return
+
+        today = timezone.now().date()
+        first = month_start(today)
+        if options['since']:
+            first = min(first, month_start(date.fromisoformat(options['since'])))
+        last = today + timedelta(days=31 * options['months_ahead'])
+
+        created = ensure_month_partitions(first, last)
+        for name in created:
+            self.stdout.write(f'Created {name}')
+        self.stdout.write(self.style.SUCCESS(f'Created {len(created)} partitions'))
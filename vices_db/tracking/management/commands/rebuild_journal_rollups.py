@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from tracking.models import JournalEntry, JournalDailyRollup
+from tracking.rollups import rebuild_user_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-user daily journal rollups from raw journal entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Only rebuild this user id (can be repeated)')
+
+    def handle(self, *args, **options):
+        user_ids = options['users']
+        if not user_ids:
+            # Include users whose rollups outlived their entries
+            user_ids = sorted(
+                set(JournalEntry.objects.values_list('user_id', flat=True).distinct()) |
+                set(JournalDailyRollup.objects.values_list('user_id', flat=True).distinct())
+            )
+        rebuilt = 0
+        for user_id in user_ids:
+            rebuild_user_rollups(user_id)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt journal rollups for {rebuilt} users'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from tracking.models import JournalEntry
+from tracking.tags import rebuild_user_tags
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the normalized journal tag index from raw journal entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Only rebuild this user id (can be repeated)')
+
+    def handle(self, *args, **options):
+        user_ids = options['users'] or list(
+            JournalEntry.objects.order_by('user_id').values_list('user_id', flat=True).distinct()
+        )
+        for user_id in user_ids:
+            rebuild_user_tags(user_id)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt journal tags for {len(user_ids)} users'))
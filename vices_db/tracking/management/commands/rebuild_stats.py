@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from tracking.batch import default_workers, run_chunked
+from tracking.models import JournalEntry
+from tracking.stats_engine import rebuild_stats_chunk
+
+
+class Command(BaseCommand):
+    help = 'Recompute tracking.Stats for every user with journal entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Only rebuild this user id (can be repeated)')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=default_workers())
+
+    def handle(self, *args, **options):
+        user_ids = options['users'] or list(
+            JournalEntry.objects.order_by('user_id').values_list('user_id', flat=True).distinct()
+        )
+        rebuilt = 0
+        for count in run_chunked(rebuild_stats_chunk, user_ids,
+                                 chunk_size=options['chunk_size'],
+                                 workers=options['workers']):
+            rebuilt += count
+            self.stdout.write(f'Rebuilt stats for {rebuilt}/{len(user_ids)} users')
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {rebuilt} users'))
@@ -0,0 +1,69 @@
+# Generated by Django 4.2 on 2026-10-17 07:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Sum, Min, Max
+from django.db.models.functions import Coalesce
+
+
+def backfill_rollups(apps, schema_editor):
+    """
+    Roll up the journal entries written before the rollup table existed
+    """
+    JournalEntry = apps.get_model('tracking', 'JournalEntry')
+    JournalDailyRollup = apps.get_model('tracking', 'JournalDailyRollup')
+
+    rows = JournalEntry.objects.values('user_id', 'date', 'substance').annotate(
+        entry_count=Count('id'),
+        mood_sum=Sum('mood'),
+        mood_min=Min('mood'),
+        mood_max=Max('mood'),
+        sleep_quality_sum=Sum('sleep_quality'),
+        sleep_quality_min=Min('sleep_quality'),
+        sleep_quality_max=Max('sleep_quality'),
+        sleep_sum=Coalesce(Sum('sleep'), 0),
+        sleep_count=Count('sleep'),
+        sleep_min=Min('sleep'),
+        sleep_max=Max('sleep'),
+    ).order_by()
+    JournalDailyRollup.objects.bulk_create(
+        (JournalDailyRollup(**row) for row in rows.iterator(chunk_size=2000)),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tracking', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JournalDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('substance', models.CharField(max_length=20)),
+                ('entry_count', models.PositiveIntegerField(default=0)),
+                ('mood_sum', models.IntegerField(default=0)),
+                ('mood_min', models.IntegerField(null=True)),
+                ('mood_max', models.IntegerField(null=True)),
+                ('sleep_quality_sum', models.FloatField(default=0)),
+                ('sleep_quality_min', models.FloatField(null=True)),
+                ('sleep_quality_max', models.FloatField(null=True)),
+                ('sleep_sum', models.IntegerField(default=0)),
+                ('sleep_count', models.PositiveIntegerField(default=0)),
+                ('sleep_min', models.IntegerField(null=True)),
+                ('sleep_max', models.IntegerField(null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='journal_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='journaldailyrollup',
+            constraint=models.UniqueConstraint(fields=('user', 'date', 'substance'), name='tracking_rollup_user_date_substance'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
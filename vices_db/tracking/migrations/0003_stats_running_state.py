@@ -0,0 +1,108 @@
+# Generated by Django 4.2 on 2026-10-17 07:26
+
+from django.db import migrations, models
+
+
+def backfill_running_state(apps, schema_editor):
+    """
+    Replay the journal of every existing Stats row into the new running
+    state, which would otherwise start from zero on the next incremental write
+    """
+    from tracking.stats_engine import apply_entry
+    from tracking.streaks import compute_streaks
+    Stats = apps.get_model('tracking', 'Stats')
+    JournalEntry = apps.get_model('tracking', 'JournalEntry')
+
+    for stats in Stats.objects.order_by('pk').iterator(chunk_size=500):
+        entries = (
+            JournalEntry.objects.filter(user_id=stats.user_id)
+            .order_by('date', 'timestamp', 'id')
+            .values_list('date', 'mood', 'sleep_quality')
+        )
+        for entry_date, mood, sleep_quality in entries.iterator(chunk_size=2000):
+            apply_entry(stats, entry_date, mood, sleep_quality)
+
+        # Read off the rollups backfilled by 0002; prior_longest_streak is
+        # dropped again by 0010 and left at its default
+        mindful = compute_streaks(stats.user_id)['mindful']
+        stats.mindful_days = mindful['total_days']
+        stats.current_streak = mindful['current']
+        stats.longest_streak = mindful['longest']
+        stats.last_day_mindful = mindful['last_day_qualifies']
+        stats.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0002_journaldailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stats',
+            name='current_streak',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='stats',
+            name='entry_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='stats',
+            name='last_day_mindful',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='stats',
+            name='last_entry_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='stats',
+            name='longest_streak',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='stats',
+            name='mood_ewma_fast',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='stats',
+            name='mood_ewma_slow',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='stats',
+            name='mood_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='stats',
+            name='prior_longest_streak',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='stats',
+            name='sleep_baseline_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='stats',
+            name='sleep_baseline_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='stats',
+            name='sleep_quality_ewma',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='stats',
+            name='sleep_quality_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(backfill_running_state, migrations.RunPython.noop),
+    ]
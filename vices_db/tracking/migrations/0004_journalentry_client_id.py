@@ -0,0 +1,22 @@
+# Generated by Django 4.2 on 2026-10-17 07:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0003_stats_running_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='journalentry',
+            name='client_id',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='journalentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('client_id__isnull', False)), fields=('user', 'client_id'), name='tracking_journal_user_client_id'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2 on 2026-10-17 07:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def index_existing_tags(apps, schema_editor):
+    """
+    Index the tags of the entries written before the tag table existed
+    """
+    from tracking.tags import normalize_tags
+    JournalEntry = apps.get_model('tracking', 'JournalEntry')
+    JournalTag = apps.get_model('tracking', 'JournalTag')
+
+    entries = JournalEntry.objects.exclude(tags=[]).values_list(
+        'id', 'user_id', 'date', 'substance', 'mood', 'tags'
+    )
+    JournalTag.objects.bulk_create(
+        (
+            JournalTag(user_id=user_id, entry_id=entry_id, tag=tag, date=date, substance=substance, mood=mood)
+            for entry_id, user_id, date, substance, mood, tags in entries.iterator(chunk_size=2000)
+            for tag in normalize_tags(tags)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tracking', '0004_journalentry_client_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JournalTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.CharField(max_length=50)),
+                ('date', models.DateField()),
+                ('substance', models.CharField(max_length=20)),
+                ('mood', models.IntegerField()),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_index', to='tracking.journalentry')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='journal_tags', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='journaltag',
+            index=models.Index(fields=['user', 'tag', 'date'], name='tracking_jo_user_id_f645b6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='journaltag',
+            index=models.Index(fields=['user', 'date'], name='tracking_jo_user_id_41d1a3_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='journaltag',
+            constraint=models.UniqueConstraint(fields=('entry', 'tag'), name='tracking_journaltag_entry_tag'),
+        ),
+        migrations.RunPython(index_existing_tags, migrations.RunPython.noop),
+    ]
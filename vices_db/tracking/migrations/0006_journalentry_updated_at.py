@@ -0,0 +1,22 @@
+# Generated by Django 4.2 on 2026-10-17 07:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0005_journaltag'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='journalentry',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='journalentry',
+            index=models.Index(fields=['user', 'updated_at'], name='tracking_jo_user_id_db1abe_idx'),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Full-text search index over journal notes and effects.
+#
+# Postgres gets a generated tsvector column with a GIN index. SQLite (local
+# development) gets an external-content FTS5 table kept in sync by triggers.
+# Neither is visible to the ORM; tracking.search queries them directly.
+#
+# SQLite drops a table's triggers whenever Django rebuilds that table, so a
+# later migration that alters tracking_journalentry on SQLite must re-run
+# create_search_index.
+
+from django.db import migrations
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE tracking_journalentry ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(notes, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(effects, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX tracking_journalentry_search_idx ON tracking_journalentry USING GIN (search_vector)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS tracking_journalentry_search_idx",
+    "ALTER TABLE tracking_journalentry DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS tracking_journalentry_fts USING fts5(
+        notes, effects,
+        content='tracking_journalentry', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tracking_journalentry_fts_insert
+    AFTER INSERT ON tracking_journalentry BEGIN
+        INSERT INTO tracking_journalentry_fts(rowid, notes, effects)
+        VALUES (new.id, new.notes, new.effects);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tracking_journalentry_fts_delete
+    AFTER DELETE ON tracking_journalentry BEGIN
+        INSERT INTO tracking_journalentry_fts(tracking_journalentry_fts, rowid, notes, effects)
+        VALUES ('delete', old.id, old.notes, old.effects);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tracking_journalentry_fts_update
+    AFTER UPDATE ON tracking_journalentry BEGIN
+        INSERT INTO tracking_journalentry_fts(tracking_journalentry_fts, rowid, notes, effects)
+        VALUES ('delete', old.id, old.notes, old.effects);
+        INSERT INTO tracking_journalentry_fts(rowid, notes, effects)
+        VALUES (new.id, new.notes, new.effects);
+    END
+    """,
+    "INSERT INTO tracking_journalentry_fts(tracking_journalentry_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS tracking_journalentry_fts_insert",
+    "DROP TRIGGER IF EXISTS tracking_journalentry_fts_delete",
+    "DROP TRIGGER IF EXISTS tracking_journalentry_fts_update",
+    "DROP TABLE IF EXISTS tracking_journalentry_fts",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    _run(schema_editor, {'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD})
+
+
+def drop_search_index(apps, schema_editor):
+    _run(schema_editor, {'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0006_journalentry_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
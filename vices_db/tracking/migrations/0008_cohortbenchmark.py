@@ -0,0 +1,31 @@
+# Generated by Django 4.2 on 2026-10-17 07:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0007_journal_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CohortBenchmark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=30)),
+                ('substance', models.CharField(max_length=20)),
+                ('tier', models.CharField(max_length=20)),
+                ('province', models.CharField(max_length=50)),
+                ('user_count', models.PositiveIntegerField()),
+                ('cumulative', models.JSONField(default=list)),
+                ('quantiles', models.JSONField(default=dict)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='cohortbenchmark',
+            constraint=models.UniqueConstraint(fields=('metric', 'substance', 'tier', 'province'), name='tracking_benchmark_cohort'),
+        ),
+    ]
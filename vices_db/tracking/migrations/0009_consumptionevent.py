@@ -0,0 +1,90 @@
+# Generated by Django 4.2 on 2026-10-17 07:39
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+from tracking.partitions import CREATE_PARTITIONED_TABLE_SQL, EVENT_TABLE, ensure_month_partitions
+
+
+# Monthly partitions created ahead of the current month at migration time;
+# the create_consumption_partitions command keeps extending them
+MONTHS_AHEAD = 3
+
+
+def create_event_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in CREATE_PARTITIONED_TABLE_SQL:
+            schema_editor.execute(sql)
+    else:
+        schema_editor.create_model(apps.get_model('tracking', 'ConsumptionEvent'))
+
+
+def drop_event_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP TABLE {EVENT_TABLE} CASCADE')
+    else:
+        schema_editor.delete_model(apps.get_model('tracking', 'ConsumptionEvent'))
+
+
+def copy_consumption_stats(apps, schema_editor):
+    """
+    Seed the ledger with the one ConsumptionStats row every user could have
+    """
+    from datetime import date, timedelta
+    ConsumptionStats = apps.get_model('tracking', 'ConsumptionStats')
+
+    today = date.today()
+    first = ConsumptionStats.objects.order_by('date').values_list('date', flat=True).first() or today
+    ensure_month_partitions(min(first, today), today + timedelta(days=31 * MONTHS_AHEAD))
+
+    # Plain INSERT ... SELECT keeps created_at (bulk_create would reset it)
+    columns = (
+        'user_id, date, vice_type, quantity, spending, location, '
+        'time_of_day, mood_before, mood_after, notes, created_at'
+    )
+    schema_editor.execute(
+        f'INSERT INTO {EVENT_TABLE} ({columns}) '
+        f'SELECT {columns} FROM tracking_consumptionstats ORDER BY date, id'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tracking', '0008_cohortbenchmark'),
+    ]
+
+    operations = [
+        # The table itself is created by create_event_table: partitioned on
+        # Postgres, which Django's schema editor cannot express
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.CreateModel(
+                name='ConsumptionEvent',
+                fields=[
+                    ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                    ('date', models.DateField()),
+                    ('vice_type', models.CharField(choices=[('cannabis', 'Cannabis'), ('alcohol', 'Alcohol'), ('both', 'Both'), ('none', 'None'), ('wellness', 'Wellness')], max_length=20)),
+                    ('quantity', models.FloatField(validators=[django.core.validators.MinValueValidator(0)])),
+                    ('spending', models.FloatField(validators=[django.core.validators.MinValueValidator(0)])),
+                    ('location', models.CharField(blank=True, max_length=100)),
+                    ('time_of_day', models.CharField(blank=True, max_length=20)),
+                    ('mood_before', models.IntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(10)])),
+                    ('mood_after', models.IntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(10)])),
+                    ('notes', models.TextField(blank=True)),
+                    ('created_at', models.DateTimeField(auto_now_add=True)),
+                    ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consumption_events', to=settings.AUTH_USER_MODEL)),
+                ],
+                options={
+                    'ordering': ['-date', '-id'],
+                },
+            ),
+            migrations.AddIndex(
+                model_name='consumptionevent',
+                index=models.Index(fields=['user', 'date'], name='tracking_event_user_date'),
+            ),
+        ]),
+        migrations.RunPython(create_event_table, drop_event_table),
+        migrations.RunPython(copy_consumption_stats, migrations.RunPython.noop),
+    ]
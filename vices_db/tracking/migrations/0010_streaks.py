@@ -0,0 +1,45 @@
+# Generated by Django 4.2 on 2026-10-17 07:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tracking', '0009_consumptionevent'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='stats',
+            name='last_day_mindful',
+        ),
+        migrations.RemoveField(
+            model_name='stats',
+            name='prior_longest_streak',
+        ),
+        migrations.CreateModel(
+            name='Streak',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('mindful', 'Mindful'), ('alcohol_free', 'Alcohol free'), ('cannabis_free', 'Cannabis free')], max_length=20)),
+                ('current', models.PositiveIntegerField(default=0)),
+                ('current_start', models.DateField(blank=True, null=True)),
+                ('longest', models.PositiveIntegerField(default=0)),
+                ('longest_start', models.DateField(blank=True, null=True)),
+                ('longest_end', models.DateField(blank=True, null=True)),
+                ('total_days', models.PositiveIntegerField(default=0)),
+                ('last_logged_date', models.DateField(blank=True, null=True)),
+                ('last_day_qualifies', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='streaks', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='streak',
+            constraint=models.UniqueConstraint(fields=('user', 'kind'), name='tracking_streak_user_kind'),
+        ),
+    ]
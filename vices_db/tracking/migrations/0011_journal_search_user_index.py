@@ -0,0 +1,50 @@
+# Scope the Postgres journal search index by user.
+#
+# Search always filters on user_id, but the GIN index of 0007 covers only
+# search_vector: a common word matches every user's rows in the index scan
+# and user_id is checked on the heap afterwards. btree_gin lets the GIN index
+# hold user_id too, so the scan only returns the user's own matches.
+#
+# SQLite keeps its FTS5 table: a virtual table cannot be indexed on user_id,
+# and it only serves local development.
+
+from django.db import migrations
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gin",
+    "DROP INDEX IF EXISTS tracking_journalentry_search_idx",
+    """
+    CREATE INDEX tracking_journalentry_user_search_idx
+    ON tracking_journalentry USING GIN (user_id, search_vector)
+    """,
+]
+
+# The extension is left in place; other indexes may use it
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS tracking_journalentry_user_search_idx",
+    "CREATE INDEX tracking_journalentry_search_idx ON tracking_journalentry USING GIN (search_vector)",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def create_user_search_index(apps, schema_editor):
+    _run(schema_editor, {'postgresql': POSTGRES_FORWARD})
+
+
+def drop_user_search_index(apps, schema_editor):
+    _run(schema_editor, {'postgresql': POSTGRES_REVERSE})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0010_streaks'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_user_search_index, drop_user_search_index),
+    ]
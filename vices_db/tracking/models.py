@@ -31,11 +31,22 @@ class JournalEntry(models.Model):
         validators=[MinValueValidator(0), MaxValueValidator(24)],
         blank=True, null=True
     )
+    # Set by offline clients so replayed entries can be de-duplicated
+    client_id = models.CharField(max_length=64, blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
     class Meta:
         ordering = ['-date']
         indexes = [
             models.Index(fields=['user', 'date']),
             models.Index(fields=['substance']),
+            models.Index(fields=['user', 'updated_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'client_id'],
+                condition=models.Q(client_id__isnull=False),
+                name='tracking_journal_user_client_id'
+            ),
         ]
 
 class Stats(models.Model):
@@ -48,6 +59,20 @@ class Stats(models.Model):
     mood_trend = models.CharField(max_length=20, default='stable')
     last_calculated = models.DateTimeField(auto_now=True)
 
+    # Running state maintained by tracking.stats_engine
+    entry_count = models.IntegerField(default=0)
+    mood_sum = models.FloatField(default=0)
+    sleep_quality_sum = models.FloatField(default=0)
+    mood_ewma_fast = models.FloatField(null=True, blank=True)
+    mood_ewma_slow = models.FloatField(null=True, blank=True)
+    sleep_quality_ewma = models.FloatField(null=True, blank=True)
+    sleep_baseline_sum = models.FloatField(default=0)
+    sleep_baseline_count = models.IntegerField(default=0)
+    last_entry_date = models.DateField(null=True, blank=True)
+    # Copied from the user's 'mindful' Streak row
+    current_streak = models.IntegerField(default=0)
+    longest_streak = models.IntegerField(default=0)
+
 class ConsumptionStats(models.Model):
     id = models.AutoField(primary_key=True)
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='consumption_stats')
@@ -81,4 +106,150 @@ class ConsumptionStats(models.Model):
         indexes = [
             models.Index(fields=['user', 'date']),
             models.Index(fields=['vice_type']),
-        ]
\ No newline at end of file
+        ]
+
+class ConsumptionEvent(models.Model):
+    """
+    Append-only consumption ledger: one row per logged consumption.
+
+    On Postgres the table is range-partitioned by month on date (see
+    tracking.partitions), so its primary key is really (id, date) and
+    date-bounded queries only touch the matching partitions.
+    """
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='consumption_events')
+    date = models.DateField()
+    vice_type = models.CharField(
+        max_length=20,
+        choices=[
+            ('cannabis', 'Cannabis'),
+            ('alcohol', 'Alcohol'),
+            ('both', 'Both'),
+            ('none', 'None'),
+            ('wellness', 'Wellness')
+        ]
+    )
+    quantity = models.FloatField(validators=[MinValueValidator(0)])
+    spending = models.FloatField(validators=[MinValueValidator(0)])
+    location = models.CharField(max_length=100, blank=True)
+    time_of_day = models.CharField(max_length=20, blank=True)
+    mood_before = models.IntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(10)],
+        blank=True, null=True
+    )
+    mood_after = models.IntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(10)],
+        blank=True, null=True
+    )
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    class Meta:
+        ordering = ['-date', '-id']
+        indexes = [
+            models.Index(fields=['user', 'date'], name='tracking_event_user_date'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('ConsumptionEvent rows are append-only')
+        super().save(*args, **kwargs)
+
+class JournalDailyRollup(models.Model):
+    """
+    Per-user, per-day, per-substance aggregates of JournalEntry rows.
+    Maintained by tracking.rollups on every journal write.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='journal_rollups')
+    date = models.DateField()
+    substance = models.CharField(max_length=20)
+    entry_count = models.PositiveIntegerField(default=0)
+    mood_sum = models.IntegerField(default=0)
+    mood_min = models.IntegerField(null=True)
+    mood_max = models.IntegerField(null=True)
+    sleep_quality_sum = models.FloatField(default=0)
+    sleep_quality_min = models.FloatField(null=True)
+    sleep_quality_max = models.FloatField(null=True)
+    sleep_sum = models.IntegerField(default=0)
+    sleep_count = models.PositiveIntegerField(default=0)
+    sleep_min = models.IntegerField(null=True)
+    sleep_max = models.IntegerField(null=True)
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'date', 'substance'],
+                name='tracking_rollup_user_date_substance'
+            ),
+        ]
+
+
+class JournalTag(models.Model):
+    """
+    One row per (entry, normalized tag), denormalized with the entry's date,
+    substance and mood so tag frequency and per-tag mood are index scans.
+    Maintained by tracking.tags on every journal write.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='journal_tags')
+    entry = models.ForeignKey(JournalEntry, on_delete=models.CASCADE, related_name='tag_index')
+    tag = models.CharField(max_length=50)
+    date = models.DateField()
+    substance = models.CharField(max_length=20)
+    mood = models.IntegerField()
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'tag', 'date']),
+            models.Index(fields=['user', 'date']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['entry', 'tag'], name='tracking_journaltag_entry_tag'),
+        ]
+
+
+class CohortBenchmark(models.Model):
+    """
+    Anonymized distribution of one metric over a cohort of users, built in
+    batch by tracking.benchmarks. '*' in a cohort column means any value.
+    """
+    metric = models.CharField(max_length=30)
+    substance = models.CharField(max_length=20)
+    tier = models.CharField(max_length=20)
+    province = models.CharField(max_length=50)
+    user_count = models.PositiveIntegerField()
+    # cumulative[i] = number of users whose value falls in a bin below i
+    cumulative = models.JSONField(default=list)
+    quantiles = models.JSONField(default=dict)
+    computed_at = models.DateTimeField(auto_now=True)
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['metric', 'substance', 'tier', 'province'],
+                name='tracking_benchmark_cohort'
+            ),
+        ]
+
+
+class Streak(models.Model):
+    """
+    Cached current/longest streak of one kind for one user, counted in
+    consecutive logged days. Maintained by tracking.streaks.
+    """
+    KIND_CHOICES = [
+        ('mindful', 'Mindful'),
+        ('alcohol_free', 'Alcohol free'),
+        ('cannabis_free', 'Cannabis free'),
+    ]
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='streaks')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    current = models.PositiveIntegerField(default=0)
+    current_start = models.DateField(null=True, blank=True)
+    longest = models.PositiveIntegerField(default=0)
+    longest_start = models.DateField(null=True, blank=True)
+    longest_end = models.DateField(null=True, blank=True)
+    total_days = models.PositiveIntegerField(default=0)
+    # Latest day with any journal entry, and whether it counted for this kind
+    last_logged_date = models.DateField(null=True, blank=True)
+    last_day_qualifies = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'kind'], name='tracking_streak_user_kind'),
+        ]
@@ -0,0 +1,137 @@
+import base64
+import json
+from datetime import date, datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class JournalCursorPagination(BasePagination):
+    """
+    Keyset pagination over (-date, -timestamp, id).
+
+    The cursor is the position of the last row of the previous page, so every
+    page is a bounded range scan on the (user, date) index no matter how deep
+    the client scrolls. No COUNT(*) is issued.
+    """
+    cursor_query_param = 'cursor'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by('-date', '-timestamp', 'id')
+        position = self.decode_cursor(request)
+        if position is not None:
+            last_date, last_timestamp, last_id = position
+            queryset = queryset.filter(
+                Q(date__lt=last_date) |
+                Q(date=last_date, timestamp__lt=last_timestamp) |
+                Q(date=last_date, timestamp=last_timestamp, id__gt=last_id)
+            )
+
+        # Fetch one extra row to find out whether there is a next page
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(last)
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def encode_cursor(self, entry):
+        payload = json.dumps(
+            [entry.date.isoformat(), entry.timestamp.isoformat(), entry.id],
+            separators=(',', ':')
+        )
+        return base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = base64.urlsafe_b64decode(encoded.encode('ascii'))
+            last_date, last_timestamp, last_id = json.loads(payload)
+            return (
+                date.fromisoformat(last_date),
+                datetime.fromisoformat(last_timestamp),
+                int(last_id),
+            )
+        except (TypeError, ValueError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class ConsumptionEventCursorPagination(JournalCursorPagination):
+    """
+    Keyset pagination over (-date, -id) for the consumption ledger. Leading
+    with date keeps every page inside a few monthly partitions on Postgres.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by('-date', '-id')
+        position = self.decode_cursor(request)
+        if position is not None:
+            last_date, last_id = position
+            queryset = queryset.filter(
+                Q(date__lt=last_date) | Q(date=last_date, id__lt=last_id)
+            )
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def encode_cursor(self, event):
+        payload = json.dumps([event.date.isoformat(), event.id], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = base64.urlsafe_b64decode(encoded.encode('ascii'))
+            last_date, last_id = json.loads(payload)
+            return date.fromisoformat(last_date), int(last_id)
+        except (TypeError, ValueError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
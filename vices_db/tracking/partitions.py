@@ -0,0 +1,109 @@
+"""
+Monthly range partitions of the consumption event ledger (Postgres only).
+
+tracking_consumptionevent is created PARTITION BY RANGE (date) with a
+DEFAULT partition catching rows outside every monthly partition, so inserts
+never fail. ensure_month_partitions() creates the missing months, moving any
+rows the default partition already holds for them. Other backends keep one
+plain table and every function here is a no-op.
+"""
+from datetime import date
+from django.db import connection, transaction
+
+EVENT_TABLE = 'tracking_consumptionevent'
+DEFAULT_PARTITION = f'{EVENT_TABLE}_default'
+
+CREATE_PARTITIONED_TABLE_SQL = [
+    f"""
+    CREATE TABLE {EVENT_TABLE} (
+        id bigserial NOT NULL,
+        user_id bigint NOT NULL REFERENCES users (id) DEFERRABLE INITIALLY DEFERRED,
+        date date NOT NULL,
+        vice_type varchar(20) NOT NULL,
+        quantity double precision NOT NULL,
+        spending double precision NOT NULL,
+        location varchar(100) NOT NULL,
+        time_of_day varchar(20) NOT NULL,
+        mood_before integer NULL,
+        mood_after integer NULL,
+        notes text NOT NULL,
+        created_at timestamp with time zone NOT NULL,
+        PRIMARY KEY (id, date)
+    ) PARTITION BY RANGE (date)
+    """,
+    f'CREATE INDEX tracking_event_user_date ON {EVENT_TABLE} (user_id, date)',
+    f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {EVENT_TABLE} DEFAULT',
+]
+
+
+def partitioned():
+    return connection.vendor == 'postgresql'
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{EVENT_TABLE}_y{month.year}m{month.month:02d}'
+
+
+def months_between(first, last):
+    month = month_start(first)
+    while month <= last:
+        yield month
+        month = next_month(month)
+
+
+def existing_partitions():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            """,
+            [EVENT_TABLE]
+        )
+        return {name for name, in cursor.fetchall()}
+
+
+def ensure_month_partitions(first, last):
+    """
+    Create the monthly partitions covering first..last that do not exist yet.
+    Returns the names of the partitions created.
+    """
+    if not partitioned():
+        return []
+
+    existing = existing_partitions()
+    created = []
+    for month in months_between(first, last):
+        name = partition_name(month)
+        if name in existing:
+            continue
+        bounds = [month, next_month(month)]
+        with transaction.atomic(), connection.cursor() as cursor:
+            # A partition cannot be attached while the default partition holds
+            # rows in its range, so those rows move over first
+            cursor.execute(f'CREATE TABLE {name} (LIKE {EVENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+            cursor.execute(
+                f"""
+                WITH moved AS (
+                    DELETE FROM {DEFAULT_PARTITION} WHERE date >= %s AND date < %s RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved
+                """,
+                bounds
+            )
+            cursor.execute(
+                f'ALTER TABLE {EVENT_TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)',
+                bounds
+            )
+        created.append(name)
+    return created
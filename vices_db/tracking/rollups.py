@@ -0,0 +1,100 @@
+from django.db import transaction
+from django.db.models import Count, Sum, Min, Max, DateField, FloatField
+from django.db.models.functions import Cast, Coalesce
+from users.models import User
+from .models import JournalEntry, JournalDailyRollup
+
+ROLLUP_FIELDS = [
+    'entry_count', 'mood_sum', 'mood_min', 'mood_max',
+    'sleep_quality_sum', 'sleep_quality_min', 'sleep_quality_max',
+    'sleep_sum', 'sleep_count', 'sleep_min', 'sleep_max',
+]
+
+ROLLUP_AGGREGATES = {
+    'entry_count': Count('id'),
+    'mood_sum': Sum('mood'),
+    'mood_min': Min('mood'),
+    'mood_max': Max('mood'),
+    'sleep_quality_sum': Sum('sleep_quality'),
+    'sleep_quality_min': Min('sleep_quality'),
+    'sleep_quality_max': Max('sleep_quality'),
+    'sleep_sum': Coalesce(Sum('sleep'), 0),
+    'sleep_count': Count('sleep'),
+    'sleep_min': Min('sleep'),
+    'sleep_max': Max('sleep'),
+}
+
+
+def average(sum_field, count_field='entry_count'):
+    """
+    Sum(sum_field) / Sum(count_field) as a float, for reading averages off rollups
+    """
+    return Cast(Sum(sum_field), FloatField()) / Sum(count_field)
+
+
+def _rollup_rows(user_id, entries):
+    rows = entries.values('date', 'substance').annotate(**ROLLUP_AGGREGATES).order_by()
+    return [
+        JournalDailyRollup(
+            user_id=user_id,
+            date=row['date'],
+            substance=row['substance'],
+            **{field: row[field] for field in ROLLUP_FIELDS}
+        )
+        for row in rows
+    ]
+
+
+def _lock_user(user_id):
+    # Rollup rows may not exist yet, so the user row is the lock
+    list(User.objects.select_for_update().filter(pk=user_id).values_list('pk'))
+
+
+def refresh_daily_rollups(user_id, keys):
+    """
+    Recompute the rollup rows for the given (date, substance) keys of one user.
+
+    Only the journal rows of the touched days are read (via the (user, date)
+    index), so the cost of a write does not grow with the user's history.
+    Refreshes of one user are serialized on the user row, so each one reads
+    the journal after the previous one committed instead of overwriting it
+    with an older snapshot.
+    """
+    to_date = DateField().to_python
+    keys = {(to_date(day), substance) for day, substance in keys}
+    if not keys:
+        return
+    dates = {day for day, _ in keys}
+    substances = {substance for _, substance in keys}
+
+    with transaction.atomic():
+        _lock_user(user_id)
+        entries = JournalEntry.objects.filter(
+            user_id=user_id, date__in=dates, substance__in=substances
+        )
+        rollups = [r for r in _rollup_rows(user_id, entries) if (r.date, r.substance) in keys]
+        if rollups:
+            JournalDailyRollup.objects.bulk_create(
+                rollups,
+                update_conflicts=True,
+                unique_fields=['user', 'date', 'substance'],
+                update_fields=ROLLUP_FIELDS,
+            )
+        emptied = keys - {(r.date, r.substance) for r in rollups}
+        for day, substance in emptied:
+            JournalDailyRollup.objects.filter(
+                user_id=user_id, date=day, substance=substance
+            ).delete()
+
+
+def rebuild_user_rollups(user_id):
+    """
+    Drop and recompute every rollup row for one user
+    """
+    with transaction.atomic():
+        _lock_user(user_id)
+        JournalDailyRollup.objects.filter(user_id=user_id).delete()
+        JournalDailyRollup.objects.bulk_create(
+            _rollup_rows(user_id, JournalEntry.objects.filter(user_id=user_id)),
+            batch_size=1000,
+        )
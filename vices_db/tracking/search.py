@@ -0,0 +1,61 @@
+"""
+Ranked full-text search over journal notes and effects.
+
+Backed by the tsvector column and a GIN index on (user_id, search_vector) on
+Postgres, and the FTS5 table on SQLite (see migrations
+0007_journal_search_index and 0011_journal_search_user_index). Other backends
+fall back to an unranked icontains scan.
+"""
+import re
+from django.db import connection
+from django.db.models import Q
+from .models import JournalEntry
+
+POSTGRES_SEARCH_SQL = """
+    SELECT e.id, ts_rank_cd(e.search_vector, query) AS rank
+    FROM tracking_journalentry e, websearch_to_tsquery('english', %s) query
+    WHERE e.user_id = %s AND e.search_vector @@ query
+    ORDER BY rank DESC, e.date DESC, e.id DESC
+    LIMIT %s OFFSET %s
+"""
+
+SQLITE_SEARCH_SQL = """
+    SELECT e.id, -bm25(tracking_journalentry_fts, 2.0, 1.0) AS rank
+    FROM tracking_journalentry_fts
+    JOIN tracking_journalentry e ON e.id = tracking_journalentry_fts.rowid
+    WHERE tracking_journalentry_fts MATCH %s AND e.user_id = %s
+    ORDER BY rank DESC, e.date DESC, e.id DESC
+    LIMIT %s OFFSET %s
+"""
+
+
+def _fts5_query(text):
+    """
+    Quote every word so user input can never be parsed as FTS5 syntax
+    """
+    return ' '.join('"%s"' % word for word in re.findall(r'\w+', text))
+
+
+def search_journal(user_id, text, limit, offset=0):
+    """
+    Return [(entry_id, rank), ...] for the user's entries matching text,
+    best match first
+    """
+    if connection.vendor == 'postgresql':
+        sql, query = POSTGRES_SEARCH_SQL, text
+    elif connection.vendor == 'sqlite':
+        sql, query = SQLITE_SEARCH_SQL, _fts5_query(text)
+    else:
+        ids = (
+            JournalEntry.objects.filter(user_id=user_id)
+            .filter(Q(notes__icontains=text) | Q(effects__icontains=text))
+            .order_by('-date', '-id')
+            .values_list('id', flat=True)[offset:offset + limit]
+        )
+        return [(entry_id, None) for entry_id in ids]
+
+    if not query.strip():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [query, user_id, limit, offset])
+        return cursor.fetchall()
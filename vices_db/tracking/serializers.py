@@ -1,14 +1,19 @@
 from rest_framework import serializers
-from .models import JournalEntry, Stats
+from .models import JournalEntry, Stats, ConsumptionEvent
 
 class JournalEntrySerializer(serializers.ModelSerializer):
     class Meta:
         model = JournalEntry
         fields = [
-            'id', 'user', 'date', 'timestamp', 'substance', 'amount', 'mood', 'sleep_quality', 'effects', 'notes', 'tags', 'sleep'
+            'id', 'user', 'date', 'timestamp', 'substance', 'amount', 'mood', 'sleep_quality', 'effects', 'notes', 'tags', 'sleep',
+            'client_id'
         ]
         read_only_fields = ['id', 'user', 'timestamp']
 
+    def validate_client_id(self, value):
+        # Blank ids would collide under the (user, client_id) constraint
+        return value or None
+
 class ConsumptionStatsSerializer(serializers.ModelSerializer):
     class Meta:
         model = Stats
@@ -18,13 +23,29 @@ class ConsumptionStatsSerializer(serializers.ModelSerializer):
             'mood_after', 'notes', 'created_at'
         ]
         read_only_fields = ['user', 'created_at']
+
+
+class ConsumptionEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ConsumptionEvent
+        fields = [
+            'id', 'user', 'date', 'vice_type', 'quantity',
+            'spending', 'location', 'time_of_day', 'mood_before',
+            'mood_after', 'notes', 'created_at'
+        ]
+        read_only_fields = ['id', 'user', 'created_at']
+
 class StatsSerializer(serializers.ModelSerializer):
     class Meta:
         model = Stats
         fields = [
             'id', 'user', 'mindful_days', 'sleep_quality',
-            'sleep_improvement', 'mood_average', 'mood_trend', 'last_calculated'
+            'sleep_improvement', 'mood_average', 'mood_trend', 'last_calculated',
+            'current_streak', 'longest_streak'
+        ]
+        read_only_fields = [
+            'id', 'user', 'mindful_days', 'sleep_quality', 'sleep_improvement',
+            'mood_average', 'mood_trend', 'last_calculated', 'current_streak', 'longest_streak'
         ]
-        read_only_fields = ['id', 'user', 'last_calculated']
 
 
@@ -0,0 +1,146 @@
+"""
+Time-bucketed chart series.
+
+Aggregates run in SQL, grouped by the (truncated) date so the (user, date)
+indexes drive the scan, and come back as parallel arrays: one list of bucket
+labels and one list of values per metric, with gaps filled in.
+"""
+from datetime import date, timedelta
+from django.db.models import Avg, Count, DateField, F, Max, Min, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from .rollups import average
+
+BUCKETS = ('day', 'week', 'month')
+# Range used when the request gives no start_date
+DEFAULT_SPAN_DAYS = {'day': 90, 'week': 364, 'month': 365}
+MAX_BUCKETS = 1100
+
+# Metrics read off JournalDailyRollup
+JOURNAL_SERIES_METRICS = {
+    'entries': lambda: Sum('entry_count'),
+    'mood': lambda: average('mood_sum'),
+    'mood_min': lambda: Min('mood_min'),
+    'mood_max': lambda: Max('mood_max'),
+    'sleep_quality': lambda: average('sleep_quality_sum'),
+    'sleep': lambda: average('sleep_sum', 'sleep_count'),
+}
+JOURNAL_DEFAULT_METRICS = ['entries', 'mood', 'sleep_quality']
+
+CONSUMPTION_SERIES_METRICS = {
+    'count': lambda: Count('id'),
+    'quantity': lambda: Sum('quantity'),
+    'spending': lambda: Sum('spending'),
+    'mood_before': lambda: Avg('mood_before'),
+    'mood_after': lambda: Avg('mood_after'),
+}
+CONSUMPTION_DEFAULT_METRICS = ['count', 'quantity', 'spending']
+
+# Totals read 0 for an empty bucket; averages and extremes read null
+ZERO_FILLED_METRICS = {'entries', 'count', 'quantity', 'spending'}
+
+
+def bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(day, bucket):
+    if bucket == 'week':
+        return day + timedelta(days=7)
+    if bucket == 'month':
+        return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+    return day + timedelta(days=1)
+
+
+def _bucket_expression(bucket):
+    if bucket == 'week':
+        return TruncWeek('date', output_field=DateField())
+    if bucket == 'month':
+        return TruncMonth('date', output_field=DateField())
+    return F('date')
+
+
+def _parse_date(query_params, name, default):
+    value = query_params.get(name)
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValidationError({name: 'Expected a YYYY-MM-DD date'})
+
+
+def series_params(query_params, available_metrics, default_metrics):
+    """
+    Validate bucket/metrics/start_date/end_date and return
+    (bucket, metrics, first bucket start, end date)
+    """
+    bucket = query_params.get('bucket', 'day')
+    if bucket not in BUCKETS:
+        raise ValidationError({'bucket': f'Expected one of {", ".join(BUCKETS)}'})
+
+    requested = query_params.get('metrics')
+    metrics = [m.strip() for m in requested.split(',') if m.strip()] if requested else default_metrics
+    unknown = [m for m in metrics if m not in available_metrics]
+    if unknown or not metrics:
+        raise ValidationError({'metrics': f'Available metrics: {", ".join(available_metrics)}'})
+
+    end = _parse_date(query_params, 'end_date', timezone.now().date())
+    start = _parse_date(query_params, 'start_date', end - timedelta(days=DEFAULT_SPAN_DAYS[bucket] - 1))
+    if start > end:
+        raise ValidationError({'start_date': 'start_date is after end_date'})
+
+    start = bucket_start(start, bucket)
+    max_days = MAX_BUCKETS * {'day': 1, 'week': 7, 'month': 31}[bucket]
+    if (end - start).days >= max_days:
+        raise ValidationError({'start_date': f'At most {MAX_BUCKETS} {bucket} buckets per request'})
+    return bucket, list(dict.fromkeys(metrics)), start, end
+
+
+def _compact(value):
+    if isinstance(value, float):
+        return round(value, 3)
+    return value
+
+
+def build_series(queryset, query_params, available_metrics, default_metrics):
+    """
+    queryset: rows of one user with a `date` column; filtered to the
+    requested range here
+    """
+    bucket, metrics, start, end = series_params(query_params, available_metrics, default_metrics)
+
+    rows = (
+        queryset.filter(date__gte=start, date__lte=end)
+        .annotate(bucket=_bucket_expression(bucket))
+        .values('bucket')
+        .annotate(**{metric: available_metrics[metric]() for metric in metrics})
+        .order_by('bucket')
+    )
+    by_bucket = {row['bucket']: row for row in rows}
+
+    labels = []
+    series = {metric: [] for metric in metrics}
+    day = start
+    while day <= end:
+        labels.append(day.isoformat())
+        row = by_bucket.get(day)
+        for metric in metrics:
+            if row:
+                series[metric].append(_compact(row[metric]))
+            else:
+                series[metric].append(0 if metric in ZERO_FILLED_METRICS else None)
+        day = _next_bucket(day, bucket)
+
+    return {
+        'bucket': bucket,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'labels': labels,
+        'series': series,
+    }
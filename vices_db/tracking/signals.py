@@ -0,0 +1,92 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import Signal, receiver
+from .models import JournalEntry
+from .rollups import refresh_daily_rollups
+from .stats_engine import record_entries, update_entry, remove_entry
+from .tags import index_entry_tags
+
+# bulk_create() skips post_save, so batch writers send this instead.
+# Sent with sender=JournalEntry, user_id and the list of created entries.
+journal_entries_bulk_created = Signal()
+# Sent with sender=ConsumptionEvent, user_id and the list of created events.
+consumption_events_bulk_created = Signal()
+
+
+# Fields stashed before an update, and the ones each derived table reads
+PREVIOUS_FIELDS = ('date', 'substance', 'mood', 'sleep_quality', 'sleep', 'tags')
+ROLLUP_INPUTS = ('date', 'substance', 'mood', 'sleep_quality', 'sleep')
+STATS_INPUTS = ('date', 'substance', 'mood', 'sleep_quality')
+TAG_INPUTS = ('date', 'substance', 'mood', 'tags')
+
+
+@receiver(pre_save, sender=JournalEntry)
+def remember_previous_values(sender, instance, **kwargs):
+    """
+    Stash the values an entry had before an update, so derived data is only
+    recomputed when its inputs changed and the old rollup row can be
+    corrected when the entry moves to another day/substance
+    """
+    instance._previous_values = None
+    instance._previous_rollup_key = None
+    if instance.pk:
+        instance._previous_values = (
+            JournalEntry.objects.filter(pk=instance.pk)
+            .values(*PREVIOUS_FIELDS)
+            .first()
+        )
+    if instance._previous_values:
+        instance._previous_rollup_key = (
+            instance._previous_values['date'], instance._previous_values['substance']
+        )
+
+
+def _changed(instance, fields):
+    previous = getattr(instance, '_previous_values', None)
+    if previous is None:
+        return True
+    return any(
+        JournalEntry._meta.get_field(field).to_python(getattr(instance, field)) != previous[field]
+        for field in fields
+    )
+
+
+@receiver(post_save, sender=JournalEntry)
+def update_rollups_on_save(sender, instance, created, **kwargs):
+    if not created and not _changed(instance, ROLLUP_INPUTS):
+        return
+    keys = {(instance.date, instance.substance)}
+    if getattr(instance, '_previous_rollup_key', None):
+        keys.add(instance._previous_rollup_key)
+    refresh_daily_rollups(instance.user_id, keys)
+
+
+@receiver(post_delete, sender=JournalEntry)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    refresh_daily_rollups(instance.user_id, {(instance.date, instance.substance)})
+
+
+@receiver(post_save, sender=JournalEntry)
+def update_stats_on_save(sender, instance, created, **kwargs):
+    if created:
+        record_entries(instance.user_id, [instance])
+    elif _changed(instance, STATS_INPUTS):
+        update_entry(instance.user_id, instance, getattr(instance, '_previous_values', None))
+
+
+@receiver(post_save, sender=JournalEntry)
+def update_tag_index_on_save(sender, instance, created, **kwargs):
+    # Deletes cascade through the JournalTag.entry foreign key
+    if created or _changed(instance, TAG_INPUTS):
+        index_entry_tags([instance], replace=not created)
+
+
+@receiver(post_delete, sender=JournalEntry)
+def update_stats_on_delete(sender, instance, **kwargs):
+    remove_entry(instance.user_id, instance)
+
+
+@receiver(journal_entries_bulk_created, sender=JournalEntry)
+def update_derived_data_on_bulk_create(sender, user_id, entries, **kwargs):
+    refresh_daily_rollups(user_id, {(entry.date, entry.substance) for entry in entries})
+    record_entries(user_id, entries)
+    index_entry_tags(entries)
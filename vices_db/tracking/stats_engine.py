@@ -0,0 +1,255 @@
+"""
+Incremental maintenance of tracking.Stats.
+
+Every journal entry is folded into the user's Stats row in O(1): running sums
+for the averages, two exponentially weighted moving averages of mood for the
+trend and an EWMA of sleep quality against a baseline of the first entries
+for sleep improvement. Mindful days and streaks are copied from the user's
+'mindful' streak (tracking.streaks).
+
+Entries must be folded in (date, timestamp) order. Creates for the current
+latest day or later take the O(1) path. An EWMA is linear in its inputs, so
+an edit that keeps the entry's date swaps its old values out by their weight,
+which only needs the number of entries after it, and deleting the latest
+entry reverses its last step. Back-dated creates and deletes and edits that
+move an entry to another day replay the user's whole history, O(entries).
+"""
+from django.db import transaction
+from django.db.models import DateField, Q
+from sync.versioning import bump_data_version
+from .models import JournalEntry, Stats
+from .streaks import record_days, rebuild_user_streaks
+
+
+FAST_ALPHA = 0.3
+SLOW_ALPHA = 0.05
+BASELINE_ENTRIES = 7
+TREND_THRESHOLD = 0.5
+
+RESET_VALUES = {
+    'mindful_days': 0,
+    'sleep_quality': 0,
+    'sleep_improvement': 0,
+    'mood_average': 0,
+    'mood_trend': 'stable',
+    'entry_count': 0,
+    'mood_sum': 0,
+    'sleep_quality_sum': 0,
+    'mood_ewma_fast': None,
+    'mood_ewma_slow': None,
+    'sleep_quality_ewma': None,
+    'sleep_baseline_sum': 0,
+    'sleep_baseline_count': 0,
+    'last_entry_date': None,
+    'current_streak': 0,
+    'longest_streak': 0,
+}
+
+
+def _ewma(previous, value, alpha):
+    if previous is None:
+        return value
+    return previous + alpha * (value - previous)
+
+
+def _unapply_ewma(current, value, alpha):
+    # Inverse of the last _ewma() step
+    return (current - alpha * value) / (1 - alpha)
+
+
+def _ewma_weight(alpha, later, first):
+    """
+    Weight of one input in an EWMA that took `later` inputs after it
+    """
+    return (1 - alpha) ** later * (1 if first else alpha)
+
+
+def _apply_streaks(stats, streaks):
+    mindful = streaks['mindful']
+    stats.mindful_days = mindful.total_days
+    stats.current_streak = mindful.current
+    stats.longest_streak = mindful.longest
+
+
+def apply_entry(stats, entry_date, mood, sleep_quality):
+    """
+    Fold one journal entry into the running state, O(1)
+    """
+    stats.entry_count += 1
+    stats.mood_sum += mood
+    stats.sleep_quality_sum += sleep_quality
+    stats.mood_ewma_fast = _ewma(stats.mood_ewma_fast, mood, FAST_ALPHA)
+    stats.mood_ewma_slow = _ewma(stats.mood_ewma_slow, mood, SLOW_ALPHA)
+    stats.sleep_quality_ewma = _ewma(stats.sleep_quality_ewma, sleep_quality, FAST_ALPHA)
+    if stats.sleep_baseline_count < BASELINE_ENTRIES:
+        stats.sleep_baseline_sum += sleep_quality
+        stats.sleep_baseline_count += 1
+
+    stats.last_entry_date = entry_date
+    _derive(stats)
+
+
+def _derive(stats):
+    if not stats.entry_count:
+        return
+    stats.mood_average = stats.mood_sum / stats.entry_count
+    stats.sleep_quality = stats.sleep_quality_sum / stats.entry_count
+    baseline = stats.sleep_baseline_sum / stats.sleep_baseline_count
+    stats.sleep_improvement = stats.sleep_quality_ewma - baseline
+
+    momentum = stats.mood_ewma_fast - stats.mood_ewma_slow
+    if momentum > TREND_THRESHOLD:
+        stats.mood_trend = 'improving'
+    elif momentum < -TREND_THRESHOLD:
+        stats.mood_trend = 'declining'
+    else:
+        stats.mood_trend = 'stable'
+
+
+def _locked_stats(user_id):
+    # get_or_create inserts in a savepoint and re-reads (and waits on the lock)
+    # when a concurrent writer created the row first
+    stats, _ = Stats.objects.select_for_update().get_or_create(user_id=user_id)
+    return stats
+
+
+def _replay(stats, user_id):
+    for field, value in RESET_VALUES.items():
+        setattr(stats, field, value)
+
+    entries = (
+        JournalEntry.objects.filter(user_id=user_id)
+        .order_by('date', 'timestamp', 'id')
+        .values_list('date', 'mood', 'sleep_quality')
+    )
+    for entry_date, mood, sleep_quality in entries.iterator(chunk_size=2000):
+        apply_entry(stats, entry_date, mood, sleep_quality)
+
+    _apply_streaks(stats, rebuild_user_streaks(user_id))
+    stats.save()
+    return stats
+
+
+def rebuild_user_stats(user_id):
+    """
+    Replay a user's whole journal into a fresh Stats row
+    """
+    with transaction.atomic():
+        return _replay(_locked_stats(user_id), user_id)
+
+
+def record_entries(user_id, entries):
+    """
+    Fold newly created entries into the user's Stats. Falls back to a replay
+    when any entry is dated before the latest day already folded in, or when
+    nothing was folded in yet (the journal may predate the Stats row).
+    """
+    to_date = DateField().to_python
+    entries = sorted(
+        ((to_date(e.date), e.timestamp, e.id, e.mood, e.sleep_quality) for e in entries),
+        key=lambda e: e[:3]
+    )
+    if not entries:
+        return None
+
+    with transaction.atomic():
+        stats = _locked_stats(user_id)
+        if not stats.last_entry_date or entries[0][0] < stats.last_entry_date:
+            return _replay(stats, user_id)
+
+        for entry_date, _, _, mood, sleep_quality in entries:
+            apply_entry(stats, entry_date, mood, float(sleep_quality))
+        _apply_streaks(stats, record_days(user_id, [e[0] for e in entries]))
+        stats.save()
+        return stats
+
+
+def _entries_after(user_id, entry_date, timestamp, entry_id):
+    return JournalEntry.objects.filter(user_id=user_id).filter(
+        Q(date__gt=entry_date) |
+        Q(date=entry_date, timestamp__gt=timestamp) |
+        Q(date=entry_date, timestamp=timestamp, id__gt=entry_id)
+    ).count()
+
+
+def update_entry(user_id, entry, previous):
+    """
+    Fold an edit of one entry into the user's Stats. previous holds the
+    entry's date, substance, mood and sleep_quality before the save (None
+    when unknown). Replays when the entry moved to another day.
+    """
+    if previous is None or DateField().to_python(entry.date) != previous['date']:
+        return rebuild_user_stats(user_id)
+
+    with transaction.atomic():
+        stats = _locked_stats(user_id)
+        later = _entries_after(user_id, previous['date'], entry.timestamp, entry.id)
+        position = stats.entry_count - 1 - later
+        if position < 0:
+            return _replay(stats, user_id)
+
+        mood_delta = entry.mood - previous['mood']
+        sleep_quality_delta = float(entry.sleep_quality) - previous['sleep_quality']
+        first = position == 0
+        stats.mood_sum += mood_delta
+        stats.sleep_quality_sum += sleep_quality_delta
+        stats.mood_ewma_fast += _ewma_weight(FAST_ALPHA, later, first) * mood_delta
+        stats.mood_ewma_slow += _ewma_weight(SLOW_ALPHA, later, first) * mood_delta
+        stats.sleep_quality_ewma += _ewma_weight(FAST_ALPHA, later, first) * sleep_quality_delta
+        if position < BASELINE_ENTRIES:
+            stats.sleep_baseline_sum += sleep_quality_delta
+
+        if entry.substance != previous['substance']:
+            _apply_streaks(stats, rebuild_user_streaks(user_id))
+        _derive(stats)
+        stats.save()
+        return stats
+
+
+def remove_entry(user_id, entry):
+    """
+    Take a deleted entry out of the user's Stats. Replays unless it was the
+    latest entry.
+    """
+    entry_date = DateField().to_python(entry.date)
+    with transaction.atomic():
+        stats = _locked_stats(user_id)
+        latest = (
+            stats.entry_count > 1 and entry_date == stats.last_entry_date and
+            not _entries_after(user_id, entry_date, entry.timestamp, entry.id)
+        )
+        if not latest:
+            return _replay(stats, user_id)
+
+        mood, sleep_quality = entry.mood, float(entry.sleep_quality)
+        stats.entry_count -= 1
+        stats.mood_sum -= mood
+        stats.sleep_quality_sum -= sleep_quality
+        stats.mood_ewma_fast = _unapply_ewma(stats.mood_ewma_fast, mood, FAST_ALPHA)
+        stats.mood_ewma_slow = _unapply_ewma(stats.mood_ewma_slow, mood, SLOW_ALPHA)
+        stats.sleep_quality_ewma = _unapply_ewma(stats.sleep_quality_ewma, sleep_quality, FAST_ALPHA)
+        if stats.entry_count < BASELINE_ENTRIES:
+            stats.sleep_baseline_sum -= sleep_quality
+            stats.sleep_baseline_count -= 1
+        stats.last_entry_date = (
+            JournalEntry.objects.filter(user_id=user_id)
+            .order_by('-date').values_list('date', flat=True).first()
+        )
+
+        # The day's remaining entries may now qualify for a streak
+        _apply_streaks(stats, rebuild_user_streaks(user_id))
+        _derive(stats)
+        stats.save()
+        return stats
+
+
+def rebuild_stats_chunk(user_ids):
+    """
+    Process pool worker for the rebuild_stats command. Bumps the data version
+    of each user, as nothing was written to their journal.
+    """
+    for user_id in user_ids:
+        with transaction.atomic():
+            rebuild_user_stats(user_id)
+            bump_data_version(user_id)
+    return len(user_ids)
@@ -0,0 +1,211 @@
+"""
+Current and longest streaks, as gaps-and-islands over the daily rollups.
+
+A day counts for a streak kind when every entry logged on it qualifies
+(e.g. only 'none'/'wellness' for mindful). A streak is a run of consecutive
+calendar days that count; a day without entries breaks it, and the current
+streak is the run ending on the latest logged day. Nothing logged since
+yesterday lapses it, which current_run() applies when the cached rows are read.
+
+rebuild_user_streaks() finds every island in one statement: qualifying days
+numbered with ROW_NUMBER() are subtracted from their day number, which is
+constant within a run of consecutive days. Results are cached in Streak
+rows; record_days() extends them in O(1) when entries are added for the
+latest day or later, and falls back to a rebuild otherwise.
+"""
+from datetime import date, timedelta
+from django.db import connection, transaction
+from django.db.models import DateField
+from django.utils import timezone
+from .models import JournalDailyRollup, Streak
+
+MINDFUL_SUBSTANCES = ('none', 'wellness')
+
+# kind: substances that keep a day in the streak
+STREAK_KINDS = {
+    'mindful': MINDFUL_SUBSTANCES,
+    'alcohol_free': ('cannabis', 'none', 'wellness'),
+    'cannabis_free': ('alcohol', 'none', 'wellness'),
+}
+
+STREAK_SQL = """
+    WITH days AS (
+        SELECT date, {flags}
+        FROM tracking_journaldailyrollup
+        WHERE user_id = %s
+        GROUP BY date
+    ),
+    qualifying AS (
+        {qualifying}
+    ),
+    islands AS (
+        SELECT kind, date, {day_number} - ROW_NUMBER() OVER (PARTITION BY kind ORDER BY date) AS island
+        FROM qualifying
+    )
+    SELECT kind, MIN(date), MAX(date), COUNT(*) FROM islands GROUP BY kind, island
+    UNION ALL
+    SELECT NULL, MIN(date), MAX(date), COUNT(*) FROM days
+"""
+
+STREAK_FIELDS = [
+    'current', 'current_start', 'longest', 'longest_start', 'longest_end',
+    'total_days', 'last_logged_date', 'last_day_qualifies',
+]
+
+
+def _streak_sql():
+    flags = ', '.join(
+        f'MIN(CASE WHEN substance IN ({", ".join(["%s"] * len(substances))}) THEN 1 ELSE 0 END) AS {kind}'
+        for kind, substances in STREAK_KINDS.items()
+    )
+    qualifying = ' UNION ALL '.join(
+        f"SELECT '{kind}' AS kind, date FROM days WHERE {kind} = 1" for kind in STREAK_KINDS
+    )
+    if connection.vendor == 'postgresql':
+        day_number = "(date - DATE '2000-01-01')"
+    else:
+        day_number = 'CAST(julianday(date) AS INTEGER)'
+    params = [substance for substances in STREAK_KINDS.values() for substance in substances]
+    return STREAK_SQL.format(flags=flags, qualifying=qualifying, day_number=day_number), params
+
+
+def _as_date(value):
+    # SQLite hands back raw SQL results as ISO strings
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def compute_streaks(user_id):
+    """
+    {kind: {field: value}} for every kind in STREAK_KINDS, from the rollups
+    """
+    sql, params = _streak_sql()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [user_id])
+        rows = [(kind, _as_date(start), _as_date(end), count) for kind, start, end, count in cursor.fetchall()]
+
+    last_logged = next((end for kind, _, end, _ in rows if kind is None), None)
+    streaks = {}
+    for kind in STREAK_KINDS:
+        islands = [(start, end, count) for k, start, end, count in rows if k == kind]
+        # Ties go to the most recent run
+        longest = max(islands, key=lambda island: (island[2], island[0]), default=(None, None, 0))
+        current = next((island for island in islands if island[1] == last_logged), (None, None, 0))
+        streaks[kind] = {
+            'current': current[2],
+            'current_start': current[0],
+            'longest': longest[2],
+            'longest_start': longest[0],
+            'longest_end': longest[1],
+            'total_days': sum(count for _, _, count in islands),
+            'last_logged_date': last_logged,
+            'last_day_qualifies': current[2] > 0,
+        }
+    return streaks
+
+
+def rebuild_user_streaks(user_id):
+    """
+    Recompute and store every streak of one user; returns {kind: Streak}
+    """
+    streaks = [
+        Streak(user_id=user_id, kind=kind, **values)
+        for kind, values in compute_streaks(user_id).items()
+    ]
+    Streak.objects.bulk_create(
+        streaks,
+        update_conflicts=True,
+        unique_fields=['user', 'kind'],
+        update_fields=STREAK_FIELDS + ['updated_at'],
+    )
+    return {streak.kind: streak for streak in streaks}
+
+
+def _extend(streak, day, qualifies):
+    """
+    Fold a day after streak.last_logged_date into the streak, O(1)
+    """
+    if qualifies:
+        continues = (
+            streak.last_day_qualifies and
+            streak.last_logged_date == day - timedelta(days=1)
+        )
+        if continues:
+            streak.current += 1
+        else:
+            streak.current = 1
+            streak.current_start = day
+        streak.total_days += 1
+        if streak.current >= streak.longest:
+            streak.longest = streak.current
+            streak.longest_start = streak.current_start
+            streak.longest_end = day
+    else:
+        streak.current = 0
+        streak.current_start = None
+    streak.last_logged_date = day
+    streak.last_day_qualifies = qualifies
+
+
+def record_days(user_id, days):
+    """
+    Update the cached streaks after entries were added on the given days.
+    Call after the day's rollups are refreshed. Returns {kind: Streak}.
+    """
+    to_date = DateField().to_python
+    days = sorted({to_date(day) for day in days})
+    if not days:
+        return get_user_streaks(user_id)
+
+    with transaction.atomic():
+        streaks = {s.kind: s for s in Streak.objects.select_for_update().filter(user_id=user_id)}
+        if set(streaks) != set(STREAK_KINDS):
+            return rebuild_user_streaks(user_id)
+        last_logged = next(iter(streaks.values())).last_logged_date
+        if last_logged and days[0] < last_logged:
+            return rebuild_user_streaks(user_id)
+
+        substances = {}
+        for day, substance in JournalDailyRollup.objects.filter(
+            user_id=user_id, date__in=days
+        ).values_list('date', 'substance'):
+            substances.setdefault(day, set()).add(substance)
+
+        now = timezone.now()
+        for day in days:
+            if day not in substances:
+                continue
+            for kind, allowed in STREAK_KINDS.items():
+                streak = streaks[kind]
+                qualifies = substances[day] <= set(allowed)
+                if day == streak.last_logged_date:
+                    # An added entry can only stop a day from counting,
+                    # which may shorten runs already folded in
+                    if streak.last_day_qualifies and not qualifies:
+                        return rebuild_user_streaks(user_id)
+                    continue
+                _extend(streak, day, qualifies)
+
+        for streak in streaks.values():
+            # bulk_update() does not apply auto_now
+            streak.updated_at = now
+        Streak.objects.bulk_update(streaks.values(), STREAK_FIELDS + ['updated_at'])
+        return streaks
+
+
+def current_run(streak, today):
+    """
+    (current, current_start) of a cached streak as of today
+    """
+    if streak.last_logged_date is None or streak.last_logged_date < today - timedelta(days=1):
+        return 0, None
+    return streak.current, streak.current_start
+
+
+def get_user_streaks(user_id):
+    """
+    Cached streaks of one user, built on first use
+    """
+    streaks = {s.kind: s for s in Streak.objects.filter(user_id=user_id)}
+    if set(streaks) != set(STREAK_KINDS):
+        streaks = rebuild_user_streaks(user_id)
+    return streaks
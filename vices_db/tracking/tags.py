@@ -0,0 +1,69 @@
+from django.db import transaction
+from django.db.models import Avg, Count
+from .models import JournalEntry, JournalTag
+
+TAG_MAX_LENGTH = 50
+
+
+def normalize_tag(tag):
+    return tag.strip().lower()[:TAG_MAX_LENGTH]
+
+
+def normalize_tags(tags):
+    """
+    Lowercased, stripped, de-duplicated string tags in their original order
+    """
+    normalized = []
+    for tag in tags if isinstance(tags, list) else []:
+        if not isinstance(tag, str):
+            continue
+        tag = normalize_tag(tag)
+        if tag and tag not in normalized:
+            normalized.append(tag)
+    return normalized
+
+
+def _tag_rows(entries):
+    return [
+        JournalTag(
+            user_id=entry.user_id,
+            entry_id=entry.id,
+            tag=tag,
+            date=entry.date,
+            substance=entry.substance,
+            mood=entry.mood,
+        )
+        for entry in entries
+        for tag in normalize_tags(entry.tags)
+    ]
+
+
+def index_entry_tags(entries, replace=False):
+    """
+    Write the tag index rows for the given entries. With replace=True the
+    entries' existing rows are dropped first (for updates).
+    """
+    with transaction.atomic():
+        if replace:
+            JournalTag.objects.filter(entry__in=[entry.id for entry in entries]).delete()
+        JournalTag.objects.bulk_create(_tag_rows(entries), batch_size=1000)
+
+
+def rebuild_user_tags(user_id):
+    with transaction.atomic():
+        JournalTag.objects.filter(user_id=user_id).delete()
+        entries = JournalEntry.objects.filter(user_id=user_id).only(
+            'id', 'user_id', 'date', 'substance', 'mood', 'tags'
+        )
+        JournalTag.objects.bulk_create(_tag_rows(entries.iterator(chunk_size=2000)), batch_size=1000)
+
+
+def top_tags(tag_queryset, limit=5):
+    """
+    Most frequent tags with the average mood of the entries carrying them
+    """
+    return list(
+        tag_queryset.values('tag')
+        .annotate(count=Count('id'), avg_mood=Avg('mood'))
+        .order_by('-count', 'tag')[:limit]
+    )
@@ -1,3 +1,734 @@
+import csv
+import io
+import json
+from datetime import date, timedelta
+from unittest import mock, skipIf, skipUnless
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Avg, Count, Sum
+from django.http import QueryDict
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import User
+from .benchmarks import build_benchmarks, user_percentiles
+from .cache import analytics_cache_key
+from .correlations import MIN_PAIRED_DAYS
+from .exports import CONSUMPTION_EXPORT_FIELDS, JOURNAL_EXPORT_FIELDS
+from .models import CohortBenchmark, JournalEntry, JournalDailyRollup, ConsumptionEvent, Stats
+from .partitions import ensure_month_partitions, existing_partitions, months_between, partition_name, partitioned
+from .rollups import ROLLUP_AGGREGATES
+from .signals import journal_entries_bulk_created
+from .stats_engine import rebuild_user_stats
+from .streaks import STREAK_FIELDS, compute_streaks, get_user_streaks
 
-# Create your tests here.
+
+class AnalyticsRoundTripTests(TestCase):
+    """
+    Each analytics endpoint reads its window in one statement; the extra
+    query is the user's data version (ETag and cache stamp).
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='analytics', email='analytics@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        today = timezone.now().date()
+        for day in range(10):
+            for substance, mood in (('alcohol', 4), ('none', 7), ('cannabis', 6)):
+                JournalEntry.objects.create(
+                    user=self.user, date=today - timedelta(days=day), substance=substance,
+                    amount='1', mood=mood + day % 3, sleep_quality=5 + day % 4, tags=['calm']
+                )
+        ConsumptionEvent.objects.bulk_create([
+            ConsumptionEvent(
+                user=self.user, date=today - timedelta(days=day), vice_type=vice_type,
+                quantity=day + 1, spending=10 * day, location=location, time_of_day='evening',
+                mood_before=5, mood_after=5 + day % 3
+            )
+            for day in range(12)
+            for vice_type, location in (('alcohol', 'bar'), ('cannabis', 'home'))
+        ])
+
+    def test_mood_trends_is_one_statement(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/tracking/journal/mood_trends/')
+        self.assertEqual(response.status_code, 200)
+
+        entries = JournalEntry.objects.filter(user=self.user)
+        self.assertAlmostEqual(response.data['overall_mood'], entries.aggregate(Avg('mood'))['mood__avg'])
+        expected = list(
+            entries.values('substance').annotate(avg_mood=Avg('mood'), count=Count('id')).order_by('substance')
+        )
+        self.assertEqual(len(response.data['mood_by_substance']), len(expected))
+        for row, want in zip(response.data['mood_by_substance'], expected):
+            self.assertEqual(row['substance'], want['substance'])
+            self.assertEqual(row['count'], want['count'])
+            self.assertAlmostEqual(row['avg_mood'], want['avg_mood'])
+
+    def test_insights_reads_rollups_and_tags_once_each(self):
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/tracking/insights/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_entries'], 30)
+        self.assertEqual(
+            [(row['substance'], row['count']) for row in response.data['substance_breakdown']],
+            [('alcohol', 10), ('cannabis', 10), ('none', 10)]
+        )
+        self.assertEqual(response.data['common_tags'][0]['tag'], 'calm')
+
+    def test_consumption_analysis_is_one_statement(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/tracking/consumption/analysis/', {'timeframe': 30})
+        self.assertEqual(response.status_code, 200)
+
+        events = ConsumptionEvent.objects.filter(user=self.user)
+        self.assertEqual(response.data['total_spending'], events.aggregate(Sum('spending'))['spending__sum'])
+        by_type = {row['vice_type']: row for row in response.data['consumption_by_type']}
+        self.assertEqual(by_type['alcohol']['count'], 12)
+        self.assertEqual(by_type['cannabis']['total_quantity'], sum(range(1, 13)))
+        self.assertAlmostEqual(by_type['alcohol']['avg_mood_impact'], 1.0)
+        self.assertEqual(response.data['time_of_day_breakdown'][0]['count'], 24)
+        self.assertEqual({row['location'] for row in response.data['location_analysis']}, {'bar', 'home'})
+
+    def test_cache_hit_only_reads_the_data_version(self):
+        self.client.get('/api/tracking/journal/mood_trends/')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/tracking/journal/mood_trends/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_stale_result_keeps_its_own_etag(self):
+        url = '/api/tracking/journal/mood_trends/'
+        fresh = self.client.get(url)
+        JournalEntry.objects.create(user=self.user, date=timezone.now().date(), substance='both',
+                                    amount='1', mood=1, sleep_quality=1)
+
+        # Another request is refreshing the entry
+        lock_key = analytics_cache_key(self.user.id, 'mood_trends', QueryDict()) + ':refresh'
+        cache.add(lock_key, 1)
+        stale = self.client.get(url)
+        self.assertEqual(stale['X-Cache'], 'STALE')
+        self.assertEqual(stale['ETag'], fresh['ETag'])
+
+        cache.delete(lock_key)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=stale['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertNotEqual(response['ETag'], stale['ETag'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+
+class RollupConsistencyTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='rollups', email='rollups@example.com')
+        self.today = timezone.now().date()
+
+    def assertRollupsMatchJournal(self):
+        expected = {
+            (row['date'], row['substance']): (row['entry_count'], row['mood_sum'], row['sleep_quality_sum'])
+            for row in JournalEntry.objects.filter(user=self.user).values('date', 'substance')
+            .annotate(**ROLLUP_AGGREGATES).order_by()
+        }
+        actual = {
+            (date, substance): (entry_count, mood_sum, sleep_quality_sum)
+            for date, substance, entry_count, mood_sum, sleep_quality_sum in
+            JournalDailyRollup.objects.filter(user=self.user).values_list(
+                'date', 'substance', 'entry_count', 'mood_sum', 'sleep_quality_sum'
+            )
+        }
+        self.assertEqual(actual, expected)
+
+    def entry(self, days_ago, substance, mood):
+        return JournalEntry.objects.create(
+            user=self.user, date=self.today - timedelta(days=days_ago), substance=substance,
+            amount='1', mood=mood, sleep_quality=mood
+        )
+
+    def test_rollups_follow_creates_updates_and_deletes(self):
+        first = self.entry(0, 'alcohol', 4)
+        self.entry(0, 'alcohol', 6)
+        moved = self.entry(1, 'none', 8)
+        self.assertRollupsMatchJournal()
+
+        # Moves to another day and substance: both rows are corrected
+        moved.date, moved.substance, moved.mood = self.today, 'alcohol', 2
+        moved.save()
+        self.assertRollupsMatchJournal()
+        self.assertFalse(JournalDailyRollup.objects.filter(user=self.user, substance='none').exists())
+
+        first.delete()
+        self.assertRollupsMatchJournal()
+        self.assertEqual(JournalDailyRollup.objects.get(user=self.user).entry_count, 2)
+
+
+class StatsEngineTests(TestCase):
+    """
+    The incremental Stats must always equal a replay of the whole journal
+    """
+
+    STATS_FIELDS = (
+        'entry_count', 'mood_sum', 'sleep_quality_sum', 'mood_average', 'sleep_quality',
+        'sleep_improvement', 'mood_trend', 'last_entry_date', 'mindful_days',
+        'current_streak', 'longest_streak',
+    )
+
+    def setUp(self):
+        self.user = User.objects.create(username='stats', email='stats@example.com')
+        self.today = timezone.now().date()
+
+    def assertStatsMatchReplay(self):
+        stats = Stats.objects.get(user=self.user)
+        replayed = rebuild_user_stats(self.user.id)
+        for field in self.STATS_FIELDS:
+            incremental, expected = getattr(stats, field), getattr(replayed, field)
+            if isinstance(expected, float):
+                # Edits and deletes adjust the EWMAs in place
+                self.assertAlmostEqual(incremental, expected, places=9, msg=field)
+            else:
+                self.assertEqual(incremental, expected, field)
+        return stats
+
+    def entry(self, days_ago, substance, mood, sleep_quality):
+        return JournalEntry.objects.create(
+            user=self.user, date=self.today - timedelta(days=days_ago), substance=substance,
+            amount='1', mood=mood, sleep_quality=sleep_quality
+        )
+
+    def test_stats_follow_creates_updates_and_deletes(self):
+        self.entry(3, 'none', 6, 7)
+        self.entry(1, 'alcohol', 3, 4)
+        self.assertEqual(self.assertStatsMatchReplay().last_entry_date, self.today - timedelta(days=1))
+
+        # Back-dated: replayed in date order, the latest day stays
+        backdated = self.entry(2, 'wellness', 8, 9)
+        stats = self.assertStatsMatchReplay()
+        self.assertEqual((stats.entry_count, stats.mindful_days), (3, 2))
+        self.assertEqual(stats.last_entry_date, self.today - timedelta(days=1))
+
+        backdated.mood, backdated.substance = 2, 'alcohol'
+        backdated.save()
+        stats = self.assertStatsMatchReplay()
+        self.assertAlmostEqual(stats.mood_average, (6 + 3 + 2) / 3)
+        self.assertEqual(stats.mindful_days, 1)
+
+        backdated.delete()
+        stats = self.assertStatsMatchReplay()
+        self.assertEqual(stats.entry_count, 2)
+        self.assertAlmostEqual(stats.sleep_quality, (7 + 4) / 2)
+
+    def test_edits_and_latest_deletes_are_not_replayed(self):
+        entries = [self.entry(days_ago, 'none', 5 + days_ago % 3, 6) for days_ago in range(10, 0, -1)]
+        with mock.patch('tracking.stats_engine._replay') as replay:
+            # First, inside the sleep baseline, after it and the latest entry
+            for entry, mood in zip((entries[0], entries[5], entries[-1]), (9, 2, 8)):
+                entry.mood, entry.sleep_quality = mood, mood
+                entry.save()
+            entries[2].substance = 'alcohol'
+            entries[2].save()
+            entries[-1].delete()
+        replay.assert_not_called()
+        stats = self.assertStatsMatchReplay()
+        self.assertEqual((stats.entry_count, stats.mindful_days), (9, 8))
+        self.assertEqual(stats.last_entry_date, self.today - timedelta(days=2))
+
+        # Moved to another day or deleted before the latest: replayed
+        entries[3].date = self.today
+        entries[3].save()
+        self.assertStatsMatchReplay()
+        entries[4].delete()
+        self.assertEqual(self.assertStatsMatchReplay().entry_count, 8)
+
+    def test_saves_without_changed_inputs_skip_derived_data(self):
+        entry = self.entry(1, 'none', 6, 7)
+        entry.notes = 'Only the notes changed'
+        with mock.patch('tracking.signals.update_entry') as update_entry, \
+                mock.patch('tracking.signals.refresh_daily_rollups') as refresh, \
+                mock.patch('tracking.signals.index_entry_tags') as index_tags:
+            entry.save()
+        update_entry.assert_not_called()
+        refresh.assert_not_called()
+        index_tags.assert_not_called()
+
+    def test_stats_row_created_by_a_concurrent_writer(self):
+        raced = []
+
+        def other_writer(execute, sql, params, many, context):
+            result = execute(sql, params, many, context)
+            # Inserts the row right after this writer found none
+            if not raced and sql.startswith('SELECT') and '"tracking_stats"' in sql:
+                raced.append(True)
+                Stats.objects.create(user=self.user)
+            return result
+
+        with connection.execute_wrapper(other_writer):
+            self.entry(0, 'none', 7, 7)
+        self.assertTrue(raced)
+        self.assertEqual(self.assertStatsMatchReplay().entry_count, 1)
+
+    def test_journal_written_before_the_stats_row(self):
+        self.entry(2, 'none', 6, 7)
+        self.entry(1, 'alcohol', 3, 4)
+        Stats.objects.filter(user=self.user).delete()
+
+        self.entry(0, 'none', 8, 8)
+        self.assertEqual(self.assertStatsMatchReplay().entry_count, 3)
+
+    def test_bulk_entries_with_string_dates(self):
+        # ORM callers may leave ISO strings on the instances they bulk_create
+        entries = JournalEntry.objects.bulk_create([
+            JournalEntry(
+                user=self.user, date=(self.today - timedelta(days=days_ago)).isoformat(),
+                substance=substance, amount='1', mood=mood, sleep_quality=str(mood)
+            )
+            for days_ago, substance, mood in ((2, 'none', 6), (1, 'alcohol', 4), (0, 'none', 8))
+        ])
+        journal_entries_bulk_created.send(sender=JournalEntry, user_id=self.user.id, entries=entries)
+
+        stats = self.assertStatsMatchReplay()
+        self.assertEqual(stats.entry_count, 3)
+        self.assertEqual(stats.last_entry_date, self.today)
+        self.assertEqual(stats.mindful_days, 2)
+
+        # The next create compares its date with the stored one
+        JournalEntry.objects.create(
+            user=self.user, date=self.today, substance='none', amount='1', mood=7, sleep_quality=7
+        )
+        self.assertEqual(self.assertStatsMatchReplay().entry_count, 4)
+
+
+class JournalSearchTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='search', email='search@example.com')
+        other = User.objects.create(username='other', email='other@example.com')
+        today = timezone.now().date()
+        for user, notes in ((self.user, 'Slept badly after the party'), (self.user, 'Quiet evening'),
+                            (other, 'Party all night')):
+            JournalEntry.objects.create(
+                user=user, date=today, substance='alcohol', amount='1', mood=5, sleep_quality=5, notes=notes
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_search_only_returns_the_users_matches(self):
+        response = self.client.get('/api/tracking/journal/search/', {'q': 'party'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([hit['notes'] for hit in response.data['results']], ['Slept badly after the party'])
+        self.assertIsNone(response.data['next_page'])
+
+    def test_search_syntax_is_treated_as_words(self):
+        response = self.client.get('/api/tracking/journal/search/', {'q': '"party*'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_hits_deleted_before_they_are_loaded_are_skipped(self):
+        entry = JournalEntry.objects.get(user=self.user, notes='Quiet evening')
+        with mock.patch('tracking.views.search_journal', return_value=[(entry.id, 1.0), (entry.id + 1000, 0.5)]):
+            response = self.client.get('/api/tracking/journal/search/', {'q': 'quiet'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([hit['id'] for hit in response.data['results']], [entry.id])
+
+
+class TopTagsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='tags', email='tags@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        today = timezone.now().date()
+        for day, tags in enumerate((['calm', 'gym'], ['calm'], ['party'])):
+            JournalEntry.objects.create(
+                user=self.user, date=today - timedelta(days=day), substance='none',
+                amount='1', mood=5 + day, sleep_quality=5, tags=tags
+            )
+
+    def test_limit_is_clamped(self):
+        response = self.client.get('/api/tracking/journal/tags/', {'limit': '2'})
+        self.assertEqual([row['tag'] for row in response.data], ['calm', 'gym'])
+        self.assertEqual(response.data[0]['count'], 2)
+        self.assertAlmostEqual(response.data[0]['avg_mood'], 5.5)
+
+        for limit, expected in (('-1', 1), ('0', 1), ('1000', 3)):
+            response = self.client.get('/api/tracking/journal/tags/', {'limit': limit})
+            self.assertEqual(len(response.data), expected, limit)
+
+    def test_bad_numbers_are_rejected(self):
+        for params in ({'limit': 'ten'}, {'timeframe': '1.5'}):
+            self.assertEqual(self.client.get('/api/tracking/journal/tags/', params).status_code, 400)
+
+
+class JournalPaginationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='pages', email='pages@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        today = timezone.now().date()
+        # Several entries per day, so pages split inside a day
+        for day in range(4):
+            for mood in range(3):
+                JournalEntry.objects.create(
+                    user=self.user, date=today - timedelta(days=day), substance='none',
+                    amount='1', mood=mood + 1, sleep_quality=5
+                )
+
+    def test_pages_cover_the_journal_once_in_order(self):
+        ids = []
+        url = '/api/tracking/journal/?page_size=5'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 5)
+            ids += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+
+        expected = JournalEntry.objects.filter(user=self.user).order_by('-date', '-timestamp', 'id')
+        self.assertEqual(ids, list(expected.values_list('id', flat=True)))
+
+    def test_invalid_cursor_is_not_found(self):
+        for cursor in ('garbage', 'WyJ4Il0=', 'WzEsMiwzXQ=='):
+            response = self.client.get('/api/tracking/journal/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, cursor)
+
+
+class JournalBulkIngestTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='bulk', email='bulk@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.today = timezone.now().date().isoformat()
+
+    def item(self, client_id, mood=5):
+        return {'client_id': client_id, 'date': self.today, 'substance': 'none', 'amount': '1',
+                'mood': mood, 'sleep_quality': 6}
+
+    def test_duplicates_and_invalid_items_are_reported_per_item(self):
+        batch = [self.item('a'), self.item('b', mood=7), self.item('a'), self.item('c', mood='awful')]
+        response = self.client.post('/api/tracking/journal/bulk/', {'entries': batch}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual((response.data['created'], response.data['duplicates'], response.data['invalid']), (2, 1, 1))
+        statuses = [(r['index'], r['client_id'], r['status']) for r in response.data['results']]
+        self.assertEqual(statuses, [(0, 'a', 'created'), (1, 'b', 'created'), (2, 'a', 'duplicate'),
+                                    (3, 'c', 'invalid')])
+        self.assertEqual(response.data['results'][2]['id'], response.data['results'][0]['id'])
+        self.assertIn('mood', response.data['results'][3]['errors'])
+
+        # Derived data follows the batch
+        self.assertEqual(Stats.objects.get(user=self.user).entry_count, 2)
+        self.assertEqual(JournalDailyRollup.objects.get(user=self.user).entry_count, 2)
+
+        # A replayed batch stores nothing new
+        response = self.client.post('/api/tracking/journal/bulk/', batch[:2], format='json')
+        self.assertEqual((response.data['created'], response.data['duplicates']), (0, 2))
+        self.assertEqual(JournalEntry.objects.filter(user=self.user).count(), 2)
+
+    def test_bad_payloads_are_rejected(self):
+        response = self.client.post('/api/tracking/journal/bulk/', {'entries': 'a'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        with mock.patch('tracking.views.BULK_MAX_ENTRIES', 2):
+            response = self.client.post('/api/tracking/journal/bulk/', [self.item(str(i)) for i in range(3)],
+                                        format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='export', email='export@example.com')
+        other = User.objects.create(username='private', email='private@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        today = timezone.now().date()
+        for user in (self.user, other):
+            for day in range(3):
+                JournalEntry.objects.create(
+                    user=user, date=today - timedelta(days=day), substance='none', amount='1', mood=5,
+                    sleep_quality=5, notes='Long day, then\n"quiet" night', tags=['calm', 'home']
+                )
+            ConsumptionEvent.objects.bulk_create([
+                ConsumptionEvent(user=user, date=today - timedelta(days=day), vice_type=vice_type,
+                                 quantity=1, spending=5, location='home', time_of_day='evening')
+                for day in range(3) for vice_type in ('alcohol', 'cannabis')
+            ])
+
+    def stream(self, url, params=None):
+        response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        chunks = [chunk.decode('utf-8') for chunk in response.streaming_content]
+        return response, chunks
+
+    @mock.patch('tracking.exports.LINES_PER_WRITE', 2)
+    def test_journal_csv_streams_the_users_rows(self):
+        response, chunks = self.stream('/api/tracking/journal/export/csv/')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="journal.csv"')
+        # Header and 3 rows, 2 lines per chunk
+        self.assertEqual(len(chunks), 2)
+
+        rows = list(csv.reader(io.StringIO(''.join(chunks))))
+        self.assertEqual(rows[0], JOURNAL_EXPORT_FIELDS)
+        mine = set(JournalEntry.objects.filter(user=self.user).values_list('id', flat=True))
+        self.assertEqual({int(row[0]) for row in rows[1:]}, mine)
+        row = dict(zip(rows[0], rows[1]))
+        self.assertEqual(row['notes'], 'Long day, then\n"quiet" night')
+        self.assertEqual(json.loads(row['tags']), ['calm', 'home'])
+
+    def test_consumption_ndjson_applies_the_list_filters(self):
+        response, chunks = self.stream('/api/tracking/consumption/export/ndjson/', {'vice_type': 'cannabis'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        events = [json.loads(line) for line in ''.join(chunks).splitlines()]
+        self.assertEqual(len(events), 3)
+        self.assertEqual({event['vice_type'] for event in events}, {'cannabis'})
+        self.assertEqual(set(events[0]), set(CONSUMPTION_EXPORT_FIELDS))
+        self.assertEqual([event['date'] for event in events], sorted((e['date'] for e in events), reverse=True))
+
+    def test_unknown_format_is_not_found(self):
+        self.assertEqual(self.client.get('/api/tracking/consumption/export/xml/').status_code, 404)
+
+
+class CorrelationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='correlations', email='correlations@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.today = timezone.now().date()
+
+    def log(self, days):
+        # Drinking every third day: mood 3 and sleep 4, otherwise 7 and 8
+        for day in range(days):
+            drank = day % 3 == 0
+            JournalEntry.objects.create(
+                user=self.user, date=self.today - timedelta(days=day), substance='alcohol' if drank else 'none',
+                amount='1', mood=3 if drank else 7, sleep_quality=4 if drank else 8
+            )
+
+    def correlations(self):
+        response = self.client.get('/api/tracking/insights/correlations/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_empty_journal(self):
+        self.assertEqual(self.correlations()['entries'], 0)
+
+    def test_too_few_days_give_no_coefficient(self):
+        self.log(MIN_PAIRED_DAYS - 1)
+        data = self.correlations()
+        self.assertEqual(data['days_logged'], MIN_PAIRED_DAYS - 1)
+        self.assertEqual(data['correlations']['mood']['sleep_quality'], {'r': None, 'days': MIN_PAIRED_DAYS - 1})
+        # Deltas need no minimum
+        self.assertEqual(data['substance_effects']['alcohol']['mood_delta'], -4)
+
+    def test_coefficients_and_deltas(self):
+        self.log(12)
+        data = self.correlations()
+        self.assertEqual(data['correlations']['mood']['sleep_quality'], {'r': 1.0, 'days': 12})
+        self.assertEqual(data['correlations']['mood']['alcohol']['r'], -1.0)
+        self.assertEqual(data['correlations']['mood']['mindful']['r'], 1.0)
+        # No sleep hours logged
+        self.assertEqual(data['correlations']['mood']['sleep'], {'r': None, 'days': 0})
+        effects = data['substance_effects']['alcohol']
+        self.assertEqual((effects['days'], effects['mood_delta'], effects['sleep_quality_delta']), (4, -4, -4))
+        # The day after drinking is always a sober day here
+        self.assertEqual(data['lagged']['alcohol']['next_day_mood']['days'], 11)
+
+
+class SeriesTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='series', email='series@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Friday 30 January, Monday 2 and Tuesday 3 February 2026
+        for day, mood in ((date(2026, 1, 30), 4), (date(2026, 2, 2), 6), (date(2026, 2, 3), 9)):
+            JournalEntry.objects.create(user=self.user, date=day, substance='none', amount='1',
+                                        mood=mood, sleep_quality=5)
+            ConsumptionEvent.objects.create(user=self.user, date=day, vice_type='alcohol', quantity=1,
+                                            spending=mood, location='bar', time_of_day='evening')
+
+    def series(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_weeks_start_on_monday(self):
+        data = self.series('/api/tracking/journal/series/', bucket='week', metrics='entries,mood',
+                           start_date='2026-01-26', end_date='2026-02-15')
+        self.assertEqual(data['labels'], ['2026-01-26', '2026-02-02', '2026-02-09'])
+        self.assertEqual(data['series'], {'entries': [1, 2, 0], 'mood': [4, 7.5, None]})
+
+    def test_months_are_calendar_months(self):
+        data = self.series('/api/tracking/consumption/series/', bucket='month', metrics='count,spending',
+                           start_date='2026-01-01', end_date='2026-03-31')
+        self.assertEqual(data['labels'], ['2026-01-01', '2026-02-01', '2026-03-01'])
+        self.assertEqual(data['series'], {'count': [1, 2, 0], 'spending': [4, 15, 0]})
+
+    def test_bad_parameters_are_rejected(self):
+        for params in ({'bucket': 'year'}, {'metrics': 'mood,bogus'}, {'start_date': '2026-02-30'},
+                       {'start_date': '2026-03-01', 'end_date': '2026-02-01'},
+                       {'start_date': '2020-01-01', 'end_date': '2026-01-01'}):
+            response = self.client.get('/api/tracking/journal/series/', params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_buckets_are_whole_from_a_mid_bucket_start_date(self):
+        data = self.series('/api/tracking/journal/series/', bucket='month', metrics='entries',
+                           start_date='2026-01-31', end_date='2026-02-28')
+        self.assertEqual(data['series']['entries'], [1, 2])
+
+
+@mock.patch('tracking.benchmarks.MIN_COHORT_SIZE', 3)
+class BenchmarkTests(TestCase):
+
+    def setUp(self):
+        today = timezone.now().date()
+        self.users = {}
+        for name, substance, mood in (('a2', 'alcohol', 2), ('a5', 'alcohol', 5), ('a8', 'alcohol', 8),
+                                      ('c4', 'cannabis', 4), ('c6', 'cannabis', 6)):
+            user = self.users[name] = User.objects.create(username=name, email=f'{name}@example.com',
+                                                          province=' ON ')
+            JournalEntry.objects.create(user=user, date=today, substance=substance, amount='1',
+                                        mood=mood, sleep_quality=mood)
+
+    def test_small_cohorts_are_not_stored(self):
+        build_benchmarks()
+        mood = CohortBenchmark.objects.filter(metric='mood')
+        self.assertEqual(
+            {(b.substance, b.tier, b.province, b.user_count) for b in mood},
+            {('alcohol', 'free', 'on', 3), ('alcohol', 'free', '*', 3), ('alcohol', '*', '*', 3), ('*', '*', '*', 5)}
+        )
+        self.assertEqual(mood.get(substance='alcohol', tier='free', province='on').quantiles['p50'], 5.05)
+        # Nobody spent anything
+        self.assertFalse(CohortBenchmark.objects.filter(metric='spending').exists())
+
+    def test_percentile_in_the_finest_stored_cohort(self):
+        build_benchmarks()
+        client = APIClient()
+        client.force_authenticate(self.users['a5'])
+        mood = client.get('/api/tracking/stats/benchmarks/').data['mood']
+        self.assertEqual((mood['value'], mood['percentile']), (5, 50.0))
+        self.assertEqual(mood['cohort'], {'substance': 'alcohol', 'tier': 'free', 'province': 'on', 'users': 3})
+
+        # Too few cannabis users: the whole population is the cohort
+        mood = user_percentiles(self.users['c6'])['mood']
+        self.assertEqual(mood['cohort']['substance'], '*')
+        self.assertEqual(mood['percentile'], 70.0)
+        self.assertEqual(user_percentiles(self.users['c6'])['spending']['percentile'], None)
+
+
+class ConsumptionLedgerTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='ledger', email='ledger@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def event(self, day):
+        return ConsumptionEvent.objects.create(user=self.user, date=day, vice_type='alcohol', quantity=1,
+                                               spending=5, location='bar', time_of_day='evening')
+
+    def test_months_cover_the_range_across_years(self):
+        months = list(months_between(date(2025, 11, 15), date(2026, 2, 1)))
+        self.assertEqual(months, [date(2025, 11, 1), date(2025, 12, 1), date(2026, 1, 1), date(2026, 2, 1)])
+        self.assertEqual(partition_name(months[1]), 'tracking_consumptionevent_y2025m12')
+
+    @skipIf(connection.vendor == 'postgresql', 'the ledger is partitioned on Postgres')
+    def test_partitioning_is_a_no_op_off_postgres(self):
+        self.assertFalse(partitioned())
+        self.assertEqual(ensure_month_partitions(date(2026, 1, 1), date(2026, 12, 31)), [])
+        out = io.StringIO()
+        call_command('create_consumption_partitions', stdout=out)
+        self.assertIn('nothing to do', out.getvalue())
+
+    @skipUnless(connection.vendor == 'postgresql', 'partitions only exist on Postgres')
+    def test_new_partition_takes_over_rows_from_the_default_partition(self):
+        month = date(2099, 1, 1)
+        event = self.event(month.replace(day=15))
+        self.assertEqual(ensure_month_partitions(month, month), [partition_name(month)])
+        self.assertIn(partition_name(month), existing_partitions())
+        self.assertEqual(ensure_month_partitions(month, month), [])
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT id FROM {partition_name(month)}')
+            self.assertEqual(cursor.fetchall(), [(event.id,)])
+
+    def test_events_are_append_only(self):
+        event = self.event(date(2026, 1, 15))
+        event.spending = 0
+        with self.assertRaises(ValueError):
+            event.save()
+        url = f'/api/tracking/consumption/events/{event.id}/'
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.patch(url, {'spending': 0}, format='json').status_code, 405)
+        self.assertEqual(self.client.delete(url).status_code, 405)
+
+
+class StreakTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='streaks', email='streaks@example.com')
+        self.today = timezone.now().date()
+
+    def log(self, days_ago, substance):
+        JournalEntry.objects.create(user=self.user, date=self.today - timedelta(days=days_ago),
+                                    substance=substance, amount='1', mood=5, sleep_quality=5)
+
+    def cached(self):
+        # The incrementally maintained rows always match a recomputation
+        computed = compute_streaks(self.user.id)
+        cached = {
+            kind: {field: getattr(streak, field) for field in STREAK_FIELDS}
+            for kind, streak in get_user_streaks(self.user.id).items()
+        }
+        self.assertEqual(cached, computed)
+        return {kind: (values['current'], values['longest'], values['total_days']) for kind, values in computed.items()}
+
+    def test_islands_gaps_and_same_day_entries(self):
+        # Nothing logged three days ago: the gap breaks every streak
+        for days_ago, substance in ((9, 'none'), (8, 'none'), (7, 'alcohol'), (6, 'none'), (5, 'none'),
+                                    (4, 'none'), (2, 'cannabis'), (1, 'none'), (0, 'none')):
+            self.log(days_ago, substance)
+        self.assertEqual(self.cached(), {
+            'mindful': (2, 3, 7), 'alcohol_free': (3, 3, 8), 'cannabis_free': (2, 6, 8),
+        })
+        longest = compute_streaks(self.user.id)['alcohol_free']
+        # Ties go to the most recent run
+        self.assertEqual(longest['longest_start'], self.today - timedelta(days=2))
+
+        # A drink today stops the day from counting
+        self.log(0, 'alcohol')
+        self.assertEqual(self.cached(), {
+            'mindful': (0, 3, 6), 'alcohol_free': (0, 3, 7), 'cannabis_free': (2, 6, 8),
+        })
+
+    def test_backdated_entry_fills_a_gap(self):
+        for days_ago in (3, 1, 0):
+            self.log(days_ago, 'none')
+        self.assertEqual(self.cached()['mindful'], (2, 2, 3))
+        self.log(2, 'wellness')
+        self.assertEqual(self.cached()['mindful'], (4, 4, 4))
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        mindful = client.get('/api/tracking/stats/streaks/').data['mindful']
+        self.assertEqual((mindful['current'], mindful['current_start']), (4, self.today - timedelta(days=3)))
+
+    def test_streak_lapses_without_entries_since_yesterday(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for days_ago in (13, 12, 11):
+            self.log(days_ago, 'none')
+        # Cached as the run ending on the last logged day
+        self.assertEqual(self.cached()['mindful'], (3, 3, 3))
+        mindful = client.get('/api/tracking/stats/streaks/').data['mindful']
+        self.assertEqual((mindful['current'], mindful['current_start']), (0, None))
+        self.assertEqual((mindful['longest'], mindful['last_logged_date']), (3, self.today - timedelta(days=11)))
+
+        # Logging yesterday starts a new current run
+        self.log(1, 'none')
+        mindful = client.get('/api/tracking/stats/streaks/').data['mindful']
+        self.assertEqual((mindful['current'], mindful['current_start']), (1, self.today - timedelta(days=1)))
@@ -4,6 +4,8 @@ from . import views
 
 router = DefaultRouter()
 router.register(r'journal', views.JournalEntryViewSet, basename='journal')
+# Registered before 'consumption' so events/ is not taken for a detail pk
+router.register(r'consumption/events', views.ConsumptionEventViewSet, basename='consumption-event')
 router.register(r'consumption', views.StatsViewSet, basename='consumption')
 
 urlpatterns = [
@@ -22,15 +24,43 @@ urlpatterns = [
          views.JournalEntryViewSet.as_view({'get': 'debug_all'}), 
          name='journal-debug-all'),
     
+    # Export endpoints (csv or ndjson)
+    path('consumption/export/<str:export_format>/',
+         views.ConsumptionEventViewSet.as_view({'get': 'export'}),
+         name='consumption-export'),
+
+    path('consumption/analysis/',
+         views.ConsumptionEventViewSet.as_view({'get': 'consumption_analysis'}),
+         name='consumption-analysis'),
+
+    path('consumption/series/',
+         views.ConsumptionEventViewSet.as_view({'get': 'series'}),
+         name='consumption-series'),
+
+    # Analytics cache counters (staff only)
+    path('cache-stats/', views.analytics_cache_stats, name='analytics-cache-stats'),
+
     # Stats endpoints
     path('stats/', 
          views.StatsViewSet.as_view({'get': 'retrieve_stats'}), 
          name='consumption-stats'),
+
+    path('stats/streaks/',
+         views.StatsViewSet.as_view({'get': 'streaks'}),
+         name='stats-streaks'),
+
+    path('stats/benchmarks/',
+         views.StatsViewSet.as_view({'get': 'benchmarks'}),
+         name='stats-benchmarks'),
     
     # Insights endpoint
     path('insights/', 
          views.JournalEntryViewSet.as_view({'get': 'get_insights'}), 
          name='journal-insights'),
+
+    path('insights/correlations/',
+         views.JournalEntryViewSet.as_view({'get': 'correlations'}),
+         name='journal-correlations'),
     
     # Journal filtering endpoints
     path('journal/by-date-range/', 
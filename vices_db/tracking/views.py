@@ -1,15 +1,39 @@
-from rest_framework import viewsets, permissions, status
-from rest_framework.decorators import action
+from rest_framework import viewsets, mixins, permissions, status
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from django.utils import timezone
-from django.db.models import Avg, Sum, Count, Q
+from django.db import transaction, IntegrityError
 from datetime import datetime, timedelta
-from .models import JournalEntry, Stats, ConsumptionStats
-from .serializers import JournalEntrySerializer, StatsSerializer, ConsumptionStatsSerializer
+from .models import JournalEntry, Stats, ConsumptionStats, ConsumptionEvent, JournalDailyRollup, JournalTag
+from .serializers import (
+    JournalEntrySerializer, StatsSerializer, ConsumptionStatsSerializer, ConsumptionEventSerializer,
+)
+from .pagination import JournalCursorPagination, ConsumptionEventCursorPagination
+from .analytics import windowed_analytics, aggregate, count_rows, sum_of, avg_of, ratio_of
+from .tags import normalize_tag, top_tags
+from .search import search_journal
+from .correlations import journal_correlations
+from .series import (
+    build_series, JOURNAL_SERIES_METRICS, JOURNAL_DEFAULT_METRICS,
+    CONSUMPTION_SERIES_METRICS, CONSUMPTION_DEFAULT_METRICS,
+)
+from .stats_engine import rebuild_user_stats
+from .benchmarks import user_percentiles
+from .streaks import current_run, get_user_streaks
+from .signals import journal_entries_bulk_created, consumption_events_bulk_created
+from sync.versioning import conditional_on_data_version
+from .cache import cached_analytics, cache_metrics
+from .exports import export_response, JOURNAL_EXPORT_FIELDS, CONSUMPTION_EXPORT_FIELDS
+
+BULK_MAX_ENTRIES = 500
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+TAGS_MAX_LIMIT = 100
 
 class JournalEntryViewSet(viewsets.ModelViewSet):
     serializer_class = JournalEntrySerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = JournalCursorPagination
 
     def get_queryset(self):
         """
@@ -19,9 +43,18 @@ class JournalEntryViewSet(viewsets.ModelViewSet):
             return JournalEntry.objects.none()
             
         # Start with user's entries ONLY
-        queryset = JournalEntry.objects.filter(user=self.request.user)
-        
-        # Add optional filters
+        queryset = self.filter_by_params(JournalEntry.objects.filter(user=self.request.user))
+
+        tag = self.request.query_params.get('tag', None)
+        if tag:
+            queryset = queryset.filter(tag_index__tag=normalize_tag(tag))
+
+        return queryset.order_by('-date', '-timestamp', 'id')
+
+    def filter_by_params(self, queryset):
+        """
+        Apply the optional start_date/end_date/substance query params
+        """
         start_date = self.request.query_params.get('start_date', None)
         end_date = self.request.query_params.get('end_date', None)
         substance = self.request.query_params.get('substance', None)
@@ -33,26 +66,31 @@ class JournalEntryViewSet(viewsets.ModelViewSet):
         if substance:
             queryset = queryset.filter(substance=substance)
 
-        return queryset.order_by('-date', '-timestamp')
+        return queryset
 
-    def list(self, request, *args, **kwargs):
+    def get_rollup_queryset(self, start_date):
         """
-        Override list to add debugging and ensure proper user filtering
+        Daily rollups for the authenticated user, honouring the same optional
+        filters as get_queryset
         """
-        print(f"🔍 JournalEntry List - User: {request.user}")
-        print(f"🔍 User ID: {request.user.id}")
-        
-        queryset = self.get_queryset()
-        print(f"🔍 Queryset count: {queryset.count()}")
-        print(f"🔍 Queryset SQL: {queryset.query}")
-        
-        # Get all entries for debugging
-        all_entries = list(queryset.values('id', 'user__email', 'date', 'substance', 'mood'))
-        print(f"🔍 All entries: {all_entries}")
-        
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self.filter_by_params(
+            JournalDailyRollup.objects.filter(user=self.request.user, date__gte=start_date)
+        )
 
+    def get_tag_queryset(self, start_date):
+        """
+        Tag index rows for the authenticated user, honouring the same optional
+        filters as get_queryset
+        """
+        return self.filter_by_params(
+            JournalTag.objects.filter(user=self.request.user, date__gte=start_date)
+        )
+
+    @conditional_on_data_version
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @transaction.atomic
     def perform_create(self, serializer):
         """
         Ensure new entries are always tied to the authenticated user
@@ -60,6 +98,14 @@ class JournalEntryViewSet(viewsets.ModelViewSet):
         print(f"💾 Creating journal entry for user: {self.request.user}")
         serializer.save(user=self.request.user)
 
+    @transaction.atomic
+    def perform_update(self, serializer):
+        serializer.save()
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+
     def create(self, request, *args, **kwargs):
         """
         Override create to add debugging
@@ -72,21 +118,157 @@ class JournalEntryViewSet(viewsets.ModelViewSet):
         print(f"✅ Created entry: {response.data}")
         return response
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Ingest a batch of queued offline entries in one transaction.
+
+        Accepts a list (or {"entries": [...]}) of journal entries. Entries whose
+        client_id is already stored for this user are reported as duplicates
+        instead of being inserted again, so a replayed batch is harmless.
+        """
+        items = request.data.get('entries') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list):
+            return Response(
+                {'error': 'Expected a list of entries'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > BULK_MAX_ENTRIES:
+            return Response(
+                {'error': f'At most {BULK_MAX_ENTRIES} entries per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = self.get_serializer(data=items, many=True)
+        if serializer.is_valid():
+            valid_indexes = list(range(len(items)))
+            errors = {}
+        else:
+            # Revalidate only the good items so they can still be stored
+            errors = {i: item_errors for i, item_errors in enumerate(serializer.errors) if item_errors}
+            valid_indexes = [i for i in range(len(items)) if i not in errors]
+            serializer = self.get_serializer(data=[items[i] for i in valid_indexes], many=True)
+            serializer.is_valid(raise_exception=True)
+
+        client_ids = [data.get('client_id') for data in serializer.validated_data]
+        stored = dict(
+            JournalEntry.objects.filter(
+                user=request.user, client_id__in=[c for c in client_ids if c]
+            ).values_list('client_id', 'id')
+        )
+
+        results = {index: {'status': 'invalid', 'errors': item_errors}
+                   for index, item_errors in errors.items()}
+        pending = {}
+        new_entries = []
+        for index, data, client_id in zip(valid_indexes, serializer.validated_data, client_ids):
+            if client_id in stored:
+                results[index] = {'status': 'duplicate', 'id': stored[client_id]}
+            elif client_id in pending:
+                results[index] = {'status': 'duplicate', 'entry': pending[client_id]}
+            else:
+                entry = JournalEntry(user=request.user, **data)
+                new_entries.append(entry)
+                results[index] = {'status': 'created', 'entry': entry}
+                if client_id:
+                    pending[client_id] = entry
+
+        try:
+            with transaction.atomic():
+                created = JournalEntry.objects.bulk_create(new_entries)
+                journal_entries_bulk_created.send(
+                    sender=JournalEntry, user_id=request.user.id, entries=created
+                )
+        except IntegrityError:
+            # Another request stored one of these client_ids first
+            return Response(
+                {'error': 'Conflicting client_id, retry the batch'},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        response_items = []
+        for index, item in enumerate(items):
+            result = results[index]
+            if 'entry' in result:
+                result['id'] = result.pop('entry').id
+            client_id = item.get('client_id') if isinstance(item, dict) else None
+            response_items.append({'index': index, 'client_id': client_id, **result})
+
+        return Response({
+            'created': len(created),
+            'duplicates': sum(1 for r in response_items if r['status'] == 'duplicate'),
+            'invalid': len(errors),
+            'results': response_items
+        })
+
     @action(detail=False, methods=['get'])
     def by_user(self, request):
         """
-        Explicit endpoint to get all entries for current user
+        Explicit endpoint to get all entries for current user, one page at a time
         """
-        entries = JournalEntry.objects.filter(user=request.user).order_by('-date', '-timestamp')
-        serializer = self.get_serializer(entries, many=True)
-        
+        entries = JournalEntry.objects.filter(user=request.user)
+        page = self.paginate_queryset(entries)
+        serializer = self.get_serializer(page, many=True)
+
         return Response({
-            'count': entries.count(),
             'user_id': request.user.id,
             'user_email': request.user.email,
+            'next': self.paginator.get_next_link(),
             'results': serializer.data
         })
 
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Ranked full-text search over the user's journal notes and effects
+        """
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response(
+                {'error': 'q parameter is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            page = max(int(request.query_params.get('page', '1')), 1)
+            page_size = int(request.query_params.get('page_size', SEARCH_PAGE_SIZE))
+        except ValueError:
+            return Response(
+                {'error': 'page and page_size must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        page_size = max(1, min(page_size, SEARCH_MAX_PAGE_SIZE))
+
+        # One extra hit tells whether there is a next page without counting
+        hits = search_journal(request.user.id, text, page_size + 1, (page - 1) * page_size)
+        has_next = len(hits) > page_size
+        hits = hits[:page_size]
+
+        entries = JournalEntry.objects.in_bulk([entry_id for entry_id, _ in hits])
+        results = []
+        for entry_id, rank in hits:
+            entry = entries.get(entry_id)
+            if entry is None:
+                # Deleted since the search ran
+                continue
+            data = self.get_serializer(entry).data
+            data['rank'] = rank
+            results.append(data)
+
+        return Response({
+            'page': page,
+            'next_page': page + 1 if has_next else None,
+            'results': results
+        })
+
+    @action(detail=False, methods=['get'], url_path=r'export/(?P<export_format>csv|ndjson)')
+    def export(self, request, export_format=None):
+        """
+        Stream the user's full (filtered) journal as CSV or NDJSON
+        """
+        return export_response(
+            request, self.get_queryset(), JOURNAL_EXPORT_FIELDS, export_format, 'journal'
+        )
+
     @action(detail=False, methods=['get'])
     def debug_all(self, request):
         """
@@ -107,44 +289,98 @@ class JournalEntryViewSet(viewsets.ModelViewSet):
         })
 
     @action(detail=False, methods=['get'])
+    @conditional_on_data_version
+    @cached_analytics('mood_trends')
     def mood_trends(self, request):
         timeframe = int(request.query_params.get('timeframe', '30'))
         start_date = timezone.now().date() - timedelta(days=timeframe)
-        entries = self.get_queryset().filter(date__gte=start_date)
-        
-        mood_data = entries.aggregate(
-            avg_mood=Avg('mood'),
-            avg_sleep_quality=Avg('sleep_quality')
-        )
-        
-        mood_by_substance = entries.values('substance').annotate(
-            avg_mood=Avg('mood'),
-            count=Count('id')
+        analytics = windowed_analytics(
+            self.get_rollup_queryset(start_date),
+            {
+                'avg_mood': ratio_of('mood_sum', 'entry_count'),
+                'avg_sleep_quality': ratio_of('sleep_quality_sum', 'entry_count'),
+                'count': sum_of('entry_count'),
+            },
+            {'substance': ['avg_mood', 'count']}
         )
 
         return Response({
-            'overall_mood': mood_data['avg_mood'],
-            'sleep_quality': mood_data['avg_sleep_quality'],
-            'mood_by_substance': mood_by_substance
+            'overall_mood': analytics['total']['avg_mood'],
+            'sleep_quality': analytics['total']['avg_sleep_quality'],
+            'mood_by_substance': analytics['substance']
         })
 
     @action(detail=False, methods=['get'])
+    @conditional_on_data_version
+    @cached_analytics('get_insights')
     def get_insights(self, request):
         timeframe = int(request.query_params.get('timeframe', '30'))
         start_date = timezone.now().date() - timedelta(days=timeframe)
-        entries = self.get_queryset().filter(date__gte=start_date)
+        analytics = windowed_analytics(
+            self.get_rollup_queryset(start_date),
+            {
+                'count': sum_of('entry_count'),
+                'avg_mood': ratio_of('mood_sum', 'entry_count'),
+                'avg_sleep_quality': ratio_of('sleep_quality_sum', 'entry_count'),
+            },
+            {'substance': ['count']}
+        )
+        totals = analytics['total']
 
         # Calculate various insights
         insights = {
-            'total_entries': entries.count(),
-            'substance_breakdown': entries.values('substance').annotate(count=Count('id')),
-            'avg_mood': entries.aggregate(Avg('mood'))['mood__avg'],
-            'avg_sleep_quality': entries.aggregate(Avg('sleep_quality'))['sleep_quality__avg'],
-            'common_tags': entries.values('tags').annotate(count=Count('id')).order_by('-count')[:5]
+            'total_entries': totals['count'] or 0,
+            'substance_breakdown': analytics['substance'],
+            'avg_mood': totals['avg_mood'],
+            'avg_sleep_quality': totals['avg_sleep_quality'],
+            'common_tags': top_tags(self.get_tag_queryset(start_date), limit=5)
         }
 
         return Response(insights)
 
+    @action(detail=False, methods=['get'])
+    @conditional_on_data_version
+    @cached_analytics('correlations')
+    def correlations(self, request):
+        """
+        What moves the user's mood and sleep: same-day and next-day
+        correlations and per-substance/tag deltas over the journal history
+        """
+        entries = self.filter_by_params(JournalEntry.objects.filter(user=request.user))
+        return Response(journal_correlations(entries))
+
+    @action(detail=False, methods=['get'])
+    @conditional_on_data_version
+    @cached_analytics('journal_series')
+    def series(self, request):
+        """
+        Chart series: ?bucket=day|week|month&metrics=mood,sleep_quality,...
+        aggregated from the daily rollups into parallel arrays
+        """
+        # build_series validates the date range and widens it to whole buckets
+        rollups = JournalDailyRollup.objects.filter(user=request.user)
+        substance = request.query_params.get('substance')
+        if substance:
+            rollups = rollups.filter(substance=substance)
+        return Response(build_series(rollups, request.query_params, JOURNAL_SERIES_METRICS, JOURNAL_DEFAULT_METRICS))
+
+    @action(detail=False, methods=['get'])
+    def tags(self, request):
+        """
+        Top tags by frequency with the average mood of the entries carrying them
+        """
+        try:
+            timeframe = int(request.query_params.get('timeframe', '30'))
+            limit = int(request.query_params.get('limit', '10'))
+        except ValueError:
+            return Response(
+                {'error': 'timeframe and limit must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, TAGS_MAX_LIMIT))
+        start_date = timezone.now().date() - timedelta(days=timeframe)
+        return Response(top_tags(self.get_tag_queryset(start_date), limit=limit))
+
 class StatsViewSet(viewsets.ModelViewSet):
     serializer_class = StatsSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -159,9 +395,40 @@ class StatsViewSet(viewsets.ModelViewSet):
     def retrieve_stats(self, request):
         stats = self.get_queryset().first()
         if not stats:
-            stats = Stats.objects.create(user=request.user)
+            # First visit before any journal write or backfill
+            stats = rebuild_user_stats(request.user.id)
         return Response(self.serializer_class(stats).data)
 
+    @action(detail=False, methods=['get'])
+    @conditional_on_data_version
+    def streaks(self, request):
+        """
+        Current and longest mindful, alcohol-free and cannabis-free streaks
+        """
+        today = timezone.now().date()
+        streaks = {}
+        for kind, streak in get_user_streaks(request.user.id).items():
+            # A run with nothing logged since yesterday has lapsed
+            current, current_start = current_run(streak, today)
+            streaks[kind] = {
+                'current': current,
+                'current_start': current_start,
+                'longest': streak.longest,
+                'longest_start': streak.longest_start,
+                'longest_end': streak.longest_end,
+                'total_days': streak.total_days,
+                'last_logged_date': streak.last_logged_date,
+            }
+        return Response(streaks)
+
+    @action(detail=False, methods=['get'])
+    def benchmarks(self, request):
+        """
+        The user's mood, sleep quality and spending percentiles among similar
+        users (same primary substance, tier and province where large enough)
+        """
+        return Response(user_percentiles(request.user))
+
 class ConsumptionStatsViewSet(viewsets.ModelViewSet):
     serializer_class = ConsumptionStatsSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -184,27 +451,131 @@ class ConsumptionStatsViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+class ConsumptionEventViewSet(mixins.CreateModelMixin,
+                              mixins.ListModelMixin,
+                              mixins.RetrieveModelMixin,
+                              viewsets.GenericViewSet):
+    """
+    The append-only consumption ledger: events can be logged and read but
+    never edited or deleted
+    """
+    serializer_class = ConsumptionEventSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ConsumptionEventCursorPagination
+
+    def get_queryset(self):
+        queryset = ConsumptionEvent.objects.filter(user=self.request.user)
+        start_date = self.request.query_params.get('start_date', None)
+        end_date = self.request.query_params.get('end_date', None)
+        vice_type = self.request.query_params.get('vice_type', None)
+
+        # Date bounds let Postgres skip every partition outside the range
+        if start_date:
+            queryset = queryset.filter(date__gte=start_date)
+        if end_date:
+            queryset = queryset.filter(date__lte=end_date)
+        if vice_type:
+            queryset = queryset.filter(vice_type=vice_type)
+
+        return queryset.order_by('-date', '-id')
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Append a batch of events in one transaction. All-or-nothing: any
+        invalid event rejects the whole batch.
+        """
+        items = request.data.get('events') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list):
+            return Response(
+                {'error': 'Expected a list of events'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > BULK_MAX_ENTRIES:
+            return Response(
+                {'error': f'At most {BULK_MAX_ENTRIES} events per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = self.get_serializer(data=items, many=True)
+        if not serializer.is_valid():
+            errors = {i: item_errors for i, item_errors in enumerate(serializer.errors) if item_errors}
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        events = [ConsumptionEvent(user=request.user, **data) for data in serializer.validated_data]
+        with transaction.atomic():
+            created = ConsumptionEvent.objects.bulk_create(events)
+            consumption_events_bulk_created.send(
+                sender=ConsumptionEvent, user_id=request.user.id, events=created
+            )
+
+        return Response(
+            {'created': len(created), 'ids': [event.id for event in created]},
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=['get'], url_path=r'export/(?P<export_format>csv|ndjson)')
+    def export(self, request, export_format=None):
+        """
+        Stream the user's (filtered) consumption ledger as CSV or NDJSON
+        """
+        return export_response(
+            request, self.get_queryset(), CONSUMPTION_EXPORT_FIELDS, export_format, 'consumption'
+        )
+
+    @action(detail=False, methods=['get'])
+    @conditional_on_data_version
+    @cached_analytics('consumption_series')
+    def series(self, request):
+        """
+        Chart series from the ledger: ?bucket=day|week|month&metrics=count,quantity,spending,...
+        """
+        # build_series validates the date range and widens it to whole buckets
+        events = ConsumptionEvent.objects.filter(user=request.user)
+        vice_type = request.query_params.get('vice_type')
+        if vice_type:
+            events = events.filter(vice_type=vice_type)
+        return Response(build_series(
+            events, request.query_params, CONSUMPTION_SERIES_METRICS, CONSUMPTION_DEFAULT_METRICS
+        ))
+
     @action(detail=False, methods=['get'])
+    @cached_analytics('consumption_analysis')
     def consumption_analysis(self, request):
         timeframe = int(request.query_params.get('timeframe', '30'))
         start_date = timezone.now().date() - timedelta(days=timeframe)
-        stats = self.get_queryset().filter(date__gte=start_date)
-        
+        analytics = windowed_analytics(
+            self.get_queryset().filter(date__gte=start_date),
+            {
+                'total_quantity': sum_of('quantity'),
+                'total_spending': sum_of('spending'),
+                'count': count_rows(),
+                'avg_mood_impact': aggregate('AVG({0}) - AVG({1})', 'mood_after', 'mood_before'),
+                'avg_spending': avg_of('spending'),
+            },
+            {
+                'vice_type': ['total_quantity', 'total_spending', 'count', 'avg_mood_impact'],
+                'time_of_day': ['count', 'avg_spending'],
+                'location': ['count', 'avg_spending'],
+            }
+        )
+
         analysis = {
-            'total_spending': stats.aggregate(Sum('spending'))['spending__sum'] or 0,
-            'consumption_by_type': stats.values('vice_type').annotate(
-                total_quantity=Sum('quantity'),
-                total_spending=Sum('spending'),
-                count=Count('id'),
-                avg_mood_impact=Avg('mood_after') - Avg('mood_before')
-            ),
-            'time_of_day_breakdown': stats.values('time_of_day').annotate(
-                count=Count('id'),
-                avg_spending=Avg('spending')
-            ),
-            'location_analysis': stats.values('location').annotate(
-                count=Count('id'),
-                avg_spending=Avg('spending')
-            ).order_by('-count')[:5]
+            'total_spending': analytics['total']['total_spending'] or 0,
+            'consumption_by_type': analytics['vice_type'],
+            'time_of_day_breakdown': analytics['time_of_day'],
+            'location_analysis': sorted(analytics['location'], key=lambda row: -row['count'])[:5]
         }
-        return Response(analysis)
\ No newline at end of file
+        return Response(analysis)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def analytics_cache_stats(request):
+    """
+    Hit/miss counters of the analytics cache, for tuning
+    """
+    return Response(cache_metrics())
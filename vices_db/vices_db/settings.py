@@ -59,6 +59,8 @@ INSTALLED_APPS = [
     'goals',
     'products',
     'payments',
+    'sync',
+    'dashboard',
     'django.contrib.sites',
     'allauth',
     'allauth.account',
@@ -102,10 +104,14 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'vices_db.wsgi.application'
+# Served by uvicorn workers in production (Procfile), so async views such as
+# the OpenAI recommendations do not hold a worker while they wait
+ASGI_APPLICATION = 'vices_db.asgi.application'
 
 # Database configuration
 # Temporarily use SQLite locally due to driver issues
-POSTGRES_LOCALLY = False  # Temporarily set to False
+# Opt in with POSTGRES_LOCALLY=True and DATABASE_URL (e.g. the docker-compose postgres)
+POSTGRES_LOCALLY = os.getenv('POSTGRES_LOCALLY', 'False') == 'True'
 
 if ((os.getenv('RAILWAY_ENVIRONMENT_NAME') or os.getenv('RAILWAY_PROJECT_ID')) and dj_database_url and os.getenv('DATABASE_URL')) or POSTGRES_LOCALLY:
     if POSTGRES_LOCALLY and dj_database_url and os.getenv('DATABASE_URL'):
@@ -223,12 +229,51 @@ ACCOUNT_USERNAME_REQUIRED = False
 # Custom user model
 AUTH_USER_MODEL = 'users.User'
 
-# Cache configuration (fallback to dummy cache if Redis not available)
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+# Cache configuration (Redis when REDIS_URL is set, otherwise a bounded
+# in-process LRU cache per worker)
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            },
+        },
+        # OpenAI recommendations (products.llm_cache); give it its own
+        # instance with maxmemory and allkeys-lru to cap its size
+        'llm': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': os.getenv('LLM_CACHE_REDIS_URL', REDIS_URL),
+            'KEY_PREFIX': 'llm',
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            },
+        },
     }
-}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'vices-local',
+            'OPTIONS': {
+                'MAX_ENTRIES': 5000,
+            },
+        },
+        # Separate LRU, so recommendations cannot evict analytics entries
+        'llm': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'vices-llm',
+            'OPTIONS': {
+                'MAX_ENTRIES': int(os.getenv('LLM_CACHE_MAX_ENTRIES', 1000)),
+            },
+        },
+    }
+
+# Threads shared by all dashboard requests to render their sections
+# (dashboard.views); each busy thread holds its own database connection
+DASHBOARD_WORKERS = int(os.getenv('DASHBOARD_WORKERS', 8))
 
 # Security settings (only in production)
 if IS_PRODUCTION:
@@ -18,6 +18,7 @@ from django.contrib import admin
 from django.urls import path
 from django.urls import path, include
 from products.openai_views import generate_recommendations
+from products.views import llm_cache_stats
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -25,7 +26,10 @@ urlpatterns = [
     path('api/users/', include('users.urls')),
     path('api/goals/', include('goals.urls')),
     path('api/tracking/', include('tracking.urls')),
+    path('api/sync/', include('sync.urls')),
+    path('api/dashboard/', include('dashboard.urls')),
     path('api/openai/', generate_recommendations, name='openai_recommendations'),
+    path('api/openai/cache-stats/', llm_cache_stats, name='openai-cache-stats'),
     path('api/payments/', include('payments.urls')),
     path('dj-rest-auth/', include('dj_rest_auth.urls')),
     path('dj-rest-auth/registration/', include('dj_rest_auth.registration.urls')),